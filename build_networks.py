@@ -0,0 +1,210 @@
+"""
+Builds ico_template.avm for every network in networks.json
+
+Each network's parameters (see buildtools/networks.py) are applied to a copy of the contract source, which is then
+built the same way compile.py builds it. The variants are compiled in parallel worker processes.
+
+Builds are cached under .build-cache by a content hash of everything that goes into them: the contract source, the
+build tooling, the network's parameters and the neo-boa version. A variant whose hash is already cached is copied from
+the cache instead of being recompiled, so a change only rebuilds the variants it affects.
+
+The .avm and the cost report of each network are written to build/<network>/.
+
+Usage:
+
+python build_networks.py [--config networks.json] [--jobs 4] [--no-cache] [network ...]
+"""
+import argparse
+import binascii
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from buildtools.networks import load_networks, NetworkError
+from buildtools.report import write_report
+from compile import build, cost_report, CONTRACT, CONTRACT_SOURCES, here
+
+CONFIG = os.path.join(here, 'networks.json')
+
+CACHE_DIR = os.path.join(here, '.build-cache')
+OUTPUT_DIR = os.path.join(here, 'build')
+
+# everything besides the contract source that affects the compiled script
+TOOLING_SOURCES = ['compile.py', 'buildtools']
+
+AVM = CONTRACT.replace('.py', '.avm')
+REPORT = CONTRACT.replace('.py', '.report.json')
+
+
+def source_files(sources):
+    """
+    :param sources: list Files and directories relative to the repository root
+    :return:
+        list: The relative paths of every python file among them, sorted
+    """
+    paths = []
+    for source in sources:
+        path = os.path.join(here, source)
+        if not os.path.isdir(path):
+            paths.append(source)
+            continue
+
+        for directory, directories, files in os.walk(path):
+            directories[:] = [d for d in directories if d != '__pycache__']
+            for filename in files:
+                if filename.endswith('.py'):
+                    paths.append(os.path.relpath(os.path.join(directory, filename), here))
+
+    # the separator is normalized so that the hash is the same on every platform
+    return sorted(path.replace(os.sep, '/') for path in paths)
+
+
+def compiler_version():
+    try:
+        import pkg_resources
+        return pkg_resources.get_distribution('neo-boa').version
+    except Exception:
+        return 'unknown'
+
+
+def sources_digest():
+    """
+    :return:
+        hashlib: A sha256 of the contract and tooling sources, to be copied and extended with each variant's parameters
+    """
+    digest = hashlib.sha256()
+    digest.update(('neo-boa %s\n' % compiler_version()).encode('utf-8'))
+
+    for path in source_files(CONTRACT_SOURCES + TOOLING_SOURCES):
+        with open(os.path.join(here, path), 'rb') as f:
+            content = f.read()
+        digest.update(('%s %d\n' % (path, len(content))).encode('utf-8'))
+        digest.update(content)
+
+    return digest
+
+
+def variant_key(digest, params):
+    """
+    :param digest: hashlib The sources digest
+    :param params: OrderedDict The network's parameters
+    :return:
+        str: The cache key of the variant
+    """
+    variant = digest.copy()
+    variant.update(json.dumps({
+        'original_owner': binascii.hexlify(params['original_owner']).decode('ascii'),
+        'profile': params['profile'],
+        'optimize': params['optimize'],
+    }, sort_keys=True).encode('utf-8'))
+    return variant.hexdigest()
+
+
+def build_variant(job):
+    """
+    Build a network variant into the cache. Runs in a worker process
+
+    :param job: tuple The network name, its parameters and the cache directory of the variant
+    :return:
+        tuple: The network name, the number of helper calls inlined, the number of prints stripped and the build time
+    """
+    network, params, cache_path = job
+    start = time.time()
+
+    # build next to the cache entry and move it into place once it's complete, so an interrupted build is never cached
+    staging = tempfile.mkdtemp(prefix='%s-' % network, dir=CACHE_DIR)
+    try:
+        avm_path = os.path.join(staging, AVM)
+        inlined, stripped, optimization = build(params['profile'], avm_path, params['optimize'], params['original_owner'])
+
+        report = cost_report(avm_path, params['profile'], params['optimize'], optimization, params['original_owner'])
+        write_report(report, os.path.join(staging, REPORT))
+
+        if os.path.exists(cache_path):
+            shutil.rmtree(cache_path)
+        os.rename(staging, cache_path)
+    finally:
+        if os.path.exists(staging):
+            shutil.rmtree(staging)
+
+    return network, inlined, stripped, time.time() - start
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Build %s for every network in the network config' % AVM)
+    parser.add_argument('networks', nargs='*', help='the networks to build (default: all of them)')
+    parser.add_argument('--config', default=CONFIG, help='the network config (default: networks.json)')
+    parser.add_argument('--jobs', type=int, default=multiprocessing.cpu_count(),
+                        help='the number of worker processes (default: %(default)s)')
+    parser.add_argument('--no-cache', action='store_true', help='rebuild every network, even if it is cached')
+    args = parser.parse_args(argv)
+
+    try:
+        networks = load_networks(args.config)
+    except NetworkError as e:
+        parser.error(str(e))
+
+    unknown = [network for network in args.networks if network not in networks]
+    if unknown:
+        parser.error("unknown networks: %s. %s defines: %s" % (', '.join(unknown), args.config, ', '.join(networks)))
+
+    selected = args.networks or list(networks)
+
+    if not os.path.isdir(CACHE_DIR):
+        os.makedirs(CACHE_DIR)
+
+    digest = sources_digest()
+
+    keys = {}
+    jobs = []
+    for network in selected:
+        params = networks[network]
+        keys[network] = variant_key(digest, params)
+        cache_path = os.path.join(CACHE_DIR, keys[network])
+
+        # networks with the same parameters share a build
+        if any(job[2] == cache_path for job in jobs):
+            continue
+
+        if args.no_cache or not os.path.exists(cache_path):
+            jobs.append((network, params, cache_path))
+
+    built = {}
+    if len(jobs) > 1 and args.jobs > 1:
+        pool = multiprocessing.Pool(min(args.jobs, len(jobs)))
+        try:
+            results = pool.map(build_variant, jobs)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = [build_variant(job) for job in jobs]
+
+    for network, inlined, stripped, elapsed in results:
+        built[network] = "built in %.1fs: inlined %d helper calls, stripped %d prints" % (elapsed, inlined, stripped)
+
+    for network in selected:
+        output = os.path.join(OUTPUT_DIR, network)
+        if not os.path.isdir(output):
+            os.makedirs(output)
+
+        cache_path = os.path.join(CACHE_DIR, keys[network])
+        for filename in (AVM, REPORT):
+            shutil.copy(os.path.join(cache_path, filename), os.path.join(output, filename))
+
+        params = networks[network]
+        size = os.path.getsize(os.path.join(output, AVM))
+        print("%-10s %s profile, owner %s: %d bytes, %s (%s)" % (
+            network, params['profile'], binascii.hexlify(params['original_owner']).decode('ascii'), size,
+            built.get(network, 'cached'), keys[network][:12]))
+
+    print("%d of %d networks built, written to %s" % (len(jobs), len(selected), os.path.relpath(OUTPUT_DIR, here)))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
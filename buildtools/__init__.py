@@ -0,0 +1,3 @@
+"""
+Build-time tooling for compiling the contract. Used by compile.py
+"""
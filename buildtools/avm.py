@@ -0,0 +1,386 @@
+"""
+NEO 2.x AVM disassembler and assembler
+
+Decodes a compiled .avm script into a list of :class:`Instruction` so that the build tools can measure, analyze and
+rewrite it, and encodes instructions back into a script. Jump and call operands are signed 16 bit offsets relative to
+the offset of the jump or call itself.
+"""
+import binascii
+import struct
+
+PUSH0 = 0x00
+PUSHBYTES1 = 0x01
+PUSHBYTES75 = 0x4B
+PUSHDATA1 = 0x4C
+PUSHDATA2 = 0x4D
+PUSHDATA4 = 0x4E
+JMP = 0x62
+JMPIF = 0x63
+JMPIFNOT = 0x64
+CALL = 0x65
+RET = 0x66
+APPCALL = 0x67
+SYSCALL = 0x68
+TAILCALL = 0x69
+THROW = 0xF0
+PUSHM1 = 0x4F
+PUSH1 = 0x51
+PUSH16 = 0x60
+NOP = 0x61
+
+OPCODES = {
+    PUSH0: 'PUSH0',
+    PUSHDATA1: 'PUSHDATA1',
+    PUSHDATA2: 'PUSHDATA2',
+    PUSHDATA4: 'PUSHDATA4',
+    PUSHM1: 'PUSHM1',
+    NOP: 'NOP',
+    JMP: 'JMP',
+    JMPIF: 'JMPIF',
+    JMPIFNOT: 'JMPIFNOT',
+    CALL: 'CALL',
+    RET: 'RET',
+    APPCALL: 'APPCALL',
+    SYSCALL: 'SYSCALL',
+    TAILCALL: 'TAILCALL',
+    0x6A: 'DUPFROMALTSTACK',
+    0x6B: 'TOALTSTACK',
+    0x6C: 'FROMALTSTACK',
+    0x6D: 'XDROP',
+    0x72: 'XSWAP',
+    0x73: 'XTUCK',
+    0x74: 'DEPTH',
+    0x75: 'DROP',
+    0x76: 'DUP',
+    0x77: 'NIP',
+    0x78: 'OVER',
+    0x79: 'PICK',
+    0x7A: 'ROLL',
+    0x7B: 'ROT',
+    0x7C: 'SWAP',
+    0x7D: 'TUCK',
+    0x7E: 'CAT',
+    0x7F: 'SUBSTR',
+    0x80: 'LEFT',
+    0x81: 'RIGHT',
+    0x82: 'SIZE',
+    0x83: 'INVERT',
+    0x84: 'AND',
+    0x85: 'OR',
+    0x86: 'XOR',
+    0x87: 'EQUAL',
+    0x8B: 'INC',
+    0x8C: 'DEC',
+    0x8D: 'SIGN',
+    0x8F: 'NEGATE',
+    0x90: 'ABS',
+    0x91: 'NOT',
+    0x92: 'NZ',
+    0x93: 'ADD',
+    0x94: 'SUB',
+    0x95: 'MUL',
+    0x96: 'DIV',
+    0x97: 'MOD',
+    0x98: 'SHL',
+    0x99: 'SHR',
+    0x9A: 'BOOLAND',
+    0x9B: 'BOOLOR',
+    0x9C: 'NUMEQUAL',
+    0x9E: 'NUMNOTEQUAL',
+    0x9F: 'LT',
+    0xA0: 'GT',
+    0xA1: 'LTE',
+    0xA2: 'GTE',
+    0xA3: 'MIN',
+    0xA4: 'MAX',
+    0xA5: 'WITHIN',
+    0xA7: 'SHA1',
+    0xA8: 'SHA256',
+    0xA9: 'HASH160',
+    0xAA: 'HASH256',
+    0xAC: 'CHECKSIG',
+    0xAD: 'VERIFY',
+    0xAE: 'CHECKMULTISIG',
+    0xC0: 'ARRAYSIZE',
+    0xC1: 'PACK',
+    0xC2: 'UNPACK',
+    0xC3: 'PICKITEM',
+    0xC4: 'SETITEM',
+    0xC5: 'NEWARRAY',
+    0xC6: 'NEWSTRUCT',
+    0xC7: 'NEWMAP',
+    0xC8: 'APPEND',
+    0xC9: 'REVERSE',
+    0xCA: 'REMOVE',
+    0xCB: 'HASKEY',
+    0xCC: 'KEYS',
+    0xCD: 'VALUES',
+    THROW: 'THROW',
+    0xF1: 'THROWIFNOT',
+}
+
+for _n in range(PUSHBYTES1, PUSHBYTES75 + 1):
+    OPCODES[_n] = 'PUSHBYTES%d' % _n
+
+for _n in range(1, 17):
+    OPCODES[PUSH1 - 1 + _n] = 'PUSH%d' % _n
+
+OPCODE_VALUES = dict((name, code) for code, name in OPCODES.items())
+
+JUMPS = (JMP, JMPIF, JMPIFNOT, CALL)
+
+# execution never continues with the following instruction after these
+TERMINATORS = (JMP, RET, TAILCALL, THROW)
+
+# the VM refuses to treat anything longer than this as an integer
+MAX_INTEGER_SIZE = 32
+
+
+class AVMError(Exception):
+    pass
+
+
+class Instruction():
+    """
+    A single decoded instruction
+
+    :param offset: int The offset of the opcode in the script
+    :param opcode: int The opcode
+    :param operand: bytes The operand following the opcode (a jump offset, pushed data, syscall name or script hash)
+    :param size: int The total size of the instruction in bytes, including any length prefix
+    """
+
+    def __init__(self, offset, opcode, operand=b'', size=1):
+        self.offset = offset
+        self.opcode = opcode
+        self.operand = operand
+        self.size = size
+
+    @property
+    def name(self):
+        return OPCODES[self.opcode]
+
+    @property
+    def next_offset(self):
+        return self.offset + self.size
+
+    @property
+    def target(self):
+        """
+        The absolute offset a jump or call transfers to, or None for any other instruction
+        """
+        if self.opcode not in JUMPS:
+            return None
+        return self.offset + struct.unpack('<h', self.operand)[0]
+
+    @property
+    def syscall(self):
+        """
+        The name of the interop service a SYSCALL invokes, or None for any other instruction
+        """
+        if self.opcode != SYSCALL:
+            return None
+        return self.operand.decode('ascii')
+
+    @property
+    def is_push(self):
+        """
+        Whether the instruction pushes a constant
+        """
+        return self.opcode <= PUSHDATA4 or self.opcode == PUSHM1 or PUSH1 <= self.opcode <= PUSH16
+
+    def encode(self):
+        """
+        :return: bytes The encoded instruction. a jump's operand is encoded as is, so it must already be relative
+        """
+        if PUSHBYTES1 <= self.opcode <= PUSHBYTES75:
+            if len(self.operand) != self.opcode:
+                raise AVMError('%s with a %d byte operand' % (self.name, len(self.operand)))
+            prefix = b''
+        elif self.opcode == PUSHDATA1:
+            prefix = struct.pack('<B', len(self.operand))
+        elif self.opcode == PUSHDATA2:
+            prefix = struct.pack('<H', len(self.operand))
+        elif self.opcode == PUSHDATA4:
+            prefix = struct.pack('<I', len(self.operand))
+        elif self.opcode == SYSCALL:
+            prefix = write_var_int(len(self.operand))
+        else:
+            prefix = b''
+
+        return bytes([self.opcode]) + prefix + bytes(self.operand)
+
+    def __repr__(self):
+        if self.opcode in JUMPS:
+            return '%04x %s %04x' % (self.offset, self.name, self.target)
+        if self.opcode == SYSCALL:
+            return '%04x %s %s' % (self.offset, self.name, self.syscall)
+        if self.operand:
+            return '%04x %s %s' % (self.offset, self.name, binascii.hexlify(self.operand).decode('ascii'))
+        return '%04x %s' % (self.offset, self.name)
+
+
+def read_var_int(script, offset):
+    """
+    :return: tuple The decoded variable length integer and the number of bytes it occupied
+    """
+    prefix = script[offset]
+    if prefix < 0xFD:
+        return prefix, 1
+    if prefix == 0xFD:
+        return struct.unpack_from('<H', script, offset + 1)[0], 3
+    if prefix == 0xFE:
+        return struct.unpack_from('<I', script, offset + 1)[0], 5
+    return struct.unpack_from('<Q', script, offset + 1)[0], 9
+
+
+def write_var_int(value):
+    """
+    :return: bytes The variable length encoding of value, as read by read_var_int
+    """
+    if value < 0xFD:
+        return struct.pack('<B', value)
+    if value <= 0xFFFF:
+        return b'\xfd' + struct.pack('<H', value)
+    if value <= 0xFFFFFFFF:
+        return b'\xfe' + struct.pack('<I', value)
+    return b'\xff' + struct.pack('<Q', value)
+
+
+def push_value(instruction):
+    """
+    The integer a push instruction leaves on the stack, as the VM would convert it
+
+    :param instruction: Instruction A push instruction
+    :return:
+        int: The value, or None if the instruction isn't a push or its data is too long to be used as an integer
+    """
+    opcode = instruction.opcode
+    if opcode == PUSHM1:
+        return -1
+    if PUSH1 <= opcode <= PUSH16:
+        return opcode - PUSH1 + 1
+    if opcode <= PUSHDATA4 and len(instruction.operand) <= MAX_INTEGER_SIZE:
+        return int.from_bytes(instruction.operand, 'little', signed=True)
+    return None
+
+
+def integer_bytes(value):
+    """
+    :return: bytes The minimal little endian two's complement encoding of value, as the VM converts integers to bytes
+    """
+    if value == 0:
+        return b''
+    if value > 0:
+        length = value.bit_length() // 8 + 1
+    else:
+        length = (~value).bit_length() // 8 + 1
+    return value.to_bytes(length, 'little', signed=True)
+
+
+def push_instruction(value):
+    """
+    The shortest instruction that pushes a non-zero integer. Zero isn't supported since PUSH0 pushes an empty byte
+    array, which doesn't compare equal to the integer 0 as bytes
+
+    :param value: int The value to push
+    :return:
+        Instruction: The push, without an offset
+    """
+    if value == 0:
+        raise AVMError("zero can't be pushed as an integer")
+    if value == -1:
+        return Instruction(None, PUSHM1)
+    if 1 <= value <= 16:
+        return Instruction(None, PUSH1 - 1 + value)
+
+    data = integer_bytes(value)
+    return Instruction(None, len(data), data, 1 + len(data))
+
+
+def assemble(instructions):
+    """
+    Encode instructions into a script
+
+    :param instructions: list The Instructions in order. jump operands must already be relative
+    :return:
+        bytes: The script
+    """
+    return b''.join(instruction.encode() for instruction in instructions)
+
+
+def disassemble(script):
+    """
+    Decode a script
+
+    :param script: bytes The .avm script
+    :return:
+        list: The script's Instructions in order
+    """
+    script = bytes(script)
+    instructions = []
+
+    offset = 0
+    while offset < len(script):
+        opcode = script[offset]
+
+        if opcode not in OPCODES:
+            raise AVMError('unknown opcode 0x%02x at offset %04x' % (opcode, offset))
+
+        start = offset + 1
+        if PUSHBYTES1 <= opcode <= PUSHBYTES75:
+            length, prefix = opcode, 0
+        elif opcode == PUSHDATA1:
+            length, prefix = script[start], 1
+        elif opcode == PUSHDATA2:
+            length, prefix = struct.unpack_from('<H', script, start)[0], 2
+        elif opcode == PUSHDATA4:
+            length, prefix = struct.unpack_from('<I', script, start)[0], 4
+        elif opcode in JUMPS:
+            length, prefix = 2, 0
+        elif opcode in (APPCALL, TAILCALL):
+            length, prefix = 20, 0
+        elif opcode == SYSCALL:
+            length, prefix = read_var_int(script, start)
+        else:
+            length, prefix = 0, 0
+
+        end = start + prefix + length
+        if end > len(script):
+            raise AVMError('%s at offset %04x runs past the end of the script' % (OPCODES[opcode], offset))
+
+        instructions.append(Instruction(offset, opcode, script[start + prefix:end], end - offset))
+        offset = end
+
+    return instructions
+
+
+def reachable(instructions, entry):
+    """
+    Find every instruction that execution can reach from an offset, following both sides of conditional jumps and
+    into called functions
+
+    :param instructions: list The disassembled script
+    :param entry: int The offset to start from
+    :return:
+        list: The reachable Instructions in script order
+    """
+    by_offset = dict((i.offset, i) for i in instructions)
+
+    seen = set()
+    pending = [entry]
+    while pending:
+        offset = pending.pop()
+        while offset in by_offset and offset not in seen:
+            seen.add(offset)
+            instruction = by_offset[offset]
+
+            if instruction.target is not None:
+                pending.append(instruction.target)
+
+            if instruction.opcode in TERMINATORS:
+                break
+
+            offset = instruction.next_offset
+
+    return [by_offset[offset] for offset in sorted(seen)]
@@ -0,0 +1,441 @@
+"""
+Source-level inliner for the contract build
+
+neo-boa can't reliably compile a call from one method to another method that doesn't return a value
+(https://github.com/CityOfZion/neo-boa/issues/40), so helpers like ``Crowdsale.mint_tokens`` used to be pasted
+into every caller by hand. Instead, a helper can be marked with a comment on the line above its ``def``:
+
+.. code-block:: python
+
+    # boa: inline
+    def mint_tokens(self, token: Token, from_address, to_address, tokens, storage: StorageAPI):
+        ...
+
+and every ``self.mint_tokens(...)`` statement is replaced with the helper's body before the source is handed to
+the compiler. Arguments that are plain names are substituted directly. Any other argument is assigned to the
+parameter first. Helper locals that would clash with a name in the caller are renamed. The marked helper
+definitions are dropped from the output once every call has been expanded.
+
+Helpers must not return anything, not even early with a bare ``return``, and may only be called as a statement. Helpers may call other helpers.
+
+This module only uses the ``ast`` features available in Python 3.4/3.5, so statement spans come from ``tokenize``
+rather than ``end_lineno``.
+"""
+import ast
+import io
+import os
+import textwrap
+import tokenize
+
+INLINE_MARKER = '# boa: inline'
+
+# expanding a helper can expose calls to other helpers. this bounds the nesting depth (and catches recursion)
+MAX_PASSES = 8
+
+
+class InlineError(Exception):
+    pass
+
+
+class Helper():
+    """
+    A function marked for inlining
+    """
+
+    def __init__(self, node, lines, tokens, is_method):
+        self.name = node.name
+        self.node = node
+
+        args = node.args
+        if args.vararg or args.kwarg or args.defaults or args.kwonlyargs:
+            raise InlineError("%s: inline helpers only support plain positional parameters" % self.name)
+
+        self.params = [arg.arg for arg in args.args]
+        if is_method:
+            self.params = self.params[1:]
+
+        # the body text starts right after the header or docstring so that comments leading the first statement are kept
+        body = node.body
+        body_start = logical_line_end(tokens, node.lineno) + 1
+        if is_docstring(body[0]):
+            body_start = logical_line_end(tokens, body[0].lineno) + 1
+            body = body[1:]
+
+        for child in ast.walk(node):
+            if isinstance(child, ast.Return) and child.value is None:
+                # a bare return would return from the caller once the body is pasted into it
+                raise InlineError("%s: inline helpers can't return early" % self.name)
+            if isinstance(child, (ast.Return, ast.Yield, ast.YieldFrom)):
+                raise InlineError("%s: inline helpers can't return a value" % self.name)
+            if child is not node and isinstance(child, (ast.FunctionDef, ast.ClassDef, ast.Lambda)):
+                raise InlineError("%s: inline helpers can't define nested functions or classes" % self.name)
+
+        # the helper definition spans from its marker comment to the end of its last logical line
+        self.first_line = node.lineno - 1
+        self.last_line = block_end(tokens, node.lineno)
+
+        if body:
+            text = '\n'.join(lines[body_start - 1:self.last_line]).strip('\n') + '\n'
+            self.body = textwrap.dedent(text)
+        else:
+            self.body = 'pass\n'
+
+        self.assigned = assigned_names(body)
+        self.names = used_names(body)
+
+
+def is_docstring(statement):
+    if not isinstance(statement, ast.Expr):
+        return False
+
+    # ast.Str on the python versions neo-boa runs under, ast.Constant on newer ones
+    value = statement.value
+    return isinstance(getattr(value, 's', getattr(value, 'value', None)), str)
+
+
+def assigned_names(statements):
+    """
+    :return: set The names stored to by the statements
+    """
+    names = set()
+    for statement in statements:
+        for child in ast.walk(statement):
+            if isinstance(child, ast.Name) and isinstance(child.ctx, ast.Store):
+                names.add(child.id)
+    return names
+
+
+def used_names(node_or_statements):
+    """
+    :return: set Every name loaded or stored by the node or statements
+    """
+    if not isinstance(node_or_statements, list):
+        node_or_statements = [node_or_statements]
+
+    names = set()
+    for statement in node_or_statements:
+        for child in ast.walk(statement):
+            if isinstance(child, ast.Name):
+                names.add(child.id)
+            elif isinstance(child, ast.arg):
+                names.add(child.arg)
+    return names
+
+
+def generate_tokens(source):
+    return list(tokenize.generate_tokens(io.StringIO(source).readline))
+
+
+def logical_line_end(tokens, start_line):
+    """
+    :return: int The (1-based) line the logical line starting on start_line ends on
+    """
+    for token in tokens:
+        if token.type == tokenize.NEWLINE and token.start[0] >= start_line:
+            return token.start[0]
+    return tokens[-1].start[0]
+
+
+def block_end(tokens, def_line):
+    """
+    :return: int The (1-based) last line of the block introduced by the compound statement on def_line
+    """
+    depth = 0
+    header_end = None
+    last_newline = def_line
+    for token in tokens:
+        if token.start[0] < def_line:
+            continue
+        if header_end is None:
+            # skip the header, including any DEDENTs closing the previous block that are positioned on def_line
+            if token.type == tokenize.NEWLINE:
+                header_end = token.start[0]
+                last_newline = header_end
+            continue
+        if token.type == tokenize.INDENT:
+            depth += 1
+        elif token.type == tokenize.DEDENT:
+            depth -= 1
+            if depth == 0:
+                return last_newline
+        elif token.type == tokenize.NEWLINE:
+            last_newline = token.start[0]
+    return last_newline
+
+
+def call_arguments(lines, tokens, start_line, end_line, helper_name):
+    """
+    Split the source of a helper call's arguments at its top level commas
+
+    :return: list The source text of each argument
+    """
+    call_tokens = [t for t in tokens if start_line <= t.start[0] <= end_line]
+
+    i = 0
+    while not (call_tokens[i].type == tokenize.NAME and call_tokens[i].string == helper_name):
+        i += 1
+    while call_tokens[i].string != '(':
+        i += 1
+
+    arguments = []
+    depth = 0
+    start = None
+    for token in call_tokens[i:]:
+        if token.type == tokenize.OP and token.string in '([{':
+            depth += 1
+            if depth == 1:
+                start = token.end
+                continue
+        elif token.type == tokenize.OP and token.string in ')]}':
+            depth -= 1
+            if depth == 0:
+                arguments.append(source_between(lines, start, token.start))
+                break
+        elif token.type == tokenize.OP and token.string == ',' and depth == 1:
+            arguments.append(source_between(lines, start, token.start))
+            start = token.end
+
+    arguments = [a.strip() for a in arguments]
+    if arguments and arguments[-1] == '':
+        # trailing comma
+        arguments = arguments[:-1]
+
+    return arguments
+
+
+def source_between(lines, start, end):
+    (start_row, start_col), (end_row, end_col) = start, end
+    if start_row == end_row:
+        return lines[start_row - 1][start_col:end_col]
+
+    text = [lines[start_row - 1][start_col:]]
+    text.extend(lines[start_row:end_row - 1])
+    text.append(lines[end_row - 1][:end_col])
+    return '(' + ' '.join(part.strip() for part in text) + ')'
+
+
+def rename(source, renames):
+    """
+    Rename variables in a block of source. Attribute names (anything following a ``.``) are left alone.
+    """
+    if not renames:
+        return source
+
+    lines = source.split('\n')
+    replacements = []
+    previous = None
+    for token in generate_tokens(source):
+        if token.type == tokenize.NAME and token.string in renames and not (previous is not None and previous.string == '.'):
+            replacements.append((token.start, token.end, renames[token.string]))
+        if token.type not in (tokenize.NL, tokenize.COMMENT):
+            previous = token
+
+    for (row, start_col), (_, end_col), name in reversed(replacements):
+        line = lines[row - 1]
+        lines[row - 1] = line[:start_col] + name + line[end_col:]
+
+    return '\n'.join(lines)
+
+
+def helper_call(statement, helpers):
+    """
+    :return: Helper The helper called by the statement if it is a bare call to one, otherwise None
+    """
+    if not isinstance(statement, ast.Expr) or not isinstance(statement.value, ast.Call):
+        return None
+
+    func = statement.value.func
+    if isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name) and func.value.id == 'self':
+        name = func.attr
+    elif isinstance(func, ast.Name):
+        name = func.id
+    else:
+        return None
+
+    return helpers.get(name)
+
+
+def find_helpers(tree, lines, tokens):
+    """
+    :return: dict The marked helpers by name
+    """
+    helpers = {}
+
+    def visit(body, is_method):
+        for node in body:
+            if isinstance(node, ast.ClassDef):
+                visit(node.body, True)
+            elif isinstance(node, ast.FunctionDef):
+                first_line = node.lineno
+                if node.decorator_list:
+                    first_line = node.decorator_list[0].lineno
+                if first_line > 1 and lines[first_line - 2].strip() == INLINE_MARKER:
+                    if node.decorator_list:
+                        raise InlineError("%s: inline helpers can't be decorated" % node.name)
+                    if node.name in helpers:
+                        raise InlineError("%s: inline helper names must be unique within a module" % node.name)
+                    helpers[node.name] = Helper(node, lines, tokens, is_method)
+
+    visit(tree.body, False)
+
+    return helpers
+
+
+def expand(helper, statement, caller, lines, tokens):
+    """
+    :return: list The lines replacing the call statement
+    """
+    end_line = logical_line_end(tokens, statement.lineno)
+    arguments = call_arguments(lines, tokens, statement.lineno, end_line, helper.name)
+
+    call = statement.value
+    if call.keywords or len(arguments) != len(helper.params) or any(isinstance(a, ast.Starred) for a in call.args):
+        raise InlineError("line %d: %s must be called with exactly %d positional arguments"
+                          % (statement.lineno, helper.name, len(helper.params)))
+
+    caller_names = used_names(caller)
+
+    renames = {}
+    assignments = []
+
+    for name in helper.assigned - set(helper.params):
+        if name in caller_names:
+            renames[name] = helper.name + '_' + name
+
+    for param, node, text in zip(helper.params, call.args, arguments):
+        if isinstance(node, ast.Name) and param not in helper.assigned and (node.id == param or node.id not in helper.names):
+            # a plain name that the helper never rebinds can be substituted as is
+            if node.id != param:
+                renames[param] = node.id
+            continue
+
+        target = param
+        if param in caller_names:
+            target = helper.name + '_' + param
+            renames[param] = target
+        assignments.append('%s = %s' % (target, text))
+
+    indent = ' ' * statement.col_offset
+
+    body = rename(helper.body, renames).rstrip('\n').split('\n')
+
+    expanded = [indent + '# inlined: ' + ' '.join(l.strip() for l in lines[statement.lineno - 1:end_line])]
+    expanded.extend(indent + a for a in assignments)
+    expanded.extend((indent + l) if l.strip() else '' for l in body)
+
+    return statement.lineno, end_line, expanded
+
+
+def expand_calls(source):
+    """
+    Expand one level of marked helper calls
+
+    :return: tuple The new source and the number of calls expanded
+    """
+    tree = ast.parse(source)
+    lines = source.split('\n')
+    tokens = generate_tokens(source)
+
+    helpers = find_helpers(tree, lines, tokens)
+    if not helpers:
+        return source, 0
+
+    replacements = []
+
+    def visit(statements, caller):
+        for statement in statements:
+            helper = helper_call(statement, helpers)
+            if helper is not None:
+                replacements.append(expand(helper, statement, caller, lines, tokens))
+                continue
+
+            if isinstance(statement, (ast.FunctionDef, ast.ClassDef)):
+                visit(statement.body, statement if isinstance(statement, ast.FunctionDef) else caller)
+                continue
+
+            for field in ('body', 'orelse', 'finalbody'):
+                visit(getattr(statement, field, []), caller)
+            for handler in getattr(statement, 'handlers', []):
+                visit(handler.body, caller)
+
+    visit(tree.body, tree)
+
+    for first, last, expanded in sorted(replacements, key=lambda r: r[0], reverse=True):
+        lines[first - 1:last] = expanded
+
+    return '\n'.join(lines), len(replacements)
+
+
+def remove_helpers(source):
+    """
+    Drop the marked helper definitions, which are unused once every call has been expanded
+    """
+    tree = ast.parse(source)
+    lines = source.split('\n')
+    tokens = generate_tokens(source)
+
+    helpers = find_helpers(tree, lines, tokens)
+
+    # any reference left over means a helper was used in a way that can't be inlined
+    for node in ast.walk(tree):
+        name = None
+        if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) and node.value.id == 'self':
+            name = node.attr
+        elif isinstance(node, ast.Name):
+            name = node.id
+        if name in helpers:
+            raise InlineError("line %d: %s can only be called as a statement" % (node.lineno, name))
+
+    for helper in sorted(helpers.values(), key=lambda h: h.first_line, reverse=True):
+        del lines[helper.first_line - 1:helper.last_line]
+
+    return '\n'.join(lines)
+
+
+def inline_source(source):
+    """
+    Expand every call to a marked helper in a module's source
+
+    :param source: str The module source
+    :return:
+        tuple: The inlined source and the number of calls expanded
+    """
+    total = 0
+    for _ in range(MAX_PASSES):
+        source, count = expand_calls(source)
+        if count == 0:
+            return remove_helpers(source), total
+        total += count
+
+    raise InlineError("inline helpers nested more than %d deep. is a helper recursive?" % MAX_PASSES)
+
+
+def inline_tree(root):
+    """
+    Inline marked helpers in place in every python file under root
+
+    :param root: str The directory to process
+    :return:
+        int: The number of calls expanded
+    """
+    total = 0
+    for directory, _, files in os.walk(root):
+        for filename in files:
+            if not filename.endswith('.py'):
+                continue
+
+            path = os.path.join(directory, filename)
+            with open(path, 'r') as f:
+                source = f.read()
+
+            try:
+                inlined, count = inline_source(source)
+            except InlineError as e:
+                raise InlineError('%s: %s' % (os.path.relpath(path, root), e))
+
+            if count:
+                with open(path, 'w') as f:
+                    f.write(inlined)
+                total += count
+
+    return total
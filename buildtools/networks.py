@@ -0,0 +1,166 @@
+"""
+Per-network build parameters
+
+The contract is built once per network (privnet, testnet, mainnet, ...) from a JSON config that maps each network
+name to its parameters:
+
+.. code-block:: json
+
+    {
+        "privnet": {"original_owner": "23ba2703c53263e8d6e522dc32203339dcd8eee9", "profile": "dev"},
+        "mainnet": {"original_owner": "0xdfb13b097b7292b21bb5ba8a4aa488a87ab38af0"}
+    }
+
+* ``original_owner`` (required): the script hash that replaces ``Token.original_owner``. Either the 20 bytes as they
+  appear in the source, in hex, or the ``0x`` prefixed form that neo-python's ``wallet`` command shows, which is the
+  same bytes reversed.
+* ``profile``: the build profile, ``prod`` (the default) or ``dev``. See buildtools/profiles.py.
+* ``optimize``: whether to run the peephole optimizer. Defaults to false.
+
+Like the inliner and the profiles, the parameters are applied to the copied source text, so the compiler sees
+ordinary Python.
+"""
+import ast
+import binascii
+import json
+import os
+from collections import OrderedDict
+
+from buildtools.inliner import generate_tokens, logical_line_end
+from buildtools.profiles import PROD, PROFILES
+
+# the module and class that declare original_owner, relative to the build directory
+TOKEN_MODULE = os.path.join('nrve', 'token', 'nrvetoken.py')
+TOKEN_CLASS = 'Token'
+
+SCRIPT_HASH_SIZE = 20
+
+PARAMETERS = ('original_owner', 'profile', 'optimize')
+
+
+class NetworkError(Exception):
+    pass
+
+
+def parse_script_hash(value):
+    """
+    :param value: str The script hash in hex. a 0x prefix means the reversed (big endian) form shown by neo-python
+    :return:
+        bytes: The script hash as it's stored in the contract
+    """
+    reverse = value.startswith('0x')
+    if reverse:
+        value = value[2:]
+
+    try:
+        script_hash = binascii.unhexlify(value)
+    except (binascii.Error, TypeError):
+        raise NetworkError("'%s' isn't a hex script hash" % value)
+
+    if len(script_hash) != SCRIPT_HASH_SIZE:
+        raise NetworkError("a script hash is %d bytes, not %d" % (SCRIPT_HASH_SIZE, len(script_hash)))
+
+    return script_hash[::-1] if reverse else script_hash
+
+
+def load_networks(path):
+    """
+    Load and validate a network config
+
+    :param path: str The config file
+    :return:
+        OrderedDict: The parameters of each network, in the order of the file: the original_owner bytes, the profile
+        and whether to optimize
+    """
+    with open(path, 'r') as f:
+        try:
+            config = json.load(f, object_pairs_hook=OrderedDict)
+        except ValueError as e:
+            raise NetworkError("%s: %s" % (path, e))
+
+    if not isinstance(config, dict) or not config:
+        raise NetworkError("%s: expected an object of network names to parameters" % path)
+
+    networks = OrderedDict()
+    for name, params in config.items():
+        if not isinstance(params, dict):
+            raise NetworkError("%s: expected an object of parameters" % name)
+
+        unknown = sorted(set(params) - set(PARAMETERS))
+        if unknown:
+            raise NetworkError("%s: unknown parameters %s. expected: %s" % (name, ', '.join(unknown), ', '.join(PARAMETERS)))
+
+        if 'original_owner' not in params:
+            raise NetworkError("%s: original_owner is required" % name)
+
+        profile = params.get('profile', PROD)
+        if profile not in PROFILES:
+            raise NetworkError("%s: unknown build profile '%s'. expected one of: %s" % (name, profile, ', '.join(PROFILES)))
+
+        try:
+            original_owner = parse_script_hash(params['original_owner'])
+        except NetworkError as e:
+            raise NetworkError("%s: original_owner: %s" % (name, e))
+
+        networks[name] = OrderedDict([
+            ('original_owner', original_owner),
+            ('profile', profile),
+            ('optimize', bool(params.get('optimize', False))),
+        ])
+
+    return networks
+
+
+def set_original_owner(source, original_owner):
+    """
+    Replace the original_owner declaration of the Token class
+
+    :param source: str The source of the token module
+    :param original_owner: bytes The script hash of the owner
+    :return:
+        str: The updated source
+    """
+    tree = ast.parse(source)
+
+    for node in tree.body:
+        if not isinstance(node, ast.ClassDef) or node.name != TOKEN_CLASS:
+            continue
+
+        for statement in node.body:
+            if isinstance(statement, ast.Assign) and len(statement.targets) == 1 \
+                    and isinstance(statement.targets[0], ast.Name) and statement.targets[0].id == 'original_owner':
+                try:
+                    declared = ast.literal_eval(statement.value)
+                except ValueError:
+                    declared = None
+                if not isinstance(declared, bytes):
+                    raise NetworkError("line %d: original_owner isn't declared as a bytes literal" % statement.lineno)
+
+                lines = source.splitlines(True)
+                end = logical_line_end(generate_tokens(source), statement.lineno)
+                indent = lines[statement.lineno - 1][:statement.col_offset]
+
+                lines[statement.lineno - 1:end] = ['%soriginal_owner = %r\n' % (indent, original_owner)]
+                return ''.join(lines)
+
+    raise NetworkError("%s.original_owner not found" % TOKEN_CLASS)
+
+
+def apply_network(root, original_owner):
+    """
+    Apply the network parameters in place to the contract source copied to root
+
+    :param root: str The build directory
+    :param original_owner: bytes The script hash of the owner
+    """
+    path = os.path.join(root, TOKEN_MODULE)
+    with open(path, 'r') as f:
+        source = f.read()
+
+    try:
+        source = set_original_owner(source, original_owner)
+    except NetworkError as e:
+        raise NetworkError('%s: %s' % (TOKEN_MODULE, e))
+
+    with open(path, 'w') as f:
+        f.write(source)
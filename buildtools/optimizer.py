@@ -0,0 +1,538 @@
+"""
+Peephole optimizer for the compiled contract
+
+neo-boa 0.2.1 compiles expressions like ``29780000 * 100000000`` or ``2*self.blocks_per_day`` into the arithmetic
+itself, and its statement-at-a-time code generation leaves redundant stack shuffling and jumps behind. This pass
+rewrites the compiled script:
+
+* constant folding: ``PUSH a, PUSH b, ADD|SUB|MUL|DIV|MOD`` becomes a single push of the result. Results of zero
+  aren't folded since PUSH0 pushes an empty byte array rather than the integer 0, and those differ as bytes
+* redundant pairs: ``DUP DROP``, ``TOALTSTACK FROMALTSTACK`` and a constant push followed by ``DROP`` are removed,
+  as is every ``NOP``
+* dead stores: neo-boa keeps a function's locals in an array on the alt stack. A store to a slot that the function
+  never loads is replaced with a ``DROP`` of the value
+* jumps: a jump to an unconditional ``JMP`` is threaded through to its final destination. A ``JMP`` to the next
+  instruction is removed, and one to a short tail ending in ``RET`` (e.g. a function epilogue) is replaced with a copy
+  of the tail. NEO 2.x jumps only come in one (16 bit) size, so removing and threading them is the shortening
+  available. Code that can't be reached from the entry point is dropped.
+
+The passes repeat until nothing changes. The script is then relocated, re-assembled and disassembled again to
+check that every jump and call still lands on the start of an instruction.
+
+python -m buildtools.optimizer ico_template.avm ico_template.py [--output optimized.avm]
+"""
+import argparse
+import json
+import struct
+import sys
+from collections import OrderedDict
+
+from buildtools.avm import AVMError, Instruction, assemble, disassemble, integer_bytes, push_instruction, push_value, \
+    CALL, JMP, JMPIF, JMPIFNOT, JUMPS, MAX_INTEGER_SIZE, NOP, OPCODE_VALUES, RET, TERMINATORS
+from buildtools.report import cost_report, main_operations, report_savings
+
+ADD = OPCODE_VALUES['ADD']
+SUB = OPCODE_VALUES['SUB']
+MUL = OPCODE_VALUES['MUL']
+DIV = OPCODE_VALUES['DIV']
+MOD = OPCODE_VALUES['MOD']
+DUP = OPCODE_VALUES['DUP']
+DROP = OPCODE_VALUES['DROP']
+PUSH2 = OPCODE_VALUES['PUSH2']
+ROLL = OPCODE_VALUES['ROLL']
+PICKITEM = OPCODE_VALUES['PICKITEM']
+SETITEM = OPCODE_VALUES['SETITEM']
+TOALTSTACK = OPCODE_VALUES['TOALTSTACK']
+FROMALTSTACK = OPCODE_VALUES['FROMALTSTACK']
+DUPFROMALTSTACK = OPCODE_VALUES['DUPFROMALTSTACK']
+NEWARRAY = OPCODE_VALUES['NEWARRAY']
+
+ALTSTACK = (TOALTSTACK, FROMALTSTACK, DUPFROMALTSTACK)
+
+# the longest tail (in bytes) that replaces a JMP. a JMP is 3 bytes, so copying a tail this size never grows the script
+MAX_TAIL_SIZE = 3
+
+# upper bound on the number of rounds of passes. the passes only remove, shorten or redirect code, so they settle quickly
+MAX_ROUNDS = 50
+
+
+def truncated_divide(a, b):
+    # DIV and MOD follow .NET BigInteger semantics: the quotient is truncated towards zero
+    quotient = abs(a) // abs(b)
+    return quotient if (a < 0) == (b < 0) else -quotient
+
+
+ARITHMETIC = {
+    ADD: lambda a, b: a + b,
+    SUB: lambda a, b: a - b,
+    MUL: lambda a, b: a * b,
+    DIV: truncated_divide,
+    MOD: lambda a, b: a - b * truncated_divide(a, b),
+}
+
+
+def instruction(opcode):
+    return Instruction(None, opcode)
+
+
+class Optimizer():
+    """
+    Rewrites a script in place through the peephole passes. Jumps are tracked by the instruction they land on rather
+    than by offset, so that instructions can be removed and replaced freely until the script is relocated.
+
+    :param script: bytes The .avm script
+    """
+
+    def __init__(self, script):
+        self.instructions = disassemble(script)
+
+        by_offset = dict((i.offset, i) for i in self.instructions)
+
+        # id(jump) -> (jump, the instruction it lands on)
+        self.destinations = {}
+        for i in self.instructions:
+            if i.target is None:
+                continue
+            if i.target not in by_offset:
+                raise AVMError("%r doesn't land on the start of an instruction" % i)
+            self.destinations[id(i)] = (i, by_offset[i.target])
+
+        self.counts = OrderedDict((name, 0) for name in (
+            'constants_folded', 'pairs_removed', 'nops_removed', 'dead_stores_removed', 'jumps_threaded',
+            'jumps_removed', 'tails_copied', 'unreachable_removed'))
+
+    def destination(self, jump):
+        return self.destinations[id(jump)][1]
+
+    def set_destination(self, jump, destination):
+        self.destinations[id(jump)] = (jump, destination)
+
+    def targeted(self):
+        return set(id(destination) for _, destination in self.destinations.values())
+
+    def rewrite(self, visit):
+        """
+        Apply a pass that replaces runs of instructions
+
+        :param visit: function Called with the index of each instruction and the ids of the instructions jumped to.
+            Returns None to keep the instruction, or the number of instructions consumed and the list replacing them.
+            only the first consumed instruction may be a jump destination
+        :return:
+            int: The number of replacements made
+        """
+        targeted = self.targeted()
+        instructions = self.instructions
+
+        output = []
+        # id(removed) -> (removed, the instruction jumps to it now land on)
+        redirects = {}
+        pending = []
+
+        def emit(new):
+            for removed in pending:
+                redirects[id(removed)] = (removed, new)
+            del pending[:]
+            output.append(new)
+
+        changes = 0
+        index = 0
+        while index < len(instructions):
+            result = visit(index, targeted)
+            if result is None:
+                emit(instructions[index])
+                index += 1
+                continue
+
+            consumed, replacement = result
+            pending.extend(instructions[index:index + consumed])
+            for new in replacement:
+                emit(new)
+
+            index += consumed
+            changes += 1
+
+        if any(id(removed) in targeted for removed in pending):
+            raise AVMError('a jump lands past the end of the script')
+
+        self.instructions = output
+        self.remap(redirects)
+        return changes
+
+    def remap(self, redirects):
+        """
+        Point jumps at removed instructions to their replacements, and forget removed jumps
+        """
+        destinations = {}
+        for i in self.instructions:
+            if i.opcode not in JUMPS:
+                continue
+            destination = self.destination(i)
+            while id(destination) in redirects:
+                destination = redirects[id(destination)][1]
+            destinations[id(i)] = (i, destination)
+        self.destinations = destinations
+
+    # passes
+
+    def fold_constants(self):
+        instructions = self.instructions
+
+        def visit(index, targeted):
+            if index + 2 >= len(instructions):
+                return None
+            a, b, operation = instructions[index:index + 3]
+            if operation.opcode not in ARITHMETIC or id(b) in targeted or id(operation) in targeted:
+                return None
+            if not a.is_push or not b.is_push:
+                return None
+
+            left, right = push_value(a), push_value(b)
+            if left is None or right is None:
+                return None
+            if right == 0 and operation.opcode in (DIV, MOD):
+                # leave the fault to the VM
+                return None
+
+            value = ARITHMETIC[operation.opcode](left, right)
+            if value == 0 or len(integer_bytes(value)) > MAX_INTEGER_SIZE:
+                return None
+
+            return 3, [push_instruction(value)]
+
+        count = self.rewrite(visit)
+        self.counts['constants_folded'] += count
+        return count
+
+    def remove_redundant(self):
+        instructions = self.instructions
+        pairs = [0]
+
+        def visit(index, targeted):
+            first = instructions[index]
+            if first.opcode == NOP:
+                return 1, []
+
+            if index + 1 >= len(instructions):
+                return None
+            second = instructions[index + 1]
+            if id(second) in targeted:
+                return None
+
+            # a FROMALTSTACK that fetches the locals array is left alone so that the access stays recognizable to
+            # remove_dead_stores
+            if (first.opcode == DUP and second.opcode == DROP) or \
+                    (first.opcode == TOALTSTACK and second.opcode == FROMALTSTACK and self.local_access(index + 1) is None) or \
+                    (first.is_push and second.opcode == DROP):
+                pairs[0] += 1
+                return 2, []
+
+            return None
+
+        count = self.rewrite(visit)
+        self.counts['pairs_removed'] += pairs[0]
+        self.counts['nops_removed'] += count - pairs[0]
+        return count
+
+    def local_access(self, index):
+        """
+        Match neo-boa's access to a local variable slot at an index:
+
+        * load: FROMALTSTACK DUP TOALTSTACK PUSH<slot> PICKITEM
+        * store: FROMALTSTACK DUP TOALTSTACK PUSH<slot> PUSH2 ROLL SETITEM
+
+        :return: tuple ('load' or 'store', slot, length in instructions), or None if the instructions at index aren't
+            a local variable access
+        """
+        instructions = self.instructions
+        opcodes = [i.opcode for i in instructions[index:index + 7]]
+        if opcodes[:3] != [FROMALTSTACK, DUP, TOALTSTACK] or len(opcodes) < 5 or not instructions[index + 3].is_push:
+            return None
+
+        slot = push_value(instructions[index + 3])
+        if slot is None:
+            return None
+        if opcodes[4] == PICKITEM:
+            return 'load', slot, 5
+        if opcodes[4:7] == [PUSH2, ROLL, SETITEM]:
+            return 'store', slot, 7
+        return None
+
+    def functions(self):
+        """
+        :return: list (start, end) index ranges of each function. functions are laid out one after another, each
+            starting at the entry point or at a CALL destination
+        """
+        positions = dict((id(i), index) for index, i in enumerate(self.instructions))
+        starts = set([0])
+        for jump, destination in self.destinations.values():
+            if jump.opcode == CALL:
+                starts.add(positions[id(destination)])
+
+        starts = sorted(starts)
+        return list(zip(starts, starts[1:] + [len(self.instructions)]))
+
+    def remove_dead_stores(self):
+        instructions = self.instructions
+
+        # the store patterns to replace, by index
+        dead = set()
+        for start, end in self.functions():
+            loads = set()
+            stores = []
+            safe = True
+
+            index = start
+            while index < end:
+                access = self.local_access(index)
+                if access is not None:
+                    kind, slot, length = access
+                    if kind == 'load':
+                        loads.add(slot)
+                    else:
+                        stores.append((index, slot))
+                    index += length
+                    continue
+
+                opcode = instructions[index].opcode
+                if opcode in ALTSTACK:
+                    prologue = opcode == TOALTSTACK and index > start and instructions[index - 1].opcode == NEWARRAY
+                    epilogue = opcode == FROMALTSTACK and index + 1 < end and instructions[index + 1].opcode == DROP
+                    if not prologue and not epilogue:
+                        # the alt stack is used some other way, so a slot may be read without a recognizable load
+                        safe = False
+                        break
+                index += 1
+
+            if safe:
+                dead.update(index for index, slot in stores if slot not in loads)
+
+        def visit(index, targeted):
+            if index not in dead:
+                return None
+            if any(id(i) in targeted for i in instructions[index + 1:index + 7]):
+                return None
+            # the value being stored is still on the stack, so drop it instead
+            return 7, [instruction(DROP)]
+
+        count = self.rewrite(visit)
+        self.counts['dead_stores_removed'] += count
+        return count
+
+    def thread_jumps(self):
+        count = 0
+        for jump, destination in list(self.destinations.values()):
+            if jump.opcode == CALL:
+                continue
+
+            # follow chains of unconditional jumps, stopping if they loop
+            seen = set([id(jump)])
+            final = destination
+            while final.opcode == JMP and id(final) not in seen:
+                seen.add(id(final))
+                final = self.destination(final)
+
+            if final is not destination and id(final) not in seen:
+                self.set_destination(jump, final)
+                count += 1
+
+        self.counts['jumps_threaded'] += count
+        return count
+
+    def tail(self, destination, positions):
+        """
+        :param destination: Instruction Where a JMP lands
+        :param positions: dict The index of each instruction by id
+        :return: list The instructions from destination through the next RET, if they are short enough to copy in
+            place of a JMP and contain nothing that jumps. otherwise None
+        """
+        tail = []
+        size = 0
+        for i in self.instructions[positions[id(destination)]:]:
+            if i.opcode in JUMPS or (i.opcode in TERMINATORS and i.opcode != RET):
+                return None
+            size += i.size
+            if size > MAX_TAIL_SIZE:
+                return None
+            tail.append(i)
+            if i.opcode == RET:
+                return tail
+        return None
+
+    def simplify_jumps(self):
+        instructions = self.instructions
+        positions = dict((id(i), index) for index, i in enumerate(instructions))
+        removed = [0]
+
+        def visit(index, targeted):
+            jump = instructions[index]
+            if jump.opcode not in (JMP, JMPIF, JMPIFNOT):
+                return None
+
+            destination = self.destination(jump)
+            if index + 1 < len(instructions) and destination is instructions[index + 1]:
+                removed[0] += 1
+                if jump.opcode == JMP:
+                    return 1, []
+                # a conditional jump to the next instruction still pops its condition
+                return 1, [instruction(DROP)]
+
+            if jump.opcode == JMP:
+                tail = self.tail(destination, positions)
+                if tail is not None:
+                    return 1, [Instruction(None, i.opcode, i.operand, i.size) for i in tail]
+
+            return None
+
+        count = self.rewrite(visit)
+        self.counts['jumps_removed'] += removed[0]
+        self.counts['tails_copied'] += count - removed[0]
+        return count
+
+    def remove_unreachable(self):
+        instructions = self.instructions
+        positions = dict((id(i), index) for index, i in enumerate(instructions))
+
+        seen = set()
+        pending = [0]
+        while pending:
+            index = pending.pop()
+            while index < len(instructions) and index not in seen:
+                seen.add(index)
+                i = instructions[index]
+                if i.opcode in JUMPS:
+                    pending.append(positions[id(self.destination(i))])
+                if i.opcode in TERMINATORS:
+                    break
+                index += 1
+
+        if len(seen) == len(instructions):
+            return 0
+
+        self.instructions = [i for index, i in enumerate(instructions) if index in seen]
+        self.remap({})
+
+        count = len(instructions) - len(seen)
+        self.counts['unreachable_removed'] += count
+        return count
+
+    def run(self):
+        for _ in range(MAX_ROUNDS):
+            changes = self.fold_constants()
+            changes += self.remove_redundant()
+            changes += self.remove_dead_stores()
+            changes += self.thread_jumps()
+            changes += self.simplify_jumps()
+            changes += self.remove_unreachable()
+            if changes == 0:
+                return
+        raise AVMError('the optimizer did not settle after %d rounds' % MAX_ROUNDS)
+
+    def relocate(self):
+        """
+        Assign new offsets, encode the jumps relative to them and assemble the script
+
+        :return:
+            bytes: The script
+        """
+        offset = 0
+        for i in self.instructions:
+            i.offset = offset
+            if i.opcode in JUMPS:
+                i.operand = b'\x00\x00'
+            i.size = len(i.encode())
+            offset += i.size
+
+        for jump, destination in self.destinations.values():
+            relative = destination.offset - jump.offset
+            if not -0x8000 <= relative <= 0x7FFF:
+                raise AVMError('%s at %04x can no longer reach %04x' % (jump.name, jump.offset, destination.offset))
+            jump.operand = struct.pack('<h', relative)
+
+        return assemble(self.instructions)
+
+
+def validate(script):
+    """
+    Check that every jump and call in a script lands on the start of an instruction
+
+    :param script: bytes The .avm script
+    :return:
+        list: The script's Instructions
+    """
+    instructions = disassemble(script)
+    offsets = set(i.offset for i in instructions)
+    for i in instructions:
+        if i.target is not None and i.target not in offsets:
+            raise AVMError("%r doesn't land on the start of an instruction" % i)
+    return instructions
+
+
+def optimize(script):
+    """
+    Optimize a script
+
+    :param script: bytes The .avm script
+    :return:
+        tuple: The optimized script and an OrderedDict of the changes each pass made
+    """
+    optimizer = Optimizer(script)
+    optimizer.run()
+
+    optimized = optimizer.relocate()
+
+    # the relocated jumps must decode back to the instructions they were aimed at
+    instructions = validate(optimized)
+    by_offset = dict((i.offset, i) for i in instructions)
+    for jump, destination in optimizer.destinations.values():
+        if by_offset[jump.offset].target != destination.offset:
+            raise AVMError('%r was relocated incorrectly' % jump)
+
+    return optimized, optimizer.counts
+
+
+def optimization_report(script, optimized, counts, operations):
+    """
+    Describe what the optimizer saved
+
+    :param script: bytes The unoptimized script
+    :param optimized: bytes The optimized script
+    :param counts: OrderedDict The changes each pass made
+    :param operations: list The operation names dispatched by Main
+    :return:
+        OrderedDict: The sizes before and after, the pass counts and the savings overall and per operation
+    """
+    before = cost_report(script, operations)
+    after = cost_report(optimized, operations)
+
+    report = OrderedDict()
+    report['size'] = OrderedDict([('before', before['size']), ('after', after['size'])])
+    report['instructions'] = OrderedDict([('before', before['instructions']), ('after', after['instructions'])])
+    report['passes'] = counts
+    report['savings'] = report_savings(before, after)
+    return report
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Optimize a compiled contract')
+    parser.add_argument('avm_path', help='the compiled .avm')
+    parser.add_argument('source_path', help='the contract entry point source, to find the operation names')
+    parser.add_argument('--output', help='where to write the optimized .avm')
+    args = parser.parse_args(argv)
+
+    with open(args.avm_path, 'rb') as f:
+        script = f.read()
+    with open(args.source_path, 'r') as f:
+        operations = main_operations(f.read())
+
+    optimized, counts = optimize(script)
+
+    if args.output:
+        with open(args.output, 'wb') as f:
+            f.write(optimized)
+
+    json.dump(optimization_report(script, optimized, counts, operations), sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
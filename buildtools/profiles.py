@@ -0,0 +1,148 @@
+"""
+Build profiles
+
+neo-boa compiles every ``print(...)`` in the contract into a ``Neo.Runtime.Log`` SYSCALL, which runs (and costs GAS)
+on every failing path it sits on. The diagnostics are handy on a private net but do nothing for users on MainNet, so
+compile.py builds one of two profiles:
+
+* ``dev``: the source is compiled as written.
+* ``prod``: every statement that is just a ``print(...)`` call is removed from the source before compiling. A block
+  left empty by the removal gets a ``pass`` so that it still parses. A print whose arguments call anything (e.g.
+  ``print(self.describe(storage))``) is refused, since removing it would skip the call and whatever it does.
+
+Like the inliner, this works on the source text so that the compiler sees ordinary Python. Statement spans come from
+``tokenize`` since ``end_lineno`` isn't available on the Python versions neo-boa runs under.
+"""
+import ast
+import os
+
+from buildtools.inliner import generate_tokens, logical_line_end
+
+DEV = 'dev'
+PROD = 'prod'
+
+PROFILES = (PROD, DEV)
+
+
+class ProfileError(Exception):
+    pass
+
+
+def is_print(statement):
+    if not isinstance(statement, ast.Expr) or not isinstance(statement.value, ast.Call):
+        return False
+    func = statement.value.func
+    return isinstance(func, ast.Name) and func.id == 'print'
+
+
+def argument_calls(statement):
+    """
+    :return: list The calls (and yields) made while evaluating a print statement's arguments
+    """
+    call = statement.value
+    arguments = list(call.args) + [keyword.value for keyword in call.keywords]
+
+    return [node for argument in arguments for node in ast.walk(argument)
+            if isinstance(node, (ast.Call, ast.Yield, ast.YieldFrom))]
+
+
+def statement_blocks(tree):
+    """
+    :return: generator Every list of statements in the tree: module, function and class bodies and the branches of
+        compound statements
+    """
+    for node in ast.walk(tree):
+        for field in ('body', 'orelse', 'finalbody'):
+            block = getattr(node, field, None)
+            if isinstance(block, list) and block and isinstance(block[0], ast.stmt):
+                yield block
+        for handler in getattr(node, 'handlers', []):
+            yield handler.body
+
+
+def strip_prints(source):
+    """
+    Remove the print statements from a module's source
+
+    :param source: str The module source
+    :return:
+        tuple: The stripped source and the number of prints removed
+    """
+    tree = ast.parse(source)
+    lines = source.splitlines(True)
+    tokens = None
+
+    # (first line, last line, replacement) for each removed statement, with 1-based line numbers
+    removals = []
+
+    for block in statement_blocks(tree):
+        prints = [statement for statement in block if is_print(statement)]
+        if not prints:
+            continue
+
+        if tokens is None:
+            tokens = generate_tokens(source)
+
+        for statement in prints:
+            line = lines[statement.lineno - 1]
+            if line[:statement.col_offset].strip():
+                # e.g. "if x: print(...)" or "a = 1; print(...)". the contract doesn't do this, so don't guess
+                raise ProfileError("line %d: print isn't the only statement on its line" % statement.lineno)
+
+            if argument_calls(statement):
+                # the arguments may have side effects, e.g. a storage read, that removing the print would skip
+                raise ProfileError("line %d: print's arguments call a function. log a value computed beforehand"
+                                   % statement.lineno)
+
+            end = logical_line_end(tokens, statement.lineno)
+
+            replacement = ''
+            if len(prints) == len(block) and statement is prints[0]:
+                # the block would be left empty
+                replacement = line[:statement.col_offset] + 'pass\n'
+
+            removals.append((statement.lineno, end, replacement))
+
+    # remove from the bottom up so that the earlier line numbers stay valid
+    for start, end, replacement in sorted(removals, reverse=True):
+        lines[start - 1:end] = [replacement] if replacement else []
+
+    return ''.join(lines), len(removals)
+
+
+def apply_profile(root, profile):
+    """
+    Apply a build profile in place to every python file under root
+
+    :param root: str The directory to process
+    :param profile: str PROD or DEV
+    :return:
+        int: The number of prints removed
+    """
+    if profile not in PROFILES:
+        raise ProfileError("unknown build profile '%s'. expected one of: %s" % (profile, ', '.join(PROFILES)))
+
+    if profile == DEV:
+        return 0
+
+    total = 0
+    for directory, _, files in os.walk(root):
+        for filename in files:
+            if not filename.endswith('.py'):
+                continue
+
+            path = os.path.join(directory, filename)
+            with open(path, 'r') as f:
+                source = f.read()
+
+            try:
+                stripped, count = strip_prints(source)
+            except ProfileError as e:
+                raise ProfileError('%s: %s' % (os.path.relpath(path, root), e))
+
+            if count:
+                with open(path, 'w') as f:
+                    f.write(stripped)
+                total += count
+
+    return total
@@ -0,0 +1,204 @@
+"""
+Static cost report for the compiled contract
+
+Reports the script size, an opcode histogram and, for each operation dispatched by ``Main``, the number of
+instructions reachable from the operation's branch and the SYSCALLs among them. The counts are static: every
+instruction the branch can reach is counted once, whether or not a particular invocation executes it, so they are
+an upper bound on the code an operation can touch rather than a trace of one run.
+
+compile.py writes the report next to the .avm. It can also be generated for an existing build:
+
+python -m buildtools.report ico_template.avm ico_template.py
+"""
+import ast
+import json
+import sys
+from collections import Counter, OrderedDict
+
+from buildtools.avm import disassemble, reachable, JMPIFNOT, PUSHBYTES1, PUSHDATA4
+
+# the ways neo-boa compiles ==
+COMPARISONS = ('NUMEQUAL', 'EQUAL')
+
+
+def main_operations(source):
+    """
+    Find the operation names Main dispatches on
+
+    :param source: str The contract entry point source
+    :return:
+        list: Each name compared against ``operation`` in Main, in source order
+    """
+    comparisons = []
+
+    for node in ast.walk(ast.parse(source)):
+        if not (isinstance(node, ast.FunctionDef) and node.name == 'Main'):
+            continue
+
+        for compare in ast.walk(node):
+            if not isinstance(compare, ast.Compare) or len(compare.ops) != 1 or not isinstance(compare.ops[0], ast.Eq):
+                continue
+            left, right = compare.left, compare.comparators[0]
+            if not (isinstance(left, ast.Name) and left.id == 'operation'):
+                continue
+
+            # ast.Str on the python versions neo-boa runs under, ast.Constant on newer ones
+            name = getattr(right, 's', getattr(right, 'value', None))
+            if isinstance(name, str):
+                comparisons.append((compare.lineno, compare.col_offset, name))
+
+    operations = []
+    for _, _, name in sorted(comparisons):
+        if name not in operations:
+            operations.append(name)
+
+    return operations
+
+
+def operation_entries(instructions, operations):
+    """
+    Locate the first instruction of each operation's branch. A branch is compiled as a push of the operation name,
+    a comparison, then a JMPIFNOT past the branch, so the branch starts right after the JMPIFNOT. Main dispatches on
+    len(operation) first, but the length tiers compare an integer push (PUSH1-PUSH16, or PUSHBYTES1 past 16), which
+    never matches a name, so only the name comparisons nested in each tier are found.
+
+    :param instructions: list The disassembled script
+    :param operations: list The operation names
+    :return:
+        dict: The entry offset of each operation found
+    """
+    names = dict((name.encode('utf-8'), name) for name in operations)
+
+    entries = {}
+    for index in range(len(instructions) - 2):
+        push, compare, jump = instructions[index:index + 3]
+
+        if not PUSHBYTES1 <= push.opcode <= PUSHDATA4 or push.operand not in names:
+            continue
+        if compare.name not in COMPARISONS or jump.opcode != JMPIFNOT:
+            continue
+
+        name = names[push.operand]
+        if name not in entries:
+            entries[name] = jump.next_offset
+
+    return entries
+
+
+def unlocated_operations(report):
+    """
+    :param report: OrderedDict A cost report
+    :return:
+        list: The operations whose branch couldn't be located in the script, so the report has no costs for them
+    """
+    return [name for name, operation in report['operations'].items() if operation is None]
+
+
+def syscall_counts(instructions):
+    return OrderedDict(sorted(Counter(i.syscall for i in instructions if i.syscall).items()))
+
+
+def cost_report(script, operations):
+    """
+    Build the cost report for a script
+
+    :param script: bytes The .avm script
+    :param operations: list The operation names dispatched by Main
+    :return:
+        OrderedDict: The report, ready to be serialized as JSON
+    """
+    instructions = disassemble(script)
+
+    entries = operation_entries(instructions, operations)
+
+    report = OrderedDict()
+    report['size'] = len(script)
+    report['instructions'] = len(instructions)
+    report['opcodes'] = OrderedDict(sorted(Counter(i.name for i in instructions).items()))
+    report['syscalls'] = syscall_counts(instructions)
+
+    report['operations'] = OrderedDict()
+    for name in operations:
+        if name not in entries:
+            # the branch couldn't be located, e.g. if the compiler changed how comparisons are emitted
+            report['operations'][name] = None
+            continue
+
+        path = reachable(instructions, entries[name])
+
+        operation = OrderedDict()
+        operation['entry'] = entries[name]
+        operation['instructions'] = len(path)
+        operation['bytes'] = sum(i.size for i in path)
+        operation['syscalls'] = syscall_counts(path)
+        report['operations'][name] = operation
+
+    return report
+
+
+def contract_report(avm_path, source_path):
+    """
+    Generate the cost report for a compiled contract
+
+    :param avm_path: str The compiled .avm
+    :param source_path: str The contract entry point source, to find the operation names
+    :return:
+        OrderedDict: The report
+    """
+    with open(avm_path, 'rb') as f:
+        script = f.read()
+
+    with open(source_path, 'r') as f:
+        operations = main_operations(f.read())
+
+    return cost_report(script, operations)
+
+
+def report_savings(baseline, report):
+    """
+    Compare two reports of the same contract, e.g. the dev and prod builds
+
+    :param baseline: OrderedDict The report to compare against
+    :param report: OrderedDict The report of the smaller build
+    :return:
+        OrderedDict: The bytes, instructions and syscalls saved overall, and the instructions saved per operation.
+        operations that couldn't be located in either report are left out
+    """
+    syscalls = set(baseline['syscalls']) | set(report['syscalls'])
+
+    savings = OrderedDict()
+    savings['size'] = baseline['size'] - report['size']
+    savings['instructions'] = baseline['instructions'] - report['instructions']
+    savings['syscalls'] = OrderedDict(
+        (name, baseline['syscalls'].get(name, 0) - report['syscalls'].get(name, 0)) for name in sorted(syscalls))
+
+    savings['operations'] = OrderedDict()
+    for name, operation in report['operations'].items():
+        before = baseline['operations'].get(name)
+        if operation is None or before is None:
+            continue
+        savings['operations'][name] = before['instructions'] - operation['instructions']
+
+    return savings
+
+
+def write_report(report, report_path):
+    """
+    Save a report as JSON. Keys keep a fixed order so that reports from different builds can be diffed.
+    """
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+        f.write('\n')
+
+
+def main(argv):
+    if len(argv) != 2:
+        print('python -m buildtools.report <avm_path> <source_path>')
+        sys.exit(2)
+
+    json.dump(contract_report(argv[0], argv[1]), sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
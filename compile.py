@@ -1,3 +1,262 @@
+"""
+Builds ico_template.avm
+
+The contract source is copied to a temporary directory and helpers marked ``# boa: inline`` are expanded
+(see buildtools/inliner.py) before the copy is compiled with neo-boa. The resulting ico_template.avm is written
+next to this file and its size is reported against the previous build.
+
+Two build profiles are supported (see buildtools/profiles.py):
+
+* ``prod`` (the default) strips the diagnostic ``print()`` calls, which neo-boa compiles into ``Runtime.Log``
+  SYSCALLs. The dev profile is also compiled, to report the script size and per-operation instructions saved.
+* ``dev`` keeps the prints, for debugging on a private net or TestNet.
+
+With ``--optimize``, the compiled script is then run through the peephole optimizer (see buildtools/optimizer.py),
+which folds constant arithmetic, drops redundant stack operations, dead stores and jumps, and re-checks every branch
+target. The optimized script is run against the unoptimized one on every benchmark in the emulator (see
+emulator/equivalence.py) and the build fails if any of them runs differently. The optimizer is off by default until
+it has been checked against a deployed build.
+
+A static cost report (see buildtools/report.py) is written to ico_template.report.json alongside it.
+
+This builds the contract with the ``Token.original_owner`` in the source. build_networks.py builds a variant for every
+network in networks.json instead.
+
+Usage:
+
+python compile.py [--profile prod|dev] [--optimize]
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
 from boa.compiler import Compiler
 
-Compiler.load_and_save('ico_template.py')
+from buildtools.avm import AVMError
+from buildtools.inliner import inline_tree
+from buildtools.networks import apply_network
+from buildtools.optimizer import optimization_report, optimize
+from buildtools.profiles import apply_profile, DEV, PROD, PROFILES
+from buildtools.report import contract_report, main_operations, report_savings, unlocated_operations, write_report
+
+here = os.path.abspath(os.path.dirname(__file__))
+
+CONTRACT = 'ico_template.py'
+
+# everything the contract imports. copied to the build directory to be inlined and compiled
+CONTRACT_SOURCES = [CONTRACT, 'nrve']
+
+
+def prepare_sources(build_dir, profile, original_owner=None):
+    """
+    Copy the contract source to the build directory, inline the marked helpers and apply the build profile
+
+    :param build_dir: str The directory to build in
+    :param profile: str The build profile
+    :param original_owner: bytes The script hash to build with in place of Token.original_owner, if any
+    :return:
+        tuple: The number of helper calls inlined and the number of prints stripped
+    """
+    for source in CONTRACT_SOURCES:
+        path = os.path.join(here, source)
+        if os.path.isdir(path):
+            shutil.copytree(path, os.path.join(build_dir, source), ignore=shutil.ignore_patterns('__pycache__', '*.pyc'))
+        else:
+            shutil.copy(path, build_dir)
+
+    if original_owner is not None:
+        apply_network(build_dir, original_owner)
+
+    inlined = inline_tree(build_dir)
+
+    return inlined, apply_profile(build_dir, profile)
+
+
+def compile_contract(build_dir):
+    """
+    Compile the prepared contract source
+
+    :param build_dir: str The directory holding the prepared source
+    :return:
+        str: The path of the compiled .avm
+    """
+    # neo-boa resolves the contract's imports from the working directory
+    cwd = os.getcwd()
+    sys.path.insert(0, build_dir)
+    os.chdir(build_dir)
+    try:
+        Compiler.load_and_save(CONTRACT)
+    finally:
+        os.chdir(cwd)
+        sys.path.remove(build_dir)
+
+    return os.path.join(build_dir, CONTRACT.replace('.py', '.avm'))
+
+
+def contract_operations():
+    with open(os.path.join(here, CONTRACT), 'r') as f:
+        return main_operations(f.read())
+
+
+def check_optimized(build_dir, built_avm, optimized_avm):
+    """
+    Run the benchmarks against the optimized and the unoptimized script and compare them
+
+    The emulator replaces neo-boa's interop modules when it loads the contract, which would break any later compile in
+    this process, so the check runs in its own
+
+    :param build_dir: str The directory holding the prepared source
+    :param built_avm: str The compiled .avm
+    :param optimized_avm: str The optimized .avm
+    """
+    returncode = subprocess.call([sys.executable, '-m', 'emulator.equivalence', optimized_avm,
+                                  '--reference', built_avm, '--root', build_dir], cwd=here)
+    if returncode != 0:
+        raise AVMError('the optimized script ran differently from the compiled one. build without --optimize')
+
+
+def build(profile, avm_path, optimized=False, original_owner=None):
+    """
+    Build the contract with a profile
+
+    :param profile: str The build profile
+    :param avm_path: str Where to write the compiled .avm
+    :param optimized: bool Whether to run the peephole optimizer over the compiled script
+    :param original_owner: bytes The script hash to build with in place of Token.original_owner, if any
+    :return:
+        tuple: The number of helper calls inlined, the number of prints stripped and the optimization report
+        (None if the optimizer didn't run)
+    """
+    build_dir = tempfile.mkdtemp(prefix='nrve-build-')
+    try:
+        inlined, stripped = prepare_sources(build_dir, profile, original_owner)
+        built_avm = compile_contract(build_dir)
+
+        with open(built_avm, 'rb') as f:
+            script = f.read()
+
+        optimization = None
+        if optimized:
+            optimized_script, counts = optimize(script)
+
+            optimized_avm = os.path.join(build_dir, 'optimized.avm')
+            with open(optimized_avm, 'wb') as f:
+                f.write(optimized_script)
+            check_optimized(build_dir, built_avm, optimized_avm)
+
+            optimization = optimization_report(script, optimized_script, counts, contract_operations())
+            script = optimized_script
+    finally:
+        shutil.rmtree(build_dir)
+
+    with open(avm_path, 'wb') as f:
+        f.write(script)
+
+    return inlined, stripped, optimization
+
+
+def dev_report(optimized, original_owner=None):
+    """
+    Build the dev profile on the side to compare the prod build against
+
+    :param optimized: bool Whether the prod build was optimized
+    :param original_owner: bytes The script hash the prod build was built with, if not the one in the source
+    :return:
+        OrderedDict: The cost report of the dev build
+    """
+    compare_dir = tempfile.mkdtemp(prefix='nrve-dev-')
+    try:
+        avm_path = os.path.join(compare_dir, CONTRACT.replace('.py', '.avm'))
+        build(DEV, avm_path, optimized, original_owner)
+        return contract_report(avm_path, os.path.join(here, CONTRACT))
+    finally:
+        shutil.rmtree(compare_dir)
+
+
+def cost_report(avm_path, profile, optimized, optimization, original_owner=None):
+    """
+    Build the cost report of a build
+
+    :param avm_path: str The compiled .avm
+    :param profile: str The build profile
+    :param optimized: bool Whether the build was optimized
+    :param optimization: OrderedDict The optimization report of the build, or None
+    :param original_owner: bytes The script hash the build was built with, if not the one in the source
+    :return:
+        OrderedDict: The cost report, with the savings against the dev profile for prod builds
+    """
+    report = contract_report(avm_path, os.path.join(here, CONTRACT))
+    report['profile'] = profile
+
+    unlocated = unlocated_operations(report)
+    if unlocated:
+        # the report has no costs for these, and they're left out of the savings. this usually means the compiler
+        # changed how Main compares the operation name, see buildtools/report.py
+        sys.stderr.write("warning: couldn't locate the branch of %d operations in %s, so the cost report leaves them "
+                         "out: %s\n" % (len(unlocated), os.path.basename(avm_path), ', '.join(unlocated)))
+
+    if profile == PROD:
+        report['savings_vs_dev'] = report_savings(dev_report(optimized, original_owner), report)
+
+    if optimization is not None:
+        report['optimizer'] = optimization
+
+    return report
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Build %s' % CONTRACT.replace('.py', '.avm'))
+    parser.add_argument('--profile', choices=PROFILES, default=PROD,
+                        help='prod strips the diagnostic prints, dev keeps them (default: %(default)s)')
+    parser.add_argument('--optimize', action='store_true',
+                        help='run the peephole optimizer, checking the result against the unoptimized script')
+    args = parser.parse_args(argv)
+    optimized = args.optimize
+
+    avm_path = os.path.join(here, CONTRACT.replace('.py', '.avm'))
+    previous_size = os.path.getsize(avm_path) if os.path.exists(avm_path) else None
+
+    inlined, stripped, optimization = build(args.profile, avm_path, optimized)
+
+    size = os.path.getsize(avm_path)
+
+    report_path = os.path.join(here, CONTRACT.replace('.py', '.report.json'))
+    report = cost_report(avm_path, args.profile, optimized, optimization)
+    savings = report.get('savings_vs_dev')
+
+    write_report(report, report_path)
+
+    print("%s profile: inlined %d helper calls, stripped %d prints" % (args.profile, inlined, stripped))
+    if previous_size is None:
+        print("%s: %d bytes" % (os.path.basename(avm_path), size))
+    else:
+        print("%s: %d bytes (previous build: %d bytes, %+d)" % (os.path.basename(avm_path), size, previous_size, size - previous_size))
+
+    if optimization is not None:
+        print("optimizer: %d -> %d bytes, %d -> %d instructions %s" % (
+            optimization['size']['before'], optimization['size']['after'], optimization['instructions']['before'],
+            optimization['instructions']['after'], dict((k, v) for k, v in optimization['passes'].items() if v)))
+
+    if savings is not None:
+        print("saved against the dev profile: %d bytes, %d instructions, %d Runtime.Log syscalls" % (
+            savings['size'], savings['instructions'], savings['syscalls'].get('Neo.Runtime.Log', 0)))
+
+    print("cost report: %s (%d instructions)" % (os.path.basename(report_path), report['instructions']))
+    for name, operation in report['operations'].items():
+        if operation is None:
+            print("  %-28s branch not found" % name)
+            continue
+
+        line = "  %-28s %5d instructions %s" % (name, operation['instructions'], dict(operation['syscalls']))
+        if savings is not None and name in savings['operations']:
+            line += " (%d saved by the profile)" % savings['operations'][name]
+        if optimization is not None and name in optimization['savings']['operations']:
+            line += " (%d saved by the optimizer)" % optimization['savings']['operations'][name]
+        print(line)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
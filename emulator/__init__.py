@@ -0,0 +1,16 @@
+"""
+CPython execution emulator for the NRVE contract
+
+Runs ``ico_template.Main`` in-process with emulated neo-boa interop APIs:
+
+.. code-block:: python
+
+    from emulator import Emulator
+
+    emu = Emulator()
+    owner = emu.contract.Token.original_owner
+    emu.invoke('deploy', [], witnesses=[owner])
+    emu.invoke('crowdsale_register', [address], witnesses=[owner])
+"""
+from emulator.engine import Emulator, Invocation, VMFault, FIXED8, NEO_ASSET_ID, GAS_ASSET_ID
+from emulator.interop import Application, Verification
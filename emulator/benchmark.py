@@ -0,0 +1,543 @@
+"""
+Contract operation benchmarks
+
+Runs every ``Main`` operation against the emulator with representative inputs, e.g. ``mintTokens`` in each phase,
+``crowdsale_register`` with packed address blobs, and the single and batch vesting mints. For each one it records:
+
+* instructions: the CPython bytecodes executed in the contract source (see emulator/profiler.py)
+* storage ops: the ``Storage.Get``, ``Storage.Put`` and ``Storage.Delete`` syscalls
+* wall time: the fastest time of ``Main`` over repeated untraced runs, in microseconds. Like ``timeit``, the
+  minimum is used since it's the least affected by whatever else the machine is doing
+
+``--dispatch`` measures Main's dispatch instead: every operation is invoked once while Main's lines are traced, and
+the length tiers and operation names it's compared against before its branch is entered are counted. neo-boa compiles
+each of those comparisons into the same 8 instructions, so the count gives the dispatch cost of the compiled script.
+
+The results are compared against a baseline (benchmark_baseline.json) and the run fails when any benchmark regresses
+by more than the threshold. The instruction and storage counts are deterministic, so their threshold is tight.
+Instruction counts depend on the Python version's bytecode, so the run fails against a baseline recorded with another
+version until it's re-recorded with ``--update``. The batch operations also run on 4 times the addresses, and the run
+fails if one of them costs more than 4 times as much, so a cost that grows faster than the batch shows up even after
+the baseline is re-recorded. Wall time varies from machine to machine and run to run, so it's only compared when a
+``--time-threshold`` is given, e.g. on the machine that recorded the baseline.
+
+Every benchmark runs against the same state each time: it's prepared once and the storage is restored before every run.
+
+Usage:
+
+python -m emulator.benchmark [--threshold 5] [--time-threshold 50] [--repeat 50] [benchmark ...]
+python -m emulator.benchmark --update
+python -m emulator.benchmark --dispatch
+"""
+import argparse
+import ast
+import gc
+import json
+import os
+import struct
+import sys
+from collections import OrderedDict
+
+from buildtools.report import main_operations
+from emulator import Emulator, FIXED8
+from emulator.engine import ROOT
+from emulator.profiler import INSTRUCTIONS, PHASE_BLOCKS, Profiler, VESTED_TIMESTAMP
+
+BASELINE = os.path.join(ROOT, 'benchmark_baseline.json')
+
+CONTRIBUTOR = b'\x01' * 20
+RECIPIENT = b'\x02' * 20
+SPENDER = b'\x03' * 20
+
+# the metrics compared against the baseline, and the one that uses the wall time threshold
+METRICS = (INSTRUCTIONS, 'storage_ops', 'wall_time_us')
+WALL_TIME = 'wall_time_us'
+
+STORAGE_SYSCALLS = ('Neo.Storage.Get', 'Neo.Storage.Put', 'Neo.Storage.Delete')
+
+# neo-boa compiles each ``length == 8`` or ``operation == 'transfer'`` test in Main into a load of the local
+# (FROMALTSTACK DUP TOALTSTACK PUSH<slot> PICKITEM), a push of the constant, NUMEQUAL and JMPIFNOT
+COMPARISON_INSTRUCTIONS = 8
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+def addresses(count, first=16):
+    """
+    :return: bytes count distinct 20 byte addresses packed together
+    """
+    return b''.join(struct.pack('<I', first + i) * 5 for i in range(count))
+
+
+def records(count, amount, first=16):
+    """
+    :return: bytes count packed 28 byte (address, amount) records
+    """
+    return b''.join(struct.pack('<I', first + i) * 5 + struct.pack('<Q', amount) for i in range(count))
+
+
+class Benchmark():
+    """
+    A contract operation run against a prepared emulator
+
+    :param name: str The benchmark name
+    :param setup: function Called with the emulator and the owner's script hash to prepare the state. returns a
+           function that runs the invocation to measure
+    :param phase: str The public sale phase to prepare (see emulator.profiler.PHASE_BLOCKS), or None to leave the
+           sale unstarted
+    :param deployed: bool Whether to deploy the contract before the setup
+    :param vested: bool Whether to move the clock past every vesting tranche
+    """
+
+    def __init__(self, name, setup, phase='open', deployed=True, vested=False):
+        self.name = name
+        self.setup = setup
+        self.phase = phase
+        self.deployed = deployed
+        self.vested = vested
+
+    def prepare(self, root=None, script=None):
+        """
+        :param root: str The directory holding the contract sources to run. defaults to this repository
+        :param script: bytes A compiled .avm script to run instead of the sources
+        :return:
+            tuple: The prepared emulator and the function that runs the invocation to measure
+        """
+        emu = Emulator(root=root, height=100, script=script)
+        owner = emu.contract.Token.original_owner
+
+        if self.deployed:
+            emu.invoke('deploy', [], witnesses=[owner])
+            emu.invoke('crowdsale_register', [CONTRIBUTOR], witnesses=[owner])
+
+            if self.phase is not None:
+                emu.invoke('start_public_sale', [], witnesses=[owner])
+                emu.advance(PHASE_BLOCKS[self.phase])
+
+        if self.vested:
+            emu.set_timestamp(VESTED_TIMESTAMP)
+
+        return emu, self.setup(emu, owner)
+
+    def run(self, repeat):
+        """
+        :param repeat: int The number of timed runs
+        :return:
+            OrderedDict: The instructions, storage ops (in total and by syscall) and wall time of the operation
+        """
+        emu, invoke = self.prepare()
+        storage = dict(emu.storage)
+
+        with Profiler(emu) as profiler:
+            invocation = invoke()
+
+        if invocation.fault or not invocation.result or invocation.result == 'unknown operation':
+            raise BenchmarkError("%s: %r didn't succeed, so it isn't measuring the operation: %s" % (
+                self.name, invocation, getattr(invocation, 'traceback', '').strip() or invocation.logs))
+
+        times = []
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            for _ in range(repeat):
+                emu.storage = dict(storage)
+                times.append(invoke().elapsed)
+        finally:
+            if collecting:
+                gc.enable()
+
+        result = OrderedDict()
+        result[INSTRUCTIONS] = profiler.profile.totals()[INSTRUCTIONS]
+        result['storage_ops'] = invocation.storage_ops
+        for name in STORAGE_SYSCALLS:
+            result[name] = invocation.syscalls[name]
+        result[WALL_TIME] = round(min(times) * 1000000, 1)
+        return result
+
+
+def contribute(emu, neo=100):
+    emu.contribute(CONTRIBUTOR, neo * FIXED8)
+
+
+def owner_call(operation, args):
+    def setup(emu, owner):
+        return lambda: emu.invoke(operation, args, witnesses=[owner])
+    return setup
+
+
+def contributor_call(operation, args, funded=True):
+    def setup(emu, owner):
+        if funded:
+            contribute(emu)
+        return lambda: emu.invoke(operation, args, witnesses=[CONTRIBUTOR])
+    return setup
+
+
+def mint(emu, owner):
+    tx = emu.transaction(CONTRIBUTOR, 100 * FIXED8)
+    return lambda: emu.invoke('mintTokens', [], witnesses=[CONTRIBUTOR], tx=tx)
+
+
+def verification(emu, owner):
+    tx = emu.transaction(CONTRIBUTOR, 100 * FIXED8)
+    return lambda: emu.verify(tx, witnesses=[CONTRIBUTOR])
+
+
+def transfer_from(emu, owner):
+    contribute(emu)
+    emu.invoke('approve', [CONTRIBUTOR, SPENDER, 10 * FIXED8], witnesses=[CONTRIBUTOR])
+    return lambda: emu.invoke('transferFrom', [CONTRIBUTOR, SPENDER, FIXED8], witnesses=[SPENDER])
+
+
+def allowance(emu, owner):
+    contribute(emu)
+    emu.invoke('approve', [CONTRIBUTOR, SPENDER, 10 * FIXED8], witnesses=[CONTRIBUTOR])
+    return lambda: emu.invoke('allowance', [CONTRIBUTOR, SPENDER])
+
+
+def read(operation, args):
+    def setup(emu, owner):
+        contribute(emu)
+        return lambda: emu.invoke(operation, args)
+    return setup
+
+
+def deregister(count):
+    def setup(emu, owner):
+        emu.invoke('crowdsale_register', [addresses(count)], witnesses=[owner])
+        return lambda: emu.invoke('crowdsale_deregister', [addresses(count)], witnesses=[owner])
+    return setup
+
+
+def pending_owner(invoke_as_new_owner):
+    def setup(emu, owner):
+        emu.invoke('change_owner', [RECIPIENT], witnesses=[owner])
+        witness = RECIPIENT if invoke_as_new_owner else owner
+        operation = 'accept_owner' if invoke_as_new_owner else 'cancel_change_owner'
+        return lambda: emu.invoke(operation, [], witnesses=[witness])
+    return setup
+
+
+def resume(emu, owner):
+    emu.invoke('pause_sale', [], witnesses=[owner])
+    return lambda: emu.invoke('resume_sale', [], witnesses=[owner])
+
+
+def deploy(emu, owner):
+    return lambda: emu.invoke('deploy', [], witnesses=[owner])
+
+
+BENCHMARKS = OrderedDict((benchmark.name, benchmark) for benchmark in [
+    # NEP-5
+    Benchmark('name', read('name', [])),
+    Benchmark('symbol', read('symbol', [])),
+    Benchmark('decimals', read('decimals', [])),
+    Benchmark('totalSupply', read('totalSupply', [])),
+    Benchmark('balanceOf', read('balanceOf', [CONTRIBUTOR])),
+    Benchmark('balancesOf', read('balancesOf', [CONTRIBUTOR + addresses(9)])),
+    Benchmark('transfer', contributor_call('transfer', [CONTRIBUTOR, RECIPIENT, FIXED8])),
+    Benchmark('transfer_many', contributor_call('transfer_many', [CONTRIBUTOR, records(10, FIXED8)])),
+    Benchmark('approve', contributor_call('approve', [CONTRIBUTOR, SPENDER, FIXED8])),
+    Benchmark('allowance', allowance),
+    Benchmark('transferFrom', transfer_from),
+
+    # the public sale
+    Benchmark('verification_day1', verification, phase='day1'),
+    Benchmark('mintTokens_day1', mint, phase='day1'),
+    Benchmark('mintTokens_day2', mint, phase='day2'),
+    Benchmark('mintTokens_open', mint, phase='open'),
+    Benchmark('crowdsale_available', read('crowdsale_available', [])),
+    Benchmark('sale_stats', read('sale_stats', [])),
+
+    # KYC
+    Benchmark('crowdsale_register', owner_call('crowdsale_register', [addresses(50), addresses(50, first=1000)])),
+    Benchmark('crowdsale_register_400', owner_call('crowdsale_register', [addresses(400)])),
+    Benchmark('crowdsale_deregister', deregister(50)),
+    Benchmark('crowdsale_deregister_200', deregister(200)),
+    Benchmark('crowdsale_status', read('crowdsale_status', [CONTRIBUTOR])),
+    Benchmark('crowdsale_status_many', read('crowdsale_status_many', [CONTRIBUTOR + addresses(49)])),
+
+    # owner operations
+    Benchmark('deploy', deploy, deployed=False),
+    Benchmark('start_public_sale', owner_call('start_public_sale', []), phase=None),
+    Benchmark('pause_sale', owner_call('pause_sale', [])),
+    Benchmark('resume_sale', resume),
+    Benchmark('change_owner', owner_call('change_owner', [RECIPIENT])),
+    Benchmark('accept_owner', pending_owner(True)),
+    Benchmark('cancel_change_owner', pending_owner(False)),
+    Benchmark('admin_batch', owner_call('admin_batch', ['crowdsale_register', [addresses(10)], 'pause_sale', [],
+                                                        'resume_sale', []])),
+
+    # pre-sale and vesting mints
+    Benchmark('transfer_presale_tokens', owner_call('transfer_presale_tokens', [RECIPIENT, 800]), phase=None),
+    Benchmark('transfer_presale_tokens_many', owner_call('transfer_presale_tokens_many', [records(10, 800)]), phase=None),
+    Benchmark('transfer_team_tokens', owner_call('transfer_team_tokens', [RECIPIENT, 1000 * FIXED8]), vested=True),
+    Benchmark('transfer_team_tokens_many', owner_call('transfer_team_tokens_many', [records(10, 1000 * FIXED8)]),
+              vested=True),
+    Benchmark('transfer_company_tokens', owner_call('transfer_company_tokens', [RECIPIENT, 1000 * FIXED8]),
+              vested=True),
+    Benchmark('transfer_company_tokens_many', owner_call('transfer_company_tokens_many', [records(10, 1000 * FIXED8)]),
+              vested=True),
+    Benchmark('mint_rewards_tokens', owner_call('mint_rewards_tokens', [RECIPIENT, 1000 * FIXED8]), vested=True),
+    Benchmark('mint_rewards_tokens_many', owner_call('mint_rewards_tokens_many', [records(10, 1000 * FIXED8)]),
+              vested=True),
+])
+
+
+# (benchmark, the same operation on 4 times the addresses). the batch operations have to stay linear in the batch size
+SCALING = [
+    ('crowdsale_register', 'crowdsale_register_400'),
+    ('crowdsale_deregister', 'crowdsale_deregister_200'),
+]
+
+
+def dispatch_comparisons(source):
+    """
+    :param source: str The contract entry point source
+    :return:
+        dict: The ('length', tier) or ('operation', name) comparison on each line of Main's dispatch
+    """
+    comparisons = {}
+    for node in ast.walk(ast.parse(source)):
+        if not (isinstance(node, ast.FunctionDef) and node.name == 'Main'):
+            continue
+
+        for compare in ast.walk(node):
+            if not isinstance(compare, ast.Compare) or len(compare.ops) != 1 or not isinstance(compare.ops[0], ast.Eq):
+                continue
+            left, right = compare.left, compare.comparators[0]
+            if isinstance(left, ast.Name) and left.id in ('length', 'operation'):
+                # ast.Num and ast.Str on the python versions neo-boa runs under, ast.Constant on newer ones
+                comparisons[compare.lineno] = (left.id, getattr(right, 'n', getattr(right, 's', getattr(right, 'value', None))))
+
+    return comparisons
+
+
+def measure_dispatch(root=None):
+    """
+    Count the comparisons Main makes before it enters the branch of each operation
+
+    :param root: str The directory holding the contract sources. defaults to this repository
+    :return:
+        OrderedDict: The length tests, name comparisons and instructions of each operation's dispatch, in source order
+    """
+    with open(os.path.join(root or ROOT, 'ico_template.py'), 'r') as f:
+        source = f.read()
+    comparisons = dispatch_comparisons(source)
+
+    emu = Emulator(root=root, height=100)
+    owner = emu.contract.Token.original_owner
+    main = emu.contract.Main.__code__
+
+    results = OrderedDict()
+    for operation in main_operations(source):
+        made = []
+
+        def trace_main(frame, event, arg):
+            if event == 'line' and frame.f_lineno in comparisons:
+                made.append(comparisons[frame.f_lineno])
+            return trace_main
+
+        def trace(frame, event, arg):
+            return trace_main if frame.f_code is main else None
+
+        # only the dispatch is measured, so the operation runs without arguments and may well fail
+        previous = sys.gettrace()
+        sys.settrace(trace)
+        try:
+            emu.invoke(operation, [], witnesses=[owner])
+        finally:
+            sys.settrace(previous)
+
+        if not made or made[-1] != ('operation', operation):
+            raise BenchmarkError("%s: Main didn't compare the operation against its own name last: %r" % (operation, made))
+
+        tiers = sum(1 for kind, _ in made if kind == 'length')
+        result = OrderedDict()
+        result['length_tests'] = tiers
+        result['name_comparisons'] = len(made) - tiers
+        result['instructions'] = len(made) * COMPARISON_INSTRUCTIONS
+        results[operation] = result
+
+    return results
+
+
+def print_dispatch(results):
+    print('%-30s%14s%18s%14s' % ('operation', 'length tests', 'name comparisons', 'instructions'))
+    for operation, result in sorted(results.items(), key=lambda item: item[1]['instructions']):
+        print('%-30s%14d%18d%14d' % (operation, result['length_tests'], result['name_comparisons'],
+                                     result['instructions']))
+
+
+def python_version():
+    return '%d.%d' % sys.version_info[:2]
+
+
+def run_benchmarks(names, repeat):
+    """
+    :param names: list The benchmarks to run
+    :param repeat: int The number of timed runs of each
+    :return:
+        OrderedDict: The results of each benchmark
+    """
+    return OrderedDict((name, BENCHMARKS[name].run(repeat)) for name in names)
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f, object_pairs_hook=OrderedDict)
+
+
+def write_baseline(path, baseline):
+    with open(path, 'w') as f:
+        json.dump(baseline, f, indent=2)
+        f.write('\n')
+
+
+def compare(baseline, results, threshold, time_threshold):
+    """
+    Compare the results against the baseline
+
+    :param baseline: OrderedDict The baseline
+    :param results: OrderedDict The results of each benchmark
+    :param threshold: float The allowed increase in instructions and storage ops, in percent
+    :param time_threshold: float The allowed increase in wall time, in percent, or None to not compare wall times
+    :return:
+        tuple: A list of (benchmark, metric, baseline value, value) regressions, and a list of notes
+    """
+    regressions = []
+    notes = []
+
+    metrics = list(METRICS)
+    if time_threshold is None:
+        metrics.remove(WALL_TIME)
+
+    for name, result in results.items():
+        expected = baseline['benchmarks'].get(name)
+        if expected is None:
+            notes.append("%s isn't in the baseline" % name)
+            continue
+
+        for metric in metrics:
+            allowed = time_threshold if metric == WALL_TIME else threshold
+            if result[metric] > expected[metric] * (1 + allowed / 100.0):
+                regressions.append((name, metric, expected[metric], result[metric]))
+
+    return regressions, notes
+
+
+def compare_scaling(results, threshold):
+    """
+    Check that the batch operations cost no more than 4 times as much on 4 times the addresses
+
+    :param results: OrderedDict The results of each benchmark
+    :param threshold: float The allowed excess over 4 times the instructions and storage ops, in percent
+    :return:
+        list: (benchmark, metric, the smaller batch's value, value) for every batch that grew faster than its size
+    """
+    regressions = []
+    for small, large in SCALING:
+        if small not in results or large not in results:
+            continue
+        for metric in (INSTRUCTIONS, 'storage_ops'):
+            if results[large][metric] > 4 * results[small][metric] * (1 + threshold / 100.0):
+                regressions.append((large, metric, results[small][metric], results[large][metric]))
+    return regressions
+
+
+def change(before, after):
+    if not before:
+        return '' if not after else 'new'
+    return '%+.1f%%' % ((after - before) * 100.0 / before)
+
+
+def print_results(results, baseline):
+    expected = baseline['benchmarks'] if baseline else {}
+
+    print('%-30s%22s%18s%22s' % ('benchmark', INSTRUCTIONS, 'storage ops', 'wall time (us)'))
+    for name, result in results.items():
+        before = expected.get(name, {})
+        print('%-30s' % name + ''.join('%12s %-9s' % (result[metric], change(before.get(metric), result[metric]))
+                                       for metric in METRICS))
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Benchmark the contract operations against a baseline')
+    parser.add_argument('benchmarks', nargs='*', help='the benchmarks to run (default: all of them)')
+    parser.add_argument('--baseline', default=BASELINE, help='the baseline file (default: benchmark_baseline.json)')
+    parser.add_argument('--threshold', type=float, default=5,
+                        help='the allowed increase in instructions and storage ops, in percent (default: %(default)s)')
+    parser.add_argument('--time-threshold', type=float,
+                        help='the allowed increase in wall time, in percent (default: wall time is not compared)')
+    parser.add_argument('--repeat', type=int, default=50, help='timed runs per benchmark (default: %(default)s)')
+    parser.add_argument('--update', action='store_true', help='record the results as the new baseline')
+    parser.add_argument('--dispatch', action='store_true', help="measure Main's dispatch cost of every operation instead")
+    args = parser.parse_args(argv)
+
+    if args.dispatch:
+        try:
+            print_dispatch(measure_dispatch())
+        except BenchmarkError as e:
+            sys.stderr.write("%s\n" % e)
+            return 2
+        return 0
+
+    unknown = [name for name in args.benchmarks if name not in BENCHMARKS]
+    if unknown:
+        parser.error("unknown benchmarks: %s. available: %s" % (', '.join(unknown), ', '.join(BENCHMARKS)))
+
+    try:
+        results = run_benchmarks(args.benchmarks or list(BENCHMARKS), args.repeat)
+    except BenchmarkError as e:
+        sys.stderr.write("%s\n" % e)
+        return 2
+
+    baseline = load_baseline(args.baseline)
+    print_results(results, baseline)
+
+    if args.update:
+        if baseline is None or baseline.get('python') != python_version():
+            # counts from another Python version can't be mixed in
+            baseline = OrderedDict([('python', python_version()), ('benchmarks', OrderedDict())])
+        baseline['benchmarks'].update(results)
+        write_baseline(args.baseline, baseline)
+        print("\nbaseline written to %s" % args.baseline)
+        return 0
+
+    if baseline is None:
+        print("\nno baseline at %s. run with --update to record one" % args.baseline)
+        return 0
+
+    if baseline.get('python') != python_version():
+        # instruction counts depend on the Python version's bytecode, so the baseline can't be compared
+        print("\nthe baseline was recorded with Python %s, so it can't be compared under %s. re-record it with "
+              "--update" % (baseline.get('python'), python_version()))
+        return 1
+
+    regressions, notes = compare(baseline, results, args.threshold, args.time_threshold)
+    scaling = compare_scaling(results, args.threshold)
+    print()
+    for note in notes:
+        print("note: %s" % note)
+
+    for name, metric, before, after in regressions:
+        print("REGRESSION %s %s: %s -> %s (%s)" % (name, metric, before, after, change(before, after)))
+
+    for name, metric, small, large in scaling:
+        print("SCALING %s %s: %s, more than 4 times the %s of the batch a quarter of its size" % (
+            name, metric, large, small))
+
+    if regressions or scaling:
+        print("%d regressions beyond the thresholds" % (len(regressions) + len(scaling)))
+        return 1
+
+    print("no regressions beyond the thresholds")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
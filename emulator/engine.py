@@ -0,0 +1,294 @@
+"""
+Offline execution engine for ``ico_template.Main``
+"""
+import os
+import time
+import traceback
+from collections import Counter
+
+from emulator import interop
+from emulator.loader import load_contract
+from emulator.script import ScriptContract
+from emulator.vmtypes import VMBytes, to_bytes
+
+NEO_ASSET_ID = b'\x9b|\xff\xda\xa6t\xbe\xae\x0f\x93\x0e\xbe`\x85\xaf\x90\x93\xe5\xfeV\xb3J\\"\x0c\xcd\xcfn\xfc3o\xc5'
+GAS_ASSET_ID = b'\xe7-(iy\xeel\xb1\xb7\xe6]\xfd\xdf\xb2\xe3\x84\x10\x0b\x8d\x14\x8ewX\xdeB\xe4\x16\x8bqy,`'
+
+# the fixed8 multiplier for NEO/GAS amounts
+FIXED8 = 100000000
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class VMFault(Exception):
+    """
+    Raised for operations the VM would refuse, e.g. a Storage.Put during the Verification trigger
+    """
+    pass
+
+
+class Invocation():
+    """
+    The outcome of a single execution of ``Main``
+    """
+
+    def __init__(self, operation, args, trigger, tx):
+        self.operation = operation
+        self.args = args
+        self.trigger = trigger
+        self.tx = tx
+        self.result = None
+        self.fault = None
+        self.events = []
+        self.logs = []
+        self.syscalls = Counter()
+        self.elapsed = 0.0
+        # the AVM instructions executed, when a compiled script was run
+        self.instructions = None
+
+    @property
+    def storage_ops(self):
+        return self.syscalls['Neo.Storage.Get'] + self.syscalls['Neo.Storage.Put'] + self.syscalls['Neo.Storage.Delete']
+
+    def notifications(self, event_name):
+        """
+        :param event_name: str the name of a registered action, e.g. 'transfer'
+        :return:
+            list: the payloads (without the event name) of the matching events
+        """
+        return [event[1:] for event in self.events if isinstance(event, list) and event and event[0] == event_name]
+
+    def __repr__(self):
+        state = 'FAULT' if self.fault else 'HALT'
+        return '<Invocation %s %s -> %r>' % (self.operation, state, self.result)
+
+
+class Emulator():
+    """
+    Runs the contract in-process against in-memory storage and a synthetic chain
+
+    :param root: str the directory holding ``ico_template.py``. defaults to this repository
+    :param script_hash: bytes the script hash of the deployed contract
+    :param height: int the initial block height
+    :param genesis_timestamp: int the header timestamp of block 0
+    :param block_time: int seconds between blocks, used for headers without an explicit timestamp
+    :param script: bytes a compiled .avm script to run instead of the sources (see emulator/script.py). the sources
+           are still loaded, for their constants
+    """
+
+    def __init__(self, root=None, script_hash=b'\xc2\xb1\xd5\xf4e\xc4\xf2\x95\xf3\xa1\x8c\xd2\x0b&\x80\x34\x89\xd5!\xa7',
+                 height=0, genesis_timestamp=1518000000, block_time=23, script=None):
+        self.contract = load_contract(root or ROOT)
+        self.script = ScriptContract(script) if script is not None else None
+        self.script_hash = script_hash
+        self.height = height
+        self.genesis_timestamp = genesis_timestamp
+        self.block_time = block_time
+        self.timestamps = {}
+        self.storage = {}
+        self.events = []
+        self.syscalls = Counter()
+        self.invocations = 0
+
+        self._invocation = None
+        self._witnesses = frozenset()
+        self._journal = None
+        self._handlers = {
+            'Neo.Runtime.GetTrigger': self._get_trigger,
+            'Neo.Runtime.CheckWitness': self._check_witness,
+            'Neo.Runtime.Notify': self._notify,
+            'Neo.Runtime.Log': self._log,
+            'Neo.Runtime.GetTime': self._get_time,
+            'Neo.Storage.Get': self._storage_get,
+            'Neo.Storage.Put': self._storage_put,
+            'Neo.Storage.Delete': self._storage_delete,
+            'Neo.Blockchain.GetHeight': self._get_height,
+            'Neo.Blockchain.GetHeader': self._get_header,
+            'System.ExecutionEngine.GetScriptContainer': self._get_script_container,
+            'System.ExecutionEngine.GetExecutingScriptHash': self._get_executing_script_hash,
+            'System.ExecutionEngine.GetCallingScriptHash': self._get_executing_script_hash,
+            'System.ExecutionEngine.GetEntryScriptHash': self._get_executing_script_hash,
+        }
+
+    # chain
+
+    def timestamp(self, height=None):
+        """
+        :param height: int the block height. defaults to the current height
+        :return:
+            int: the header timestamp of the block
+        """
+        if height is None:
+            height = self.height
+        if height in self.timestamps:
+            return self.timestamps[height]
+        return self.genesis_timestamp + height * self.block_time
+
+    def set_timestamp(self, timestamp, height=None):
+        """
+        Set an explicit header timestamp for a block (the current block by default)
+        """
+        self.timestamps[self.height if height is None else height] = timestamp
+
+    def advance(self, blocks=1):
+        self.height += blocks
+        return self.height
+
+    # transactions
+
+    def transaction(self, sender, neo=0, gas=0):
+        """
+        Build an invocation transaction spending an output of ``sender`` that attaches assets to the contract
+
+        :param sender: bytes the script hash of the sender
+        :param neo: int the NEO sent to the contract, in fixed8 units
+        :param gas: int the GAS sent to the contract, in fixed8 units
+        :return:
+            Transaction: the transaction
+        """
+        outputs = []
+        if neo:
+            outputs.append(interop.Output(self.script_hash, NEO_ASSET_ID, neo))
+        if gas:
+            outputs.append(interop.Output(self.script_hash, GAS_ASSET_ID, gas))
+        # change goes back to the sender
+        outputs.append(interop.Output(sender, NEO_ASSET_ID, 1 * FIXED8))
+        return interop.Transaction(references=[interop.Output(sender, NEO_ASSET_ID)], outputs=outputs)
+
+    # execution
+
+    def invoke(self, operation, args=None, witnesses=(), tx=None, trigger=interop.Application):
+        """
+        Run ``Main(operation, args)``
+
+        Storage changes are rolled back when the execution faults, as they are for a failed transaction.
+
+        :param operation: str the operation
+        :param args: list the operation arguments
+        :param witnesses: iterable of script hashes that CheckWitness accepts
+        :param tx: Transaction the script container. defaults to an empty transaction
+        :param trigger: int Application or Verification
+        :return:
+            Invocation: the result, events, logs and syscall counts of the execution
+        """
+        if args is None:
+            args = []
+        if tx is None:
+            tx = interop.Transaction()
+
+        invocation = Invocation(operation, args, trigger, tx)
+        self._invocation = invocation
+        self._witnesses = frozenset(to_bytes(witness) for witness in witnesses)
+        self._journal = {}
+
+        main = self.script.Main if self.script is not None else self.contract.Main
+
+        previous = interop.activate(self)
+        start = time.perf_counter()
+        try:
+            invocation.result = main(operation, args)
+        except Exception as e:
+            invocation.fault = e
+            invocation.traceback = traceback.format_exc()
+            self._rollback()
+        finally:
+            invocation.elapsed = time.perf_counter() - start
+            if self.script is not None:
+                invocation.instructions = self.script.executed
+            interop.activate(previous)
+            self._invocation = None
+            self._journal = None
+
+        self.invocations += 1
+        self.syscalls.update(invocation.syscalls)
+        if not invocation.fault:
+            self.events.extend(invocation.events)
+
+        return invocation
+
+    def verify(self, tx, witnesses=()):
+        """
+        Run the Verification trigger for a transaction that spends from or sends assets to the contract
+        """
+        return self.invoke(None, [], witnesses=witnesses, tx=tx, trigger=interop.Verification)
+
+    def contribute(self, sender, neo):
+        """
+        Send NEO to the contract the way a wallet does: the transfer is verified first, and only
+        relayed (running ``mintTokens``) when verification passes
+
+        :param sender: bytes the script hash of the contributor
+        :param neo: int the NEO to contribute, in fixed8 units
+        :return:
+            tuple: the Verification Invocation and the Application Invocation (None if rejected)
+        """
+        tx = self.transaction(sender, neo)
+        verification = self.verify(tx, witnesses=[sender])
+        if verification.fault or not verification.result:
+            return verification, None
+        return verification, self.invoke('mintTokens', [], witnesses=[sender], tx=tx)
+
+    def syscall(self, name, *args):
+        invocation = self._invocation
+        if invocation is None:
+            raise VMFault("%s called outside of an invocation" % name)
+        invocation.syscalls[name] += 1
+        handler = self._handlers.get(name)
+        if handler is None:
+            return None
+        return handler(*args)
+
+    def _rollback(self):
+        for key, value in self._journal.items():
+            if value is None:
+                self.storage.pop(key, None)
+            else:
+                self.storage[key] = value
+
+    # syscall handlers
+
+    def _get_trigger(self):
+        return self._invocation.trigger
+
+    def _check_witness(self, script_hash):
+        return to_bytes(script_hash) in self._witnesses
+
+    def _notify(self, arg):
+        self._invocation.events.append(arg)
+
+    def _log(self, message):
+        self._invocation.logs.append(message)
+
+    def _get_time(self):
+        return self.timestamp()
+
+    def _storage_get(self, key):
+        return VMBytes(self.storage.get(to_bytes(key), b''))
+
+    def _storage_put(self, key, value):
+        if self._invocation.trigger == interop.Verification:
+            raise VMFault("method Neo.Storage.Put not found")
+        key = to_bytes(key)
+        if key not in self._journal:
+            self._journal[key] = self.storage.get(key)
+        self.storage[key] = to_bytes(value)
+
+    def _storage_delete(self, key):
+        if self._invocation.trigger == interop.Verification:
+            raise VMFault("method Neo.Storage.Delete not found")
+        key = to_bytes(key)
+        if key not in self._journal:
+            self._journal[key] = self.storage.get(key)
+        self.storage.pop(key, None)
+
+    def _get_height(self):
+        return self.height
+
+    def _get_header(self, height):
+        return interop.Header(height, self.timestamp(int(height)))
+
+    def _get_script_container(self):
+        return self._invocation.tx
+
+    def _get_executing_script_hash(self):
+        return VMBytes(self.script_hash)
@@ -0,0 +1,97 @@
+"""
+Checks a compiled script against what it was built from
+
+Every benchmark (see emulator/benchmark.py) is prepared and run twice, once against the script and once against a
+reference: the contract sources, or the unoptimized script when checking the peephole optimizer. The two runs must
+agree on whether the operation faulted, its result, its events, its logs and the storage it left behind. Results and
+events are compared as the bytes they convert to (see ``emulator.script.canonical``), since the source returns
+``True`` and ``'unknown operation'`` where the script leaves ``1`` and a byte array.
+
+Usage:
+
+python -m emulator.equivalence ico_template.avm [benchmark ...] [--reference unoptimized.avm] [--root build_dir]
+"""
+import argparse
+import sys
+
+from emulator.benchmark import BENCHMARKS
+from emulator.script import canonical
+
+
+def outcome(benchmark, root=None, script=None):
+    """
+    Run a benchmark
+
+    :param benchmark: Benchmark The benchmark
+    :param root: str The directory holding the contract sources. defaults to this repository
+    :param script: bytes The compiled script to run, or None to run the sources
+    :return:
+        tuple: Whether it faulted, and its result, events, logs and the storage afterwards
+    """
+    emu, invoke = benchmark.prepare(root, script)
+    invocation = invoke()
+    if invocation.fault:
+        # the source and the script fault with different exceptions, and neither leaves a result
+        return True, None, [], [], emu.storage
+    return False, canonical(invocation.result), canonical(invocation.events), canonical(invocation.logs), emu.storage
+
+
+def differences(script, reference=None, root=None, names=None):
+    """
+    Compare a script against a reference across the benchmarks
+
+    :param script: bytes The compiled script
+    :param reference: bytes The script to compare against, or None to compare against the sources
+    :param root: str The directory holding the sources the script was compiled from. defaults to this repository
+    :param names: list The benchmarks to run. defaults to all of them
+    :return:
+        list: (benchmark name, description) of every benchmark that ran differently
+    """
+    found = []
+    for name in names or list(BENCHMARKS):
+        benchmark = BENCHMARKS[name]
+        actual = outcome(benchmark, root, script)
+        expected = outcome(benchmark, root, reference)
+
+        for field, before, after in zip(('fault', 'result', 'events', 'logs', 'storage'), expected, actual):
+            if before != after:
+                found.append((name, '%s: expected %r, got %r' % (field, before, after)))
+                break
+
+    return found
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Check a compiled contract against its sources or another build')
+    parser.add_argument('avm_path', help='the compiled .avm')
+    parser.add_argument('benchmarks', nargs='*', help='the benchmarks to run (default: all of them)')
+    parser.add_argument('--reference', help='an .avm to compare against instead of the sources, e.g. the unoptimized build')
+    parser.add_argument('--root', help='the directory holding the sources the .avm was compiled from (default: this repository)')
+    args = parser.parse_args(argv)
+
+    unknown = [name for name in args.benchmarks if name not in BENCHMARKS]
+    if unknown:
+        parser.error("unknown benchmarks: %s. available: %s" % (', '.join(unknown), ', '.join(BENCHMARKS)))
+
+    with open(args.avm_path, 'rb') as f:
+        script = f.read()
+
+    reference = None
+    if args.reference:
+        with open(args.reference, 'rb') as f:
+            reference = f.read()
+
+    found = differences(script, reference, args.root, args.benchmarks)
+    for name, description in found:
+        print("MISMATCH %s %s" % (name, description))
+
+    if found:
+        print("%d of %d benchmarks ran differently" % (len(found), len(args.benchmarks or BENCHMARKS)))
+        return 1
+
+    print("%d benchmarks ran the same" % len(args.benchmarks or BENCHMARKS))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
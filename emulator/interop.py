@@ -0,0 +1,310 @@
+"""
+In-process replacements for the ``boa`` interop modules imported by the contract
+
+Every interop call is routed to the active ``Emulator`` (see ``activate``) and counted under its NEO
+syscall name, e.g. ``Neo.Storage.Get``.
+"""
+import importlib.util
+import sys
+import types
+
+from emulator import vmtypes
+
+Application = 0x10
+Verification = 0x00
+
+_engine = None
+
+
+def activate(engine):
+    """
+    Route interop calls to an engine
+
+    :param engine: Emulator the engine to use, or None
+    :return:
+        Emulator: the previously active engine
+    """
+    global _engine
+    previous = _engine
+    _engine = engine
+    return previous
+
+
+def current():
+    if _engine is None:
+        raise RuntimeError("no emulator is active")
+    return _engine
+
+
+class StorageContext():
+    """
+    Storage context handle returned by GetContext
+    """
+    pass
+
+
+class Header():
+
+    def __init__(self, height, timestamp):
+        self._height = height
+        self._timestamp = timestamp
+
+    @property
+    def Index(self):
+        current().syscall('Neo.Header.GetIndex')
+        return self._height
+
+    @property
+    def Timestamp(self):
+        current().syscall('Neo.Header.GetTimestamp')
+        return self._timestamp
+
+
+class Output():
+    """
+    A transaction output (also used for the outputs referenced by the inputs)
+    """
+
+    def __init__(self, script_hash, asset_id=b'', value=0):
+        self._script_hash = vmtypes.VMBytes(script_hash)
+        self._asset_id = vmtypes.VMBytes(asset_id)
+        self._value = value
+
+    @property
+    def ScriptHash(self):
+        current().syscall('Neo.Output.GetScriptHash')
+        return self._script_hash
+
+    @property
+    def AssetId(self):
+        current().syscall('Neo.Output.GetAssetId')
+        return self._asset_id
+
+    @property
+    def Value(self):
+        current().syscall('Neo.Output.GetValue')
+        return self._value
+
+
+class Transaction():
+    """
+    A synthetic invocation transaction
+    """
+
+    def __init__(self, references=None, outputs=None, tx_hash=b'\x00' * 32):
+        self._references = list(references or [])
+        self._outputs = list(outputs or [])
+        self._hash = tx_hash
+
+    @property
+    def Hash(self):
+        current().syscall('Neo.Transaction.GetHash')
+        return self._hash
+
+    @property
+    def References(self):
+        current().syscall('Neo.Transaction.GetReferences')
+        return list(self._references)
+
+    @property
+    def Outputs(self):
+        current().syscall('Neo.Transaction.GetOutputs')
+        return list(self._outputs)
+
+
+# Neo.Runtime
+
+def GetTrigger():
+    return current().syscall('Neo.Runtime.GetTrigger')
+
+
+def CheckWitness(hash_or_pubkey):
+    return current().syscall('Neo.Runtime.CheckWitness', hash_or_pubkey)
+
+
+def Notify(arg):
+    current().syscall('Neo.Runtime.Notify', arg)
+
+
+def Log(message):
+    current().syscall('Neo.Runtime.Log', message)
+
+
+def GetTime():
+    return current().syscall('Neo.Runtime.GetTime')
+
+
+# Neo.Storage
+
+def GetContext():
+    if _engine is not None:
+        _engine.syscall('Neo.Storage.GetContext')
+    return StorageContext()
+
+
+def Get(context, key):
+    return current().syscall('Neo.Storage.Get', key)
+
+
+def Put(context, key, value):
+    current().syscall('Neo.Storage.Put', key, value)
+
+
+def Delete(context, key):
+    current().syscall('Neo.Storage.Delete', key)
+
+
+# Neo.Blockchain
+
+def GetHeight():
+    return current().syscall('Neo.Blockchain.GetHeight')
+
+
+def GetHeader(height):
+    return current().syscall('Neo.Blockchain.GetHeader', height)
+
+
+# Neo.Transaction / Neo.Output
+
+def GetReferences(transaction):
+    return transaction.References
+
+
+def GetOutputs(transaction):
+    return transaction.Outputs
+
+
+def GetHash(transaction):
+    return transaction.Hash
+
+
+def GetValue(output):
+    return output.Value
+
+
+def GetAssetId(output):
+    return output.AssetId
+
+
+def GetScriptHash(output):
+    return output.ScriptHash
+
+
+# System.ExecutionEngine
+
+def GetScriptContainer():
+    return current().syscall('System.ExecutionEngine.GetScriptContainer')
+
+
+def GetExecutingScriptHash():
+    return current().syscall('System.ExecutionEngine.GetExecutingScriptHash')
+
+
+def GetCallingScriptHash():
+    return current().syscall('System.ExecutionEngine.GetCallingScriptHash')
+
+
+def GetEntryScriptHash():
+    return current().syscall('System.ExecutionEngine.GetEntryScriptHash')
+
+
+# Neo.Action
+
+def RegisterAction(event_name, *args):
+    """
+    Events are dispatched as a Notify of [event_name, *args], the same as the compiled contract
+    """
+    def action(*params):
+        Notify([event_name] + list(params))
+
+    action.event_name = event_name
+    return action
+
+
+def _range(start, stop):
+    return list(range(vmtypes.to_int(start), vmtypes.to_int(stop)))
+
+
+_MODULES = {
+    'boa.blockchain.vm.Neo.Runtime': {
+        'GetTrigger': GetTrigger, 'CheckWitness': CheckWitness, 'Notify': Notify, 'Log': Log, 'GetTime': GetTime,
+    },
+    'boa.blockchain.vm.Neo.TriggerType': {
+        'Application': Application, 'Verification': Verification,
+    },
+    'boa.blockchain.vm.Neo.Storage': {
+        'GetContext': GetContext, 'Get': Get, 'Put': Put, 'Delete': Delete,
+    },
+    'boa.blockchain.vm.Neo.Blockchain': {
+        'GetHeight': GetHeight, 'GetHeader': GetHeader,
+    },
+    'boa.blockchain.vm.Neo.Header': {
+        'Header': Header,
+    },
+    'boa.blockchain.vm.Neo.Action': {
+        'RegisterAction': RegisterAction,
+    },
+    'boa.blockchain.vm.Neo.Transaction': {
+        'Transaction': Transaction, 'GetReferences': GetReferences, 'GetOutputs': GetOutputs, 'GetHash': GetHash,
+    },
+    'boa.blockchain.vm.Neo.Output': {
+        'GetValue': GetValue, 'GetAssetId': GetAssetId, 'GetScriptHash': GetScriptHash,
+    },
+    'boa.blockchain.vm.System.ExecutionEngine': {
+        'GetScriptContainer': GetScriptContainer, 'GetExecutingScriptHash': GetExecutingScriptHash,
+        'GetCallingScriptHash': GetCallingScriptHash, 'GetEntryScriptHash': GetEntryScriptHash,
+    },
+    'boa.code.builtins': {
+        'concat': vmtypes.concat, 'substr': vmtypes.substr, 'take': vmtypes.take, 'range': _range, 'list': list,
+    },
+}
+
+
+def install():
+    """
+    Register the interop modules in ``sys.modules``
+
+    Parent packages come from neo-boa when it is installed, so the real compiler stays importable. The replacements
+    keep the ``__file__`` of the neo-boa module they stand in for, since the compiler reads the source of every module
+    the contract imports from there.
+    """
+    for name, members in _MODULES.items():
+        parts = name.split('.')
+        for i in range(1, len(parts)):
+            _ensure_package('.'.join(parts[:i]))
+
+        module = types.ModuleType(name)
+        module.__dict__.update(members)
+        origin = _origin(name)
+        if origin is not None:
+            module.__file__ = origin
+        sys.modules[name] = module
+        setattr(sys.modules['.'.join(parts[:-1])], parts[-1], module)
+
+
+def _origin(name):
+    if isinstance(sys.modules.get(name), types.ModuleType) and getattr(sys.modules[name], '__file__', None):
+        return sys.modules[name].__file__
+    try:
+        spec = importlib.util.find_spec(name)
+    except (ImportError, ValueError):
+        return None
+    return spec.origin if spec is not None else None
+
+
+def _ensure_package(name):
+    if name in sys.modules:
+        return
+    try:
+        if importlib.util.find_spec(name) is not None:
+            importlib.import_module(name)
+            return
+    except ImportError:
+        pass
+
+    package = types.ModuleType(name)
+    package.__path__ = []
+    sys.modules[name] = package
+    if '.' in name:
+        parent, child = name.rsplit('.', 1)
+        setattr(sys.modules[parent], child, package)
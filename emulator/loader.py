@@ -0,0 +1,206 @@
+"""
+Import hook that loads the contract sources with the VM's semantics
+
+The contract modules (``ico_template`` and the ``nrve`` package) are compiled from source with four
+adjustments that make CPython behave like the compiled contract:
+
+* ``/`` and ``%`` are integer operations that truncate towards zero, as DIV and MOD do.
+* class attributes initialized by a call (e.g. ``ctx = GetContext()``) are evaluated for every new
+  instance, because neo-boa builds a new struct for every instantiation.
+* ``print`` is a ``Neo.Runtime.Log`` syscall.
+* instances of the contract's classes are copied when they're bound to a parameter (``self`` included), assigned or
+  appended, because neo-boa compiles classes to structs and the VM clones a struct whenever it's stored in an array,
+  locals included. A method that changes ``self`` or an argument therefore doesn't change the caller's instance.
+"""
+import ast
+import importlib.abc
+import importlib.util
+import os
+import sys
+
+from emulator import interop, vmtypes
+
+CONTRACT_PACKAGES = ('nrve',)
+CONTRACT_MODULES = ('ico_template',)
+
+
+class VMSemantics(ast.NodeTransformer):
+    """
+    Rewrites the contract AST so that CPython follows the VM's semantics
+    """
+
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        helper = self._helper(node.op)
+        if helper is None:
+            return node
+        call = ast.Call(func=ast.Name(id=helper, ctx=ast.Load()), args=[node.left, node.right], keywords=[])
+        return ast.copy_location(call, node)
+
+    def visit_AugAssign(self, node):
+        self.generic_visit(node)
+        helper = self._helper(node.op)
+        if helper is None:
+            return node
+        load_target = _as_load(node.target)
+        call = ast.Call(func=ast.Name(id=helper, ctx=ast.Load()), args=[load_target, node.value], keywords=[])
+        assign = ast.Assign(targets=[node.target], value=call)
+        return ast.copy_location(assign, node)
+
+    def visit_FunctionDef(self, node):
+        self.generic_visit(node)
+
+        names = [arg.arg for arg in node.args.args]
+        if not names:
+            return node
+
+        # the arguments are copied into the callee's locals array, after the docstring so that it's kept
+        copies = [ast.Assign(targets=[ast.Name(id=name, ctx=ast.Store())], value=_copy_call(ast.Name(id=name, ctx=ast.Load())))
+                  for name in names]
+        start = 1 if ast.get_docstring(node) is not None and len(node.body) > 1 else 0
+        for statement in copies:
+            ast.copy_location(statement, node.body[start])
+        node.body[start:start] = copies
+        return node
+
+    def visit_Assign(self, node):
+        self.generic_visit(node)
+        # a struct can only come from a variable, a field, an item or a call
+        if isinstance(node.value, (ast.Name, ast.Attribute, ast.Subscript, ast.Call)):
+            node.value = ast.copy_location(_copy_call(node.value), node.value)
+        return node
+
+    def visit_Call(self, node):
+        self.generic_visit(node)
+        if isinstance(node.func, ast.Attribute) and node.func.attr == 'append' and len(node.args) == 1:
+            node.args = [ast.copy_location(_copy_call(node.args[0]), node.args[0])]
+        return node
+
+    def visit_ClassDef(self, node):
+        self.generic_visit(node)
+
+        # marks the class's instances as structs for __vm_copy__
+        node.body.append(ast.copy_location(ast.parse('__vm_struct__ = True').body[0], node))
+
+        per_instance = []
+        for statement in node.body:
+            if isinstance(statement, ast.Assign) and isinstance(statement.value, ast.Call) \
+                    and len(statement.targets) == 1 and isinstance(statement.targets[0], ast.Name):
+                target = ast.Attribute(value=ast.Name(id='self', ctx=ast.Load()), attr=statement.targets[0].id, ctx=ast.Store())
+                per_instance.append(ast.copy_location(ast.Assign(targets=[target], value=statement.value), statement))
+
+        if per_instance:
+            init = ast.parse('def __init__(self):\n    pass\n').body[0]
+            init.body = per_instance
+            node.body.append(ast.copy_location(init, per_instance[0]))
+
+        return node
+
+    @staticmethod
+    def _helper(op):
+        if isinstance(op, (ast.Div, ast.FloorDiv)):
+            return '__vm_div__'
+        if isinstance(op, ast.Mod):
+            return '__vm_mod__'
+        return None
+
+
+def _as_load(target):
+    if isinstance(target, ast.Name):
+        return ast.copy_location(ast.Name(id=target.id, ctx=ast.Load()), target)
+    if isinstance(target, ast.Attribute):
+        return ast.copy_location(ast.Attribute(value=target.value, attr=target.attr, ctx=ast.Load()), target)
+    if isinstance(target, ast.Subscript):
+        return ast.copy_location(ast.Subscript(value=target.value, slice=target.slice, ctx=ast.Load()), target)
+    raise TypeError("unsupported augmented assignment target")
+
+
+def _copy_call(value):
+    return ast.Call(func=ast.Name(id='__vm_copy__', ctx=ast.Load()), args=[value], keywords=[])
+
+
+def _copy(value):
+    """
+    Copy an instance of a contract class the way the VM clones a struct: nested instances are copied as well, while
+    lists are arrays and stay shared. Any other value is returned as is
+    """
+    if not getattr(value, '__vm_struct__', False):
+        return value
+
+    copied = object.__new__(type(value))
+    for name, item in vars(value).items():
+        setattr(copied, name, _copy(item))
+    return copied
+
+
+def _log(*args):
+    interop.Log(' '.join(str(arg) for arg in args))
+
+
+class ContractLoader(importlib.abc.Loader):
+
+    def __init__(self, path):
+        self.path = path
+
+    def create_module(self, spec):
+        return None
+
+    def exec_module(self, module):
+        with open(self.path, 'r') as f:
+            source = f.read()
+
+        tree = VMSemantics().visit(ast.parse(source, self.path))
+        ast.fix_missing_locations(tree)
+
+        module.__dict__['__vm_div__'] = vmtypes.vm_div
+        module.__dict__['__vm_mod__'] = vmtypes.vm_mod
+        module.__dict__['__vm_copy__'] = _copy
+        module.__dict__['print'] = _log
+
+        exec(compile(tree, self.path, 'exec'), module.__dict__)
+
+
+class ContractFinder(importlib.abc.MetaPathFinder):
+    """
+    Finds the contract modules under ``root`` and loads them with ``ContractLoader``
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def find_spec(self, fullname, path=None, target=None):
+        top = fullname.split('.')[0]
+        if top not in CONTRACT_PACKAGES and fullname not in CONTRACT_MODULES:
+            return None
+
+        base = os.path.join(self.root, *fullname.split('.'))
+        if os.path.isdir(base):
+            init = os.path.join(base, '__init__.py')
+            return importlib.util.spec_from_file_location(fullname, init, loader=ContractLoader(init),
+                                                          submodule_search_locations=[base])
+        if os.path.isfile(base + '.py'):
+            return importlib.util.spec_from_file_location(fullname, base + '.py', loader=ContractLoader(base + '.py'))
+
+        return None
+
+
+def load_contract(root):
+    """
+    Load the contract entry module (``ico_template``) from ``root``
+
+    Any previously imported contract modules are discarded so that every module is loaded by the finder.
+
+    :param root: str the directory containing the contract entry module
+    :return:
+        module: the loaded entry module
+    """
+    interop.install()
+
+    for name in list(sys.modules):
+        if name.split('.')[0] in CONTRACT_PACKAGES or name in CONTRACT_MODULES:
+            del sys.modules[name]
+
+    sys.meta_path[:] = [finder for finder in sys.meta_path if not isinstance(finder, ContractFinder)]
+    sys.meta_path.insert(0, ContractFinder(os.path.abspath(root)))
+
+    return importlib.import_module(CONTRACT_MODULES[0])
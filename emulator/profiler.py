@@ -0,0 +1,345 @@
+"""
+Instruction and syscall profiler for contract operations
+
+Runs an invocation under ``sys.settrace`` and attributes its cost to the contract call stack, down to the source line:
+
+* instructions: the CPython bytecodes executed in the contract source, or the lines executed on Pythons without
+  opcode tracing (before 3.7). Like the emulator's other counts this is a proxy for the compiled script's instructions,
+  but it lands on the same lines.
+* every syscall made, e.g. ``Neo.Storage.Get``, ``Neo.Runtime.CheckWitness`` and ``Neo.Runtime.Notify``, attributed
+  to the contract line that made it. Events raised via ``RegisterAction`` land on the line that raised them.
+
+Only contract frames (``ico_template`` and the ``nrve`` package) are recorded. Emulator and VM type helpers are
+charged to the contract line that called them.
+
+The output is in the collapsed stack format read by flame graph tools such as ``flamegraph.pl`` and speedscope: one
+line per stack, with frames separated by ``;`` and followed by the count. Each frame is labelled
+``module:function:line``, so a function called from two places shows up as two boxes.
+
+.. code-block:: python
+
+    from emulator import Emulator
+    from emulator.profiler import Profiler
+
+    with Profiler(emu) as profiler:
+        emu.invoke('mintTokens', [], witnesses=[sender], tx=tx)
+    print('\\n'.join(profiler.profile.collapsed('Neo.Storage.Get')))
+
+Usage:
+
+python -m emulator.profiler mintTokens [--phase day1|day2|open] [--metric instructions] [--output mint.folded]
+python -m emulator.profiler transfer_company_tokens --summary
+"""
+import argparse
+import linecache
+import os
+import sys
+from collections import Counter, OrderedDict, defaultdict
+
+from emulator import Emulator, FIXED8
+from emulator.loader import CONTRACT_MODULES, CONTRACT_PACKAGES
+
+INSTRUCTIONS = 'instructions'
+
+# the columns of the summary table, after the instructions
+SUMMARY_SYSCALLS = ('Neo.Storage.Get', 'Neo.Storage.Put', 'Neo.Storage.Delete', 'Neo.Runtime.CheckWitness',
+                    'Neo.Runtime.Notify')
+
+# f_trace_opcodes was added in Python 3.7
+OPCODE_TRACING = hasattr(sys._getframe(), 'f_trace_opcodes')
+
+
+def is_contract_frame(frame):
+    name = frame.f_globals.get('__name__', '')
+    return name in CONTRACT_MODULES or name.split('.')[0] in CONTRACT_PACKAGES
+
+
+def frame_function(frame):
+    code = frame.f_code
+    qualname = getattr(code, 'co_qualname', None)
+    if qualname:
+        return qualname
+
+    # co_qualname is new in 3.11. methods are found through self, which is all the contract needs
+    instance = frame.f_locals.get('self')
+    if instance is not None:
+        return '%s.%s' % (type(instance).__name__, code.co_name)
+    return code.co_name
+
+
+class Profile():
+    """
+    The cost of one or more invocations, by contract call stack
+
+    A stack is a tuple of (module, function, path, line) frames, outermost first. The line of every frame but the
+    innermost is the line of the call into the next frame.
+    """
+
+    def __init__(self, unit):
+        self.unit = unit
+        self.samples = defaultdict(Counter)
+
+    def add(self, stack, metric, count=1):
+        self.samples[stack][metric] += count
+
+    def metrics(self):
+        names = set()
+        for counts in self.samples.values():
+            names.update(counts)
+        return sorted(names, key=lambda name: (name != INSTRUCTIONS, name))
+
+    def totals(self):
+        totals = Counter()
+        for counts in self.samples.values():
+            totals.update(counts)
+        return totals
+
+    def collapsed(self, metric=INSTRUCTIONS, root=None):
+        """
+        :param metric: str INSTRUCTIONS or a syscall name
+        :param root: str an optional frame to put at the bottom of every stack, e.g. the operation name
+        :return:
+            list: "frame;frame;frame count" lines for the stacks with a non-zero count, sorted by stack
+        """
+        lines = []
+        for stack, counts in self.samples.items():
+            count = counts[metric]
+            if not count:
+                continue
+            frames = ['%s:%s:%d' % (module.split('.')[-1], function, line) for module, function, _, line in stack]
+            if root:
+                frames.insert(0, root)
+            lines.append('%s %d' % (';'.join(frames), count))
+        return sorted(lines)
+
+    def lines(self, metric=INSTRUCTIONS):
+        """
+        The self cost of every source line: what the line itself executed, not counting the functions it called
+
+        :param metric: str the metric to sort by
+        :return:
+            list: ((path, line, function), Counter) pairs, most expensive first
+        """
+        by_line = defaultdict(Counter)
+        for stack, counts in self.samples.items():
+            _, function, path, line = stack[-1]
+            by_line[(path, line, function)].update(counts)
+        return sorted(by_line.items(), key=lambda item: (-item[1][metric], item[0]))
+
+    def functions(self, metric=INSTRUCTIONS):
+        """
+        The inclusive cost of every function: what it executed along with everything it called. A recursive call is
+        only counted once
+
+        :param metric: str the metric to sort by
+        :return:
+            list: (function, Counter) pairs, most expensive first
+        """
+        by_function = defaultdict(Counter)
+        for stack, counts in self.samples.items():
+            for function in set(frame[1] for frame in stack):
+                by_function[function].update(counts)
+        return sorted(by_function.items(), key=lambda item: (-item[1][metric], item[0]))
+
+
+class Profiler():
+    """
+    Profiles the invocations run against an emulator inside a ``with`` block
+
+    :param emulator: Emulator the emulator to profile
+    :param opcodes: bool count bytecodes rather than lines, when the Python version supports it
+    """
+
+    def __init__(self, emulator, opcodes=True):
+        self.emulator = emulator
+        self.opcodes = opcodes and OPCODE_TRACING
+        self.profile = Profile('opcodes' if self.opcodes else 'lines')
+        self._previous_trace = None
+
+    def __enter__(self):
+        syscall = self.emulator.syscall
+
+        def profiled_syscall(name, *args):
+            self.profile.add(self.stack(sys._getframe(1)), name)
+            return syscall(name, *args)
+
+        self.emulator.syscall = profiled_syscall
+
+        self._previous_trace = sys.gettrace()
+        sys.settrace(self._trace_call)
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        sys.settrace(self._previous_trace)
+        # drop the instance attribute to get the Emulator method back
+        del self.emulator.syscall
+        return False
+
+    def stack(self, frame):
+        """
+        :param frame: frame the innermost frame
+        :return:
+            tuple: The contract frames of the stack, outermost first
+        """
+        stack = []
+        while frame is not None:
+            if is_contract_frame(frame):
+                # f_lineno is None for the opcodes that set up a frame before its first line on newer Pythons
+                line = frame.f_lineno or frame.f_code.co_firstlineno
+                stack.append((frame.f_globals['__name__'], frame_function(frame), frame.f_code.co_filename, line))
+            frame = frame.f_back
+        stack.reverse()
+        return tuple(stack)
+
+    def _trace_call(self, frame, event, arg):
+        if event != 'call' or not is_contract_frame(frame):
+            # calls made from this frame are still seen, since this is the global trace function
+            return None
+
+        if self.opcodes:
+            frame.f_trace_opcodes = True
+            frame.f_trace_lines = False
+
+        return self._trace_frame
+
+    def _trace_frame(self, frame, event, arg):
+        if event == ('opcode' if self.opcodes else 'line'):
+            self.profile.add(self.stack(frame), INSTRUCTIONS)
+        return self._trace_frame
+
+
+# scenarios for the command line. each one prepares an emulator and returns it with a function that runs the
+# invocation to profile
+
+CONTRIBUTOR = b'\x01' * 20
+RECIPIENT = b'\x02' * 20
+
+# blocks to advance after starting the public sale to reach each phase
+PHASE_BLOCKS = OrderedDict([('day1', 1), ('day2', 5761 + 1), ('open', (2 * 5761) + 1)])
+
+# a header timestamp by which every company and team tranche has unlocked
+VESTED_TIMESTAMP = 1640908800
+
+
+def sale_emulator(phase):
+    """
+    :param phase: str the public sale phase to advance to, or None to leave the sale unstarted
+    :return:
+        tuple: An emulator with the contract deployed and the contributor registered, and the owner's script hash
+    """
+    emu = Emulator(height=100)
+    owner = emu.contract.Token.original_owner
+    emu.invoke('deploy', [], witnesses=[owner])
+    emu.invoke('crowdsale_register', [CONTRIBUTOR], witnesses=[owner])
+
+    if phase is not None:
+        emu.invoke('start_public_sale', [], witnesses=[owner])
+        emu.advance(PHASE_BLOCKS[phase])
+
+    return emu, owner
+
+
+def contribution_scenario(options):
+    emu, _ = sale_emulator(options.phase)
+    tx = emu.transaction(CONTRIBUTOR, options.neo * FIXED8)
+    return emu, lambda: emu.invoke('mintTokens', [], witnesses=[CONTRIBUTOR], tx=tx)
+
+
+def verification_scenario(options):
+    emu, _ = sale_emulator(options.phase)
+    tx = emu.transaction(CONTRIBUTOR, options.neo * FIXED8)
+    return emu, lambda: emu.verify(tx, witnesses=[CONTRIBUTOR])
+
+
+def transfer_scenario(options):
+    emu, _ = sale_emulator(options.phase)
+    emu.contribute(CONTRIBUTOR, options.neo * FIXED8)
+    return emu, lambda: emu.invoke('transfer', [CONTRIBUTOR, RECIPIENT, 1], witnesses=[CONTRIBUTOR])
+
+
+def owner_scenario(operation, args):
+    def scenario(options):
+        emu, owner = sale_emulator(options.phase)
+        emu.set_timestamp(VESTED_TIMESTAMP)
+        return emu, lambda: emu.invoke(operation, args, witnesses=[owner])
+    return scenario
+
+
+SCENARIOS = OrderedDict([
+    ('mintTokens', contribution_scenario),
+    ('verification', verification_scenario),
+    ('transfer', transfer_scenario),
+    ('transfer_presale_tokens', owner_scenario('transfer_presale_tokens', [RECIPIENT, 800])),
+    ('transfer_company_tokens', owner_scenario('transfer_company_tokens', [RECIPIENT, 1000 * FIXED8])),
+    ('transfer_team_tokens', owner_scenario('transfer_team_tokens', [RECIPIENT, 1000 * FIXED8])),
+    ('mint_rewards_tokens', owner_scenario('mint_rewards_tokens', [RECIPIENT, 1000 * FIXED8])),
+    ('crowdsale_register', owner_scenario('crowdsale_register', [b''.join(bytes([i]) * 20 for i in range(3, 13))])),
+    ('sale_stats', owner_scenario('sale_stats', [])),
+])
+
+
+def print_summary(profile, invocation, top):
+    columns = [INSTRUCTIONS] + [name for name in SUMMARY_SYSCALLS if name in profile.metrics()]
+    headers = ['%s (%s)' % (INSTRUCTIONS, profile.unit)] + [name.split('.')[-1] for name in columns[1:]]
+
+    totals = profile.totals()
+    print("%r: %s" % (invocation, ', '.join('%s %d' % (header, totals[column]) for header, column in zip(headers, columns))))
+    print()
+
+    widths = [max(len(header), 6) + 2 for header in headers]
+
+    print("functions, including their callees:")
+    print(''.join('%*s' % (width, header) for width, header in zip(widths, headers)) + '  function')
+    for function, counts in profile.functions()[:top]:
+        print(''.join('%*d' % (width, counts[column]) for width, column in zip(widths, columns)) + '  ' + function)
+    print()
+
+    print("lines, excluding their callees:")
+    print(''.join('%*s' % (width, header) for width, header in zip(widths, headers)) + '  line')
+    for (path, line, function), counts in profile.lines()[:top]:
+        source = linecache.getline(path, line).strip()
+        print(''.join('%*d' % (width, counts[column]) for width, column in zip(widths, columns)) +
+              '  %s:%d %s: %s' % (os.path.basename(path), line, function, source))
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Profile a contract operation and print its collapsed stacks')
+    parser.add_argument('operation', choices=list(SCENARIOS), help='the operation to profile')
+    parser.add_argument('--phase', choices=list(PHASE_BLOCKS), default='open',
+                        help='the public sale phase to run in (default: %(default)s)')
+    parser.add_argument('--neo', type=int, default=10, help='the NEO to contribute (default: %(default)s)')
+    parser.add_argument('--metric', default=INSTRUCTIONS,
+                        help='instructions or a syscall name such as Neo.Storage.Get (default: %(default)s)')
+    parser.add_argument('--lines', action='store_true', help='count lines instead of bytecodes')
+    parser.add_argument('--output', help='write the collapsed stacks to a file instead of stdout')
+    parser.add_argument('--summary', action='store_true', help='print the most expensive functions and lines instead')
+    parser.add_argument('--top', type=int, default=15, help='the number of functions and lines in the summary')
+    args = parser.parse_args(argv)
+
+    emu, run = SCENARIOS[args.operation](args)
+
+    with Profiler(emu, opcodes=not args.lines) as profiler:
+        invocation = run()
+
+    if invocation.fault:
+        sys.stderr.write(invocation.traceback)
+
+    profile = profiler.profile
+
+    if args.summary:
+        print_summary(profile, invocation, args.top)
+        return
+
+    lines = profile.collapsed(args.metric, root=args.operation)
+    if not lines:
+        sys.stderr.write("no %s recorded. recorded metrics: %s\n" % (args.metric, ', '.join(profile.metrics())))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+    else:
+        print('\n'.join(lines))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,359 @@
+"""
+Token sale load simulator
+
+Replays a public sale against the emulator:
+
+* registers the contributors for KYC in packed batches
+* starts the public sale
+* sends contributions through the day 1, day 2 and open phases. Every block is verified before it is applied, as it
+  is on a node, so contributions in the same block can't see each other's effects
+* ends with an oversubscribed final block whose excess contributions pass Verification but fail in ``mintTokens``
+  and are refunded via ``OnRefund``
+
+and reports the storage ops, events and refunds per contribution for each phase, along with the simulated
+contributions per second.
+
+Usage:
+
+python -m emulator.salesim [--contributors 20000] [--seed 1] [--json]
+"""
+import argparse
+import hashlib
+import json
+import random
+import sys
+import time
+from collections import Counter, OrderedDict
+
+from emulator import Emulator, FIXED8
+
+DAY1 = 'day1'
+DAY2 = 'day2'
+OPEN = 'open'
+FINAL = 'final_block'
+
+PHASES = (DAY1, DAY2, OPEN, FINAL)
+
+# the number of addresses packed into each crowdsale_register invocation
+REGISTER_BATCH = 500
+
+
+def contributor_address(index):
+    return hashlib.sha1(b'contributor:%d' % index).digest()
+
+
+class PhaseStats():
+    """
+    Totals for the contributions made during a phase
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.contributions = 0
+        self.rejected = 0
+        self.minted = 0
+        self.refunds = 0
+        self.neo = 0
+        self.tokens = 0
+        self.verification_syscalls = Counter()
+        self.application_syscalls = Counter()
+        self.events = Counter()
+        self.elapsed = 0.0
+
+    def record(self, verification, application):
+        self.contributions += 1
+        self.verification_syscalls.update(verification.syscalls)
+        self.elapsed += verification.elapsed
+
+        if application is None:
+            self.rejected += 1
+            return
+
+        self.application_syscalls.update(application.syscalls)
+        self.elapsed += application.elapsed
+
+        for event in application.events:
+            self.events[event[0].decode('utf-8') if isinstance(event[0], bytes) else event[0]] += 1
+
+        contributions = application.notifications('contribution')
+        if contributions:
+            self.minted += 1
+            self.neo += int(contributions[0][1])
+            self.tokens += int(contributions[0][2])
+
+        # the compact event packs the sender, NEO, tokens and phase into a single record
+        for record, in application.notifications('packed_contribution'):
+            record = bytes(record)
+            self.minted += 1
+            self.neo += int.from_bytes(record[20:28], 'little')
+            self.tokens += int.from_bytes(record[28:36], 'little')
+
+        self.refunds += len(application.notifications('refund'))
+
+    def summary(self):
+        applied = self.contributions - self.rejected
+
+        def per(counter, keys, count):
+            return round(sum(counter[k] for k in keys) / count, 2) if count else 0
+
+        storage = ('Neo.Storage.Get', 'Neo.Storage.Put', 'Neo.Storage.Delete')
+
+        summary = OrderedDict()
+        summary['contributions'] = self.contributions
+        summary['rejected_by_verification'] = self.rejected
+        summary['minted'] = self.minted
+        summary['refunds'] = self.refunds
+        summary['neo'] = self.neo // FIXED8
+        summary['tokens'] = self.tokens
+        summary['verification_storage_ops'] = per(self.verification_syscalls, storage, self.contributions)
+        summary['application_storage_gets'] = per(self.application_syscalls, storage[:1], applied)
+        summary['application_storage_puts'] = per(self.application_syscalls, storage[1:], applied)
+        summary['application_events'] = per(self.events, self.events.keys(), applied)
+        summary['events'] = OrderedDict(sorted(self.events.items()))
+        summary['contributions_per_second'] = round(self.contributions / self.elapsed) if self.elapsed else 0
+        return summary
+
+
+class SaleSimulator():
+    """
+    :param contributors: int The number of KYC registered contributors
+    :param seed: int The random seed, so that runs are repeatable
+    :param day1_participation: float The fraction of contributors contributing on day 1
+    :param day2_participation: float The fraction of contributors contributing on day 2
+    :param day1_share: float The fraction of the public sale tokens sold on day 1
+    :param day2_share: float The fraction of the public sale tokens sold on day 2
+    :param over_limit_rate: float The fraction of limited round contributions that exceed the individual limit
+    :param final_block_size: int The number of contributions in the oversubscribed final block
+    :param compact_events: bool Whether the contract emits the compact packed_contribution event
+    """
+
+    def __init__(self, contributors=20000, seed=1, day1_participation=0.5, day2_participation=0.3,
+                 day1_share=0.3, day2_share=0.3, over_limit_rate=0.01, final_block_size=50,
+                 compact_events=False):
+        self.random = random.Random(seed)
+        self.emulator = Emulator()
+        self.emulator.contract.Crowdsale.compact_contribution_event = compact_events
+        self.contract = self.emulator.contract
+        self.crowdsale = self.contract.Crowdsale
+        self.token = self.contract.Token
+        self.owner = self.token.original_owner
+
+        self.addresses = [contributor_address(i) for i in range(contributors)]
+        self.day1_participation = day1_participation
+        self.day2_participation = day2_participation
+        self.day1_share = day1_share
+        self.day2_share = day2_share
+        self.over_limit_rate = over_limit_rate
+        self.final_block_size = final_block_size
+
+        self.stats = OrderedDict((phase, PhaseStats(phase)) for phase in PHASES)
+        self.registration = OrderedDict()
+        self.start_height = 0
+
+    def run(self):
+        emu = self.emulator
+        emu.height = 100
+
+        emu.invoke('deploy', [], witnesses=[self.owner])
+
+        self.register()
+
+        emu.invoke('start_public_sale', [], witnesses=[self.owner])
+        self.start_height = emu.height
+
+        limit = self.token.public_sale_token_limit
+        day1_end = self.start_height + self.crowdsale.blocks_per_day
+        day2_end = self.start_height + 2 * self.crowdsale.blocks_per_day
+        sale_end = self.start_height + self.crowdsale.sale_blocks
+
+        self.limited_round(DAY1, self.start_height, day1_end, self.day1_participation, limit * self.day1_share,
+                           self.crowdsale.day1_tokens_per_neo, self.crowdsale.day1_individual_limit)
+        self.limited_round(DAY2, day1_end + 1, day2_end, self.day2_participation, limit * self.day2_share,
+                           self.crowdsale.day2_tokens_per_neo, self.crowdsale.day2_individual_limit)
+        self.open_round(day2_end + 1, sale_end)
+
+        return self.report()
+
+    def register(self):
+        emu = self.emulator
+        syscalls = Counter()
+        elapsed = 0.0
+        invocations = 0
+
+        for start in range(0, len(self.addresses), REGISTER_BATCH):
+            batch = b''.join(self.addresses[start:start + REGISTER_BATCH])
+            invocation = emu.invoke('crowdsale_register', [batch], witnesses=[self.owner])
+            syscalls.update(invocation.syscalls)
+            elapsed += invocation.elapsed
+            invocations += 1
+
+        count = len(self.addresses)
+        self.registration['addresses'] = count
+        self.registration['invocations'] = invocations
+        self.registration['storage_puts_per_address'] = round(syscalls['Neo.Storage.Put'] / count, 2) if count else 0
+        self.registration['events_per_address'] = round(syscalls['Neo.Runtime.Notify'] / count, 2) if count else 0
+        self.registration['addresses_per_second'] = round(count / elapsed) if elapsed else 0
+
+    def block(self, phase, height, contributions):
+        """
+        Verify every contribution in a block against the state before the block, then apply the verified ones
+
+        :param phase: str The phase to record the contributions under
+        :param height: int The block height
+        :param contributions: list (address, neo in fixed8 units) pairs
+        """
+        emu = self.emulator
+        emu.height = height
+
+        verified = []
+        for address, neo in contributions:
+            tx = emu.transaction(address, neo)
+            verification = emu.verify(tx, witnesses=[address])
+            verified.append((address, tx, verification))
+
+        for address, tx, verification in verified:
+            application = None
+            if verification.result and not verification.fault:
+                application = emu.invoke('mintTokens', [], witnesses=[address], tx=tx)
+            self.stats[phase].record(verification, application)
+
+    def schedule(self, start, end, contributions):
+        """
+        Spread contributions over random blocks of a phase
+
+        :return: list (height, contributions) pairs in height order
+        """
+        blocks = {}
+        for contribution in contributions:
+            blocks.setdefault(self.random.randint(start, end), []).append(contribution)
+        return sorted(blocks.items())
+
+    def limited_round(self, phase, start, end, participation, tokens, tokens_per_neo, individual_limit):
+        count = int(len(self.addresses) * participation)
+        if count == 0:
+            return
+
+        contributors = self.random.sample(self.addresses, count)
+
+        # spread the round's share of the tokens over its contributions, capped at the individual limit
+        limit_neo = individual_limit // FIXED8
+        average_neo = max(1, min(limit_neo, int(tokens / (tokens_per_neo // FIXED8) / FIXED8 / count)))
+
+        contributions = []
+        for address in contributors:
+            if self.random.random() < self.over_limit_rate:
+                neo = limit_neo + 1
+            else:
+                neo = min(limit_neo, self.random.randint(1, 2 * average_neo - 1))
+            contributions.append((address, neo * FIXED8))
+
+        for height, block in self.schedule(start, end, contributions):
+            self.block(phase, height, block)
+
+    def open_round(self, start, end):
+        emu = self.emulator
+        rate = self.crowdsale.sale_tokens_per_neo // FIXED8
+
+        remaining_neo = int(emu.invoke('crowdsale_available').result) // (rate * FIXED8)
+
+        # contributions sized so that the remainder sells out over about a third of the contributors
+        average_neo = max(1, remaining_neo // max(1, len(self.addresses) // 3))
+
+        height = start
+        while height < end:
+            remaining_neo = int(emu.invoke('crowdsale_available').result) // (rate * FIXED8)
+
+            if remaining_neo < self.final_block_size * average_neo:
+                break
+
+            # a handful of contributions per block, each small enough to pass verification
+            block = []
+            for _ in range(self.random.randint(1, 8)):
+                neo = min(remaining_neo, self.random.randint(1, 2 * average_neo - 1))
+                block.append((self.random.choice(self.addresses), neo * FIXED8))
+                remaining_neo -= neo
+
+            self.block(OPEN, height, block)
+            height += 1
+
+        if height >= end:
+            return
+
+        # the final block: every contribution fits on its own, so they all pass Verification, but together they
+        # exceed what's left. the contributions applied after the sale sells out are refunded
+        remaining_neo = int(emu.invoke('crowdsale_available').result) // (rate * FIXED8)
+        per_contribution = max(1, (2 * remaining_neo) // self.final_block_size)
+        block = [(self.random.choice(self.addresses), min(remaining_neo, per_contribution) * FIXED8)
+                 for _ in range(self.final_block_size)]
+        self.block(FINAL, height, block)
+
+    def report(self):
+        emu = self.emulator
+
+        report = OrderedDict()
+        report['registration'] = self.registration
+        report['phases'] = OrderedDict((phase, stats.summary()) for phase, stats in self.stats.items())
+
+        total = PhaseStats('total')
+        for stats in self.stats.values():
+            total.contributions += stats.contributions
+            total.rejected += stats.rejected
+            total.minted += stats.minted
+            total.refunds += stats.refunds
+            total.neo += stats.neo
+            total.tokens += stats.tokens
+            total.verification_syscalls.update(stats.verification_syscalls)
+            total.application_syscalls.update(stats.application_syscalls)
+            total.events.update(stats.events)
+            total.elapsed += stats.elapsed
+        report['total'] = total.summary()
+
+        report['tokens_available'] = int(emu.invoke('crowdsale_available').result)
+        return report
+
+
+def print_report(report):
+    registration = report['registration']
+    print("registered %d addresses in %d invocations (%s puts, %s events per address, %d addresses/s)" % (
+        registration['addresses'], registration['invocations'], registration['storage_puts_per_address'],
+        registration['events_per_address'], registration['addresses_per_second']))
+    print()
+
+    columns = ('contributions', 'rejected_by_verification', 'minted', 'refunds', 'neo', 'verification_storage_ops',
+               'application_storage_gets', 'application_storage_puts', 'application_events', 'contributions_per_second')
+    headers = ('contrib', 'rejected', 'minted', 'refunds', 'NEO', 'verify ops', 'app gets', 'app puts', 'events', 'contrib/s')
+
+    print('%-12s' % 'phase' + ''.join('%12s' % h for h in headers))
+    rows = list(report['phases'].items()) + [('total', report['total'])]
+    for name, summary in rows:
+        print('%-12s' % name + ''.join('%12s' % summary[c] for c in columns))
+
+    print()
+    print("tokens left unsold: %d" % report['tokens_available'])
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Simulate a token sale against the emulated contract')
+    parser.add_argument('--contributors', type=int, default=20000, help='the number of KYC registered contributors')
+    parser.add_argument('--seed', type=int, default=1, help='the random seed')
+    parser.add_argument('--final-block-size', type=int, default=50, help='contributions in the oversubscribed final block')
+    parser.add_argument('--compact-events', action='store_true', help='emit the compact packed_contribution event')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    simulator = SaleSimulator(contributors=args.contributors, seed=args.seed, final_block_size=args.final_block_size,
+                              compact_events=args.compact_events)
+    report = simulator.run()
+    report['wall_time'] = round(time.perf_counter() - start, 2)
+
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        print_report(report)
+        print("simulated in %ss" % report['wall_time'])
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,545 @@
+"""
+Runs a compiled .avm script in the emulator
+
+The rest of the emulator runs the contract source. This module executes the compiled script instead, one NEO 2.x
+instruction at a time, so that a build can be checked against the source it was compiled from and an optimized
+script against the script it was optimized from (see emulator/equivalence.py). SYSCALLs are dispatched to the same
+interop functions the source uses, so storage, witnesses, events, logs and syscall counts come from the ``Emulator``
+either way:
+
+.. code-block:: python
+
+    with open('ico_template.avm', 'rb') as f:
+        emu = Emulator(script=f.read())
+
+    emu.invoke('deploy', [], witnesses=[emu.contract.Token.original_owner])
+
+Stack items are kept as Python values: byte arrays as ``VMBytes``, integers as ``int``, booleans as ``bool``, arrays
+as ``list`` (structs as ``Struct``) and interop handles (storage contexts, transactions, outputs, headers) as the
+emulator's objects. Byte arrays and integers convert the same way they do for the source (see emulator/vmtypes.py).
+
+Only the instructions neo-boa 0.2.1 emits are supported. Calls to other contracts, signature checks and maps fault.
+"""
+import hashlib
+
+from buildtools.avm import disassemble, push_value, PUSHBYTES1, PUSHDATA4, PUSHM1, PUSH1, PUSH16
+from emulator import interop
+from emulator.vmtypes import VMBytes, to_bytes, to_int, vm_div, vm_mod
+
+# a runaway loop faults instead of hanging the emulator
+MAX_STEPS = 10000000
+
+
+class Struct(list):
+    """
+    A struct stack item. Unlike an array, it's copied when it's stored in another array
+    """
+
+    def clone(self):
+        return Struct(item.clone() if isinstance(item, Struct) else item for item in self)
+
+
+class ScriptFault(Exception):
+    """
+    Raised when the script faults, e.g. on a THROW or an unsupported instruction
+    """
+    pass
+
+
+def as_bool(item):
+    """
+    :return: bool The item as JMPIF and JMPIFNOT read it. arrays and interop handles are true
+    """
+    if isinstance(item, (bool, int)):
+        return bool(item)
+    if isinstance(item, (bytes, bytearray)):
+        return any(item)
+    return item is not None
+
+
+def as_int(item):
+    if isinstance(item, (bool, int)):
+        return int(item)
+    if isinstance(item, (bytes, bytearray)):
+        if len(item) > 32:
+            raise ScriptFault('a %d byte array is too long to be used as an integer' % len(item))
+        return to_int(item)
+    raise ScriptFault("%s can't be used as an integer" % type(item).__name__)
+
+
+def as_bytes(item):
+    if isinstance(item, (bool, int, bytes, bytearray)):
+        return to_bytes(item)
+    raise ScriptFault("%s can't be used as a byte array" % type(item).__name__)
+
+
+def as_array(item):
+    if not isinstance(item, list):
+        raise ScriptFault("%s isn't an array" % type(item).__name__)
+    return item
+
+
+def equal(a, b):
+    """
+    EQUAL: arrays are compared by reference and structs item by item. anything else is compared as bytes
+    """
+    if isinstance(a, Struct) and isinstance(b, Struct):
+        return len(a) == len(b) and all(equal(x, y) for x, y in zip(a, b))
+    if isinstance(a, list) or isinstance(b, list):
+        return a is b
+    if isinstance(a, (bool, int, bytes, bytearray)) and isinstance(b, (bool, int, bytes, bytearray)):
+        return to_bytes(a) == to_bytes(b)
+    return a is b
+
+
+def stored(item):
+    # a struct is copied into the array it's stored in
+    return item.clone() if isinstance(item, Struct) else item
+
+
+def ripemd160(data):
+    try:
+        return hashlib.new('ripemd160', data).digest()
+    except ValueError:
+        raise ScriptFault("RIPEMD-160 isn't available in this Python's hashlib")
+
+
+def integer_op(function):
+    def op(machine):
+        b = as_int(machine.pop())
+        a = as_int(machine.pop())
+        machine.push(function(a, b))
+    return op
+
+
+def unary_op(function):
+    def op(machine):
+        machine.push(function(as_int(machine.pop())))
+    return op
+
+
+def hash_op(function):
+    def op(machine):
+        machine.push(VMBytes(function(as_bytes(machine.pop()))))
+    return op
+
+
+def divide(a, b):
+    if b == 0:
+        raise ScriptFault('division by zero')
+    return vm_div(a, b)
+
+
+def modulo(a, b):
+    if b == 0:
+        raise ScriptFault('division by zero')
+    return vm_mod(a, b)
+
+
+def shift_left(a, b):
+    if b < 0:
+        raise ScriptFault('negative shift')
+    return a << b
+
+
+def shift_right(a, b):
+    if b < 0:
+        raise ScriptFault('negative shift')
+    return a >> b
+
+
+def pick(machine):
+    n = as_int(machine.pop())
+    machine.push(machine.peek(n))
+
+
+def roll(machine):
+    n = as_int(machine.pop())
+    if n > 0:
+        machine.push(machine.remove(n))
+
+
+def xdrop(machine):
+    machine.remove(as_int(machine.pop()))
+
+
+def xswap(machine):
+    n = as_int(machine.pop())
+    stack = machine.stack
+    if n < 0 or n >= len(stack):
+        raise ScriptFault('XSWAP past the bottom of the stack')
+    stack[-1], stack[-1 - n] = stack[-1 - n], stack[-1]
+
+
+def xtuck(machine):
+    n = as_int(machine.pop())
+    if n <= 0 or n > len(machine.stack):
+        raise ScriptFault('XTUCK past the bottom of the stack')
+    machine.insert(n, machine.peek(0))
+
+
+def substr(machine):
+    count = as_int(machine.pop())
+    index = as_int(machine.pop())
+    data = as_bytes(machine.pop())
+    if count < 0 or index < 0:
+        raise ScriptFault('SUBSTR with a negative index or count')
+    machine.push(VMBytes(data[index:index + count]))
+
+
+def left(machine):
+    count = as_int(machine.pop())
+    data = as_bytes(machine.pop())
+    if count < 0:
+        raise ScriptFault('LEFT with a negative count')
+    machine.push(VMBytes(data[:count]))
+
+
+def right(machine):
+    count = as_int(machine.pop())
+    data = as_bytes(machine.pop())
+    if count < 0 or count > len(data):
+        raise ScriptFault('RIGHT past the start of the byte array')
+    machine.push(VMBytes(data[len(data) - count:]))
+
+
+def within(machine):
+    b = as_int(machine.pop())
+    a = as_int(machine.pop())
+    x = as_int(machine.pop())
+    machine.push(a <= x < b)
+
+
+def array_size(machine):
+    item = machine.pop()
+    machine.push(len(item) if isinstance(item, list) else len(as_bytes(item)))
+
+
+def pack(machine):
+    count = as_int(machine.pop())
+    if count < 0 or count > len(machine.stack):
+        raise ScriptFault('PACK of more items than are on the stack')
+    machine.push([machine.pop() for _ in range(count)])
+
+
+def unpack(machine):
+    items = as_array(machine.pop())
+    for item in reversed(items):
+        machine.push(item)
+    machine.push(len(items))
+
+
+def pick_item(machine):
+    index = as_int(machine.pop())
+    items = as_array(machine.pop())
+    if not 0 <= index < len(items):
+        raise ScriptFault('PICKITEM index %d of an array of %d' % (index, len(items)))
+    machine.push(items[index])
+
+
+def set_item(machine):
+    value = stored(machine.pop())
+    index = as_int(machine.pop())
+    items = as_array(machine.pop())
+    if not 0 <= index < len(items):
+        raise ScriptFault('SETITEM index %d of an array of %d' % (index, len(items)))
+    items[index] = value
+
+
+def new_array(kind):
+    def op(machine):
+        count = as_int(machine.pop())
+        if count < 0:
+            raise ScriptFault('an array of %d items' % count)
+        machine.push(kind([False] * count))
+    return op
+
+
+def append(machine):
+    value = stored(machine.pop())
+    as_array(machine.pop()).append(value)
+
+
+def reverse(machine):
+    as_array(machine.pop()).reverse()
+
+
+def remove(machine):
+    index = as_int(machine.pop())
+    items = as_array(machine.pop())
+    if not 0 <= index < len(items):
+        raise ScriptFault('REMOVE index %d of an array of %d' % (index, len(items)))
+    del items[index]
+
+
+def throw(machine):
+    raise ScriptFault('THROW')
+
+
+def throw_if_not(machine):
+    if not as_bool(machine.pop()):
+        raise ScriptFault('THROWIFNOT')
+
+
+# the instructions that only work on the stacks, by name. pushes, jumps, calls and SYSCALL are handled by the Machine
+OPERATIONS = {
+    'NOP': lambda m: None,
+    'DUPFROMALTSTACK': lambda m: m.push(m.alt[-1]),
+    'TOALTSTACK': lambda m: m.alt.append(m.pop()),
+    'FROMALTSTACK': lambda m: m.push(m.alt.pop()),
+    'XDROP': xdrop,
+    'XSWAP': xswap,
+    'XTUCK': xtuck,
+    'DEPTH': lambda m: m.push(len(m.stack)),
+    'DROP': lambda m: m.pop(),
+    'DUP': lambda m: m.push(m.peek(0)),
+    'NIP': lambda m: m.remove(1),
+    'OVER': lambda m: m.push(m.peek(1)),
+    'PICK': pick,
+    'ROLL': roll,
+    'ROT': lambda m: m.push(m.remove(2)),
+    'SWAP': lambda m: m.push(m.remove(1)),
+    'TUCK': lambda m: m.insert(2, m.peek(0)),
+    'CAT': lambda m: m.push(VMBytes(as_bytes(m.remove(1)) + as_bytes(m.pop()))),
+    'SUBSTR': substr,
+    'LEFT': left,
+    'RIGHT': right,
+    'SIZE': lambda m: m.push(len(as_bytes(m.pop()))),
+    'INVERT': unary_op(lambda a: ~a),
+    'AND': integer_op(lambda a, b: a & b),
+    'OR': integer_op(lambda a, b: a | b),
+    'XOR': integer_op(lambda a, b: a ^ b),
+    'EQUAL': lambda m: m.push(equal(m.remove(1), m.pop())),
+    'INC': unary_op(lambda a: a + 1),
+    'DEC': unary_op(lambda a: a - 1),
+    'SIGN': unary_op(lambda a: (a > 0) - (a < 0)),
+    'NEGATE': unary_op(lambda a: -a),
+    'ABS': unary_op(abs),
+    'NOT': lambda m: m.push(not as_bool(m.pop())),
+    'NZ': lambda m: m.push(as_int(m.pop()) != 0),
+    'ADD': integer_op(lambda a, b: a + b),
+    'SUB': integer_op(lambda a, b: a - b),
+    'MUL': integer_op(lambda a, b: a * b),
+    'DIV': integer_op(divide),
+    'MOD': integer_op(modulo),
+    'SHL': integer_op(shift_left),
+    'SHR': integer_op(shift_right),
+    'BOOLAND': lambda m: m.push(as_bool(m.remove(1)) & as_bool(m.pop())),
+    'BOOLOR': lambda m: m.push(as_bool(m.remove(1)) | as_bool(m.pop())),
+    'NUMEQUAL': integer_op(lambda a, b: a == b),
+    'NUMNOTEQUAL': integer_op(lambda a, b: a != b),
+    'LT': integer_op(lambda a, b: a < b),
+    'GT': integer_op(lambda a, b: a > b),
+    'LTE': integer_op(lambda a, b: a <= b),
+    'GTE': integer_op(lambda a, b: a >= b),
+    'MIN': integer_op(min),
+    'MAX': integer_op(max),
+    'WITHIN': within,
+    'SHA1': hash_op(lambda data: hashlib.sha1(data).digest()),
+    'SHA256': hash_op(lambda data: hashlib.sha256(data).digest()),
+    'HASH160': hash_op(lambda data: ripemd160(hashlib.sha256(data).digest())),
+    'HASH256': hash_op(lambda data: hashlib.sha256(hashlib.sha256(data).digest()).digest()),
+    'ARRAYSIZE': array_size,
+    'PACK': pack,
+    'UNPACK': unpack,
+    'PICKITEM': pick_item,
+    'SETITEM': set_item,
+    'NEWARRAY': new_array(list),
+    'NEWSTRUCT': new_array(Struct),
+    'APPEND': append,
+    'REVERSE': reverse,
+    'REMOVE': remove,
+    'THROW': throw,
+    'THROWIFNOT': throw_if_not,
+}
+
+
+def log_message(item):
+    # Runtime.Log takes a utf-8 string, like the source's print()
+    return as_bytes(item).decode('utf-8', 'replace')
+
+
+# the interop functions behind each SYSCALL and the number of items they pop, the first argument from the top
+SYSCALLS = {
+    'Neo.Runtime.GetTrigger': (interop.GetTrigger, 0),
+    'Neo.Runtime.CheckWitness': (interop.CheckWitness, 1),
+    'Neo.Runtime.Notify': (interop.Notify, 1),
+    'Neo.Runtime.Log': (lambda message: interop.Log(log_message(message)), 1),
+    'Neo.Runtime.GetTime': (interop.GetTime, 0),
+    'Neo.Storage.GetContext': (interop.GetContext, 0),
+    'Neo.Storage.Get': (interop.Get, 2),
+    'Neo.Storage.Put': (interop.Put, 3),
+    'Neo.Storage.Delete': (interop.Delete, 2),
+    'Neo.Blockchain.GetHeight': (interop.GetHeight, 0),
+    'Neo.Blockchain.GetHeader': (interop.GetHeader, 1),
+    'Neo.Header.GetIndex': (lambda header: header.Index, 1),
+    'Neo.Header.GetTimestamp': (lambda header: header.Timestamp, 1),
+    'Neo.Transaction.GetReferences': (interop.GetReferences, 1),
+    'Neo.Transaction.GetOutputs': (interop.GetOutputs, 1),
+    'Neo.Transaction.GetHash': (interop.GetHash, 1),
+    'Neo.Output.GetValue': (interop.GetValue, 1),
+    'Neo.Output.GetAssetId': (interop.GetAssetId, 1),
+    'Neo.Output.GetScriptHash': (interop.GetScriptHash, 1),
+    'System.ExecutionEngine.GetScriptContainer': (interop.GetScriptContainer, 0),
+    'System.ExecutionEngine.GetExecutingScriptHash': (interop.GetExecutingScriptHash, 0),
+    'System.ExecutionEngine.GetCallingScriptHash': (interop.GetCallingScriptHash, 0),
+    'System.ExecutionEngine.GetEntryScriptHash': (interop.GetEntryScriptHash, 0),
+}
+
+
+def stack_item(value):
+    """
+    Convert a value returned by an interop function (or passed as an invocation argument) to a stack item
+    """
+    if value is None:
+        return VMBytes(b'')
+    if isinstance(value, str):
+        return VMBytes(value.encode('utf-8'))
+    if isinstance(value, (bytes, bytearray)):
+        return VMBytes(value)
+    if isinstance(value, (list, tuple)) and not isinstance(value, Struct):
+        return [stack_item(item) for item in value]
+    return value
+
+
+def canonical(value):
+    """
+    A form of a result or event that the source and the script agree on: every value as the bytes it converts to,
+    and arrays as lists of those. Used to compare runs of the source and of a script
+    """
+    if isinstance(value, (list, tuple)):
+        return [canonical(item) for item in value]
+    if isinstance(value, (bool, int, bytes, bytearray, str)) or value is None:
+        return to_bytes(value)
+    return value
+
+
+class Machine():
+    """
+    Executes a script
+
+    :param script: bytes The .avm script
+    :param syscalls: dict The function and argument count of each supported SYSCALL
+    """
+
+    def __init__(self, script, syscalls=None):
+        self.instructions = dict((i.offset, i) for i in disassemble(script))
+        self.syscalls = SYSCALLS if syscalls is None else syscalls
+        self.stack = []
+        self.alt = []
+        self.executed = 0
+
+    # evaluation stack. peek, remove and insert count from the top
+
+    def push(self, item):
+        self.stack.append(item)
+
+    def pop(self):
+        if not self.stack:
+            raise ScriptFault('pop from an empty stack')
+        return self.stack.pop()
+
+    def peek(self, n):
+        if n < 0 or n >= len(self.stack):
+            raise ScriptFault('stack index %d of %d items' % (n, len(self.stack)))
+        return self.stack[-1 - n]
+
+    def remove(self, n):
+        if n < 0 or n >= len(self.stack):
+            raise ScriptFault('stack index %d of %d items' % (n, len(self.stack)))
+        return self.stack.pop(-1 - n)
+
+    def insert(self, n, item):
+        self.stack.insert(len(self.stack) - n, item)
+
+    def run(self, arguments, entry=0, until=None):
+        """
+        Run the script until its entry function returns
+
+        :param arguments: list The stack items to push before running, the last one on top
+        :param entry: int The offset to start at
+        :param until: int An offset to stop at, before executing the instruction there
+        :return:
+            list: The evaluation stack when the script halted or stopped, the top item last
+        """
+        self.stack = list(arguments)
+        self.alt = []
+        self.executed = 0
+
+        calls = []
+        offset = entry
+        while offset != until:
+            instruction = self.instructions.get(offset)
+            if instruction is None:
+                raise ScriptFault('no instruction at %04x' % offset)
+
+            self.executed += 1
+            if self.executed > MAX_STEPS:
+                raise ScriptFault('ran for more than %d instructions' % MAX_STEPS)
+
+            offset = instruction.next_offset
+            opcode = instruction.opcode
+            name = instruction.name
+
+            try:
+                if opcode <= PUSHDATA4:
+                    # PUSH0 and the data pushes leave byte arrays
+                    self.push(VMBytes(instruction.operand))
+                elif opcode == PUSHM1 or PUSH1 <= opcode <= PUSH16:
+                    self.push(push_value(instruction))
+                elif name == 'JMP':
+                    offset = instruction.target
+                elif name in ('JMPIF', 'JMPIFNOT'):
+                    if as_bool(self.pop()) == (name == 'JMPIF'):
+                        offset = instruction.target
+                elif name == 'CALL':
+                    calls.append(offset)
+                    offset = instruction.target
+                elif name == 'RET':
+                    if not calls:
+                        return self.stack
+                    offset = calls.pop()
+                elif name == 'SYSCALL':
+                    self.syscall(instruction.syscall)
+                elif name in OPERATIONS:
+                    OPERATIONS[name](self)
+                else:
+                    raise ScriptFault('%s is not supported' % name)
+            except ScriptFault as e:
+                raise ScriptFault('%r: %s' % (instruction, e))
+
+        return self.stack
+
+    def syscall(self, name):
+        if name not in self.syscalls:
+            raise ScriptFault('the %s syscall is not supported' % name)
+
+        function, count = self.syscalls[name]
+        arguments = [self.pop() for _ in range(count)]
+
+        result = function(*arguments)
+        if result is not None:
+            self.push(stack_item(result))
+
+
+class ScriptContract():
+    """
+    Stands in for the contract's ``Main`` with a compiled script
+
+    :param script: bytes The .avm script
+    """
+
+    def __init__(self, script):
+        self.machine = Machine(script)
+
+    @property
+    def executed(self):
+        """
+        The number of instructions the last invocation executed
+        """
+        return self.machine.executed
+
+    def Main(self, operation, args):
+        # the invocation script pushes the arguments array and then the operation
+        stack = self.machine.run([stack_item(list(args)), stack_item(operation)])
+        return stack[-1] if stack else None
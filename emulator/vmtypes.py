@@ -0,0 +1,180 @@
+"""
+NEO VM value semantics for contract code running under CPython
+
+The VM treats byte arrays, integers and booleans interchangeably: a value read from storage is a byte array,
+but the contract adds to it, compares it and uses it as a condition. ``VMBytes`` gives byte arrays those
+integer semantics so the contract source can run unmodified.
+"""
+
+
+def to_bytes(value):
+    """
+    Convert a stack value to its byte array representation
+
+    :param value: bytes, str, int or bool
+    :return:
+        bytes: little endian two's complement for integers, utf-8 for strings
+    """
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value)
+    if isinstance(value, bool):
+        return b'\x01' if value else b''
+    if isinstance(value, int):
+        if value == 0:
+            return b''
+        # the shortest two's complement encoding, as BigInteger.ToByteArray gives. -128 is 80, not 80 ff
+        length = ((value if value > 0 else ~value).bit_length() + 8) // 8
+        return value.to_bytes(length, 'little', signed=True)
+    if isinstance(value, str):
+        return value.encode('utf-8')
+    if value is None:
+        return b''
+    raise TypeError("can't convert %s to a byte array" % type(value).__name__)
+
+
+def to_int(value):
+    """
+    Convert a stack value to its integer representation
+
+    :param value: bytes, str, int or bool
+    :return:
+        int: the integer value
+    """
+    if isinstance(value, bool):
+        return 1 if value else 0
+    if isinstance(value, int):
+        return value
+    return int.from_bytes(to_bytes(value), 'little', signed=True)
+
+
+def to_bool(value):
+    """
+    Convert a stack value to a boolean the way JMPIF/JMPIFNOT do
+
+    :param value: bytes, str, int or bool
+    :return:
+        bool: False for zero and for byte arrays made of zero bytes only
+    """
+    if isinstance(value, (bool, int)):
+        return bool(value)
+    return any(to_bytes(value))
+
+
+class VMBytes(bytes):
+    """
+    A byte array that behaves like a BigInteger in arithmetic and numeric comparisons
+    """
+
+    def __bool__(self):
+        return any(self)
+
+    def __int__(self):
+        return to_int(bytes(self))
+
+    __index__ = __int__
+
+    def __hash__(self):
+        return bytes.__hash__(self)
+
+    def __eq__(self, other):
+        if isinstance(other, (bytes, bytearray, str)):
+            return bytes(self) == to_bytes(other)
+        if isinstance(other, int):
+            return int(self) == other
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    def __lt__(self, other):
+        return int(self) < to_int(other)
+
+    def __le__(self, other):
+        return int(self) <= to_int(other)
+
+    def __gt__(self, other):
+        return int(self) > to_int(other)
+
+    def __ge__(self, other):
+        return int(self) >= to_int(other)
+
+    def __add__(self, other):
+        return int(self) + to_int(other)
+
+    def __radd__(self, other):
+        return to_int(other) + int(self)
+
+    def __sub__(self, other):
+        return int(self) - to_int(other)
+
+    def __rsub__(self, other):
+        return to_int(other) - int(self)
+
+    def __mul__(self, other):
+        return int(self) * to_int(other)
+
+    def __rmul__(self, other):
+        return to_int(other) * int(self)
+
+    def __mod__(self, other):
+        return vm_mod(self, other)
+
+    def __rmod__(self, other):
+        return vm_mod(other, self)
+
+    def __neg__(self):
+        return -int(self)
+
+    def __abs__(self):
+        return abs(int(self))
+
+    def __repr__(self):
+        return 'VMBytes(%s)' % bytes.__repr__(self)
+
+
+def vm_div(a, b):
+    """
+    DIV: integer division truncating towards zero (BigInteger.Divide)
+    """
+    a = to_int(a)
+    b = to_int(b)
+    quotient = abs(a) // abs(b)
+    if (a < 0) != (b < 0):
+        return -quotient
+    return quotient
+
+
+def vm_mod(a, b):
+    """
+    MOD: remainder with the sign of the dividend (BigInteger.Remainder)
+    """
+    a = to_int(a)
+    b = to_int(b)
+    return a - vm_div(a, b) * b
+
+
+def concat(str1, str2):
+    """
+    CAT: concatenate the byte array representations of two values
+    """
+    return VMBytes(to_bytes(str1) + to_bytes(str2))
+
+
+def substr(source, start_index, count):
+    """
+    SUBSTR: a byte array of ``count`` bytes from ``source`` starting at ``start_index``
+    """
+    start_index = to_int(start_index)
+    return VMBytes(to_bytes(source)[start_index:start_index + to_int(count)])
+
+
+def take(source, count):
+    """
+    LEFT: the first ``count`` items of a list or bytes of a byte array
+    """
+    if isinstance(source, list):
+        return source[:to_int(count)]
+    return VMBytes(to_bytes(source)[:to_int(count)])
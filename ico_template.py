@@ -18,8 +18,8 @@ Date: Jan 27 2018
 
 from boa.blockchain.vm.Neo.Runtime import GetTrigger, CheckWitness, Notify
 from boa.blockchain.vm.Neo.TriggerType import Application, Verification
+from boa.code.builtins import concat
 from nrve.common.storage import StorageAPI
-from nrve.common.txio import Attachments,get_asset_attachments
 from nrve.token.nrvetoken import Token
 from nrve.token.nep5 import NEP5Handler
 from nrve.token.crowdsale import Crowdsale
@@ -37,108 +37,203 @@ def Main(operation, args):
     trigger = GetTrigger()
     token = Token()
 
+    # a single StorageAPI is shared by every code path instead of each one creating its own
+    storage = StorageAPI()
+
     # This is used in the Verification portion of the contract
     # To determine whether a transfer of system assets (NEO/Gas) involving
     # This contract's address can proceed
     if trigger == Verification:
 
-        storage = StorageAPI()
+        # every NEO transfer to the contract runs this, so contributions are checked first and rejected as cheaply
+        # as possible. the owner's witness is only checked for transactions that aren't valid contributions,
+        # e.g. the owner moving assets out of the contract
+        crowdsale = Crowdsale()
+
+        # the exchange will be allowed if the number of tokens to convert to is greater than zero.
+        # zero indicates that there is a reason this contribution will not be allowed
+        if crowdsale.verify_contribution(token, storage) > 0:
+            return True
 
         owner = storage.get(token.owner_key)
 
         if owner:
             # If the invoker is the owner of this contract, proceed
-            if CheckWitness(owner):
-                return True
-        else:
-            # check original_owner if not deployed yet (i.e. no owner in storage)
-            if CheckWitness(token.original_owner):
-                return True
-
-        # Otherwise, we need to lookup the assets and determine
-        # If attachments of assets is ok
-        attachments = get_asset_attachments()  # type:Attachments
-
-        crowdsale = Crowdsale()
+            return CheckWitness(owner)
 
-        # the exchange will be allowed if the number of tokens to convert to is greater than zero.
-        # zero indicates that there is a reason this contribution will not be allowed
-        return crowdsale.check_and_calculate_tokens(token, attachments, storage, True) > 0
+        # check original_owner if not deployed yet (i.e. no owner in storage)
+        return CheckWitness(token.original_owner)
 
     elif trigger == Application:
 
         if operation != None:
 
-            nep = NEP5Handler()
-
-            for op in nep.get_methods():
-                if operation == op:
-                    return nep.handle_nep51(operation, args, token)
-
-            if operation == 'deploy':
-                return deploy(token)
-
-            if operation == 'circulation':
-                storage = StorageAPI()
-                return token.get_circulation(storage)
-
-            sale = Crowdsale()
-
-            if operation == 'mintTokens':
-                return sale.exchange(token)
-
-            if operation == 'crowdsale_register':
-                return sale.kyc_register(args, token)
-
-            if operation == 'crowdsale_deregister':
-                return sale.kyc_deregister(args, token)
-
-            if operation == 'crowdsale_status':
-                return sale.kyc_status(args)
-
-            if operation == 'crowdsale_available':
-                return token.crowdsale_available_amount()
-
-            if operation == 'transfer_presale_tokens':
-                return sale.transfer_presale_tokens(token, args)
-
-            if operation == 'transfer_team_tokens':
-                return sale.transfer_team_tokens(token, args)
-
-            if operation == 'transfer_company_tokens':
-                return sale.transfer_company_tokens(token, args)
+            # operations are dispatched on the length of their name first so that each one is only compared
+            # against the few names of the same length. each length test or name comparison costs 8 instructions,
+            # and the tiers are ordered by how often they are invoked. measured with
+            # `python -m emulator.benchmark --dispatch`, transfer, balanceOf and mintTokens reach their branch after
+            # 16, 24 and 32 instructions, where tiers in order of length would take 40, 48 and 56. mintTokens only
+            # runs during the sale while transfer and balanceOf run for the life of the token, so their tiers come
+            # first. the owner operations come last, at up to 168 instructions.
+            length = len(operation)
+
+            if length == 8:
+                if operation == 'transfer':
+                    nep = NEP5Handler()
+                    return nep.transfer(args, storage)
 
-            if operation == 'mint_rewards_tokens':
-                return sale.mint_rewards_tokens(token, args)
+                if operation == 'decimals':
+                    return token.decimals
+
+            elif length == 9:
+                if operation == 'balanceOf':
+                    nep = NEP5Handler()
+                    return nep.balance_of(args, storage)
+
+                if operation == 'allowance':
+                    nep = NEP5Handler()
+                    return nep.allowance(args, storage)
+
+            elif length == 10:
+                if operation == 'mintTokens':
+                    sale = Crowdsale()
+                    return sale.exchange(token, storage)
+
+                if operation == 'balancesOf':
+                    nep = NEP5Handler()
+                    return nep.balances_of(args, storage)
+
+                if operation == 'pause_sale':
+                    return pause_sale(token, storage)
+
+                if operation == 'sale_stats':
+                    sale = Crowdsale()
+                    return sale.sale_stats(token, storage)
+
+            elif length == 12:
+                if operation == 'transferFrom':
+                    nep = NEP5Handler()
+                    return nep.transfer_from(args, storage)
+
+                if operation == 'change_owner':
+                    new_owner = args[0]
+                    return change_owner(token, new_owner, storage)
+
+                if operation == 'accept_owner':
+                    return accept_owner(token, storage)
+
+            elif length == 7:
+                if operation == 'approve':
+                    nep = NEP5Handler()
+                    return nep.approve(args, storage)
+
+            elif length == 11:
+                if operation == 'totalSupply':
+                    return token.get_circulation(storage)
+
+                if operation == 'circulation':
+                    return token.get_circulation(storage)
+
+                if operation == 'resume_sale':
+                    return resume_sale(token, storage)
+
+                if operation == 'admin_batch':
+                    return admin_batch(token, args, storage)
+
+            elif length == 13:
+                if operation == 'transfer_many':
+                    nep = NEP5Handler()
+                    return nep.transfer_many(args, storage)
+
+            elif length == 4:
+                if operation == 'name':
+                    return token.name
+
+            elif length == 6:
+                if operation == 'symbol':
+                    return token.symbol
+
+                if operation == 'deploy':
+                    return deploy(token, storage)
+
+            elif length == 16:
+                if operation == 'crowdsale_status':
+                    sale = Crowdsale()
+                    return sale.kyc_status(args, storage)
+
+            elif length == 17:
+                if operation == 'start_public_sale':
+                    sale = Crowdsale()
+                    return sale.start_public_sale(token, storage)
+
+            elif length == 18:
+                if operation == 'crowdsale_register':
+                    sale = Crowdsale()
+                    return sale.kyc_register(args, token, storage)
+
+            elif length == 19:
+                if operation == 'crowdsale_available':
+                    return token.crowdsale_available_amount(storage)
+
+                if operation == 'mint_rewards_tokens':
+                    sale = Crowdsale()
+                    return sale.mint_rewards_tokens(token, args, storage)
+
+                if operation == 'cancel_change_owner':
+                    return cancel_change_owner(token, storage)
 
-            if operation == 'change_owner':
-                new_owner = args[0]
-                return change_owner(token, new_owner)
+            elif length == 20:
+                if operation == 'crowdsale_deregister':
+                    sale = Crowdsale()
+                    return sale.kyc_deregister(args, token, storage)
+
+                if operation == 'transfer_team_tokens':
+                    sale = Crowdsale()
+                    return sale.transfer_team_tokens(token, args, storage)
+
+            elif length == 23:
+                if operation == 'transfer_presale_tokens':
+                    sale = Crowdsale()
+                    return sale.transfer_presale_tokens(token, args, storage)
+
+                if operation == 'transfer_company_tokens':
+                    sale = Crowdsale()
+                    return sale.transfer_company_tokens(token, args, storage)
+
+            elif length == 21:
+                if operation == 'crowdsale_status_many':
+                    sale = Crowdsale()
+                    return sale.kyc_status_many(args, storage)
+
+            elif length == 24:
+                if operation == 'mint_rewards_tokens_many':
+                    sale = Crowdsale()
+                    return sale.mint_rewards_tokens_many(token, args, storage)
 
-            if operation == 'accept_owner':
-                return accept_owner(token)
+            elif length == 25:
+                if operation == 'transfer_team_tokens_many':
+                    sale = Crowdsale()
+                    return sale.transfer_team_tokens_many(token, args, storage)
 
-            if operation == 'cancel_change_owner':
-                return cancel_change_owner(token)
-
-            if operation == 'start_public_sale':
-                return sale.start_public_sale(token)
-
-            if operation == 'pause_sale':
-                return pause_sale(token)
-
-            if operation == 'resume_sale':
-                return resume_sale(token)
+            elif length == 28:
+                if operation == 'transfer_company_tokens_many':
+                    sale = Crowdsale()
+                    return sale.transfer_company_tokens_many(token, args, storage)
+
+                if operation == 'transfer_presale_tokens_many':
+                    sale = Crowdsale()
+                    return sale.transfer_presale_tokens_many(token, args, storage)
 
             return 'unknown operation'
 
     return False
 
 
-def deploy(token: Token):
+def deploy(token: Token, storage: StorageAPI):
     """
 
     :param token: Token The token to deploy
+    :param storage: StorageAPI A StorageAPI object for storage interaction
     :return:
         bool: Whether the operation was successful
     """
@@ -146,8 +241,6 @@ def deploy(token: Token):
         print("Must be original_owner to deploy")
         return False
 
-    storage = StorageAPI()
-
     # can only deploy once, so if we already have an owner, no-op
     if storage.get(token.owner_key):
         return False
@@ -158,16 +251,15 @@ def deploy(token: Token):
     return True
 
 
-def change_owner(token: Token, new_owner):
+def change_owner(token: Token, new_owner, storage: StorageAPI):
     """
     Record a transfer request to a new owner. The new owner must accept the request via accept_owner
     :param token: Token The token to change the owner for
     :param new_owner: the new owner of the contract
+    :param storage: StorageAPI A StorageAPI object for storage interaction
     :return:
         bool: Whether the operation was successful
     """
-    storage = StorageAPI()
-
     owner = storage.get(token.owner_key)
     if not owner:
         print("Must deploy before changing owner")
@@ -183,15 +275,14 @@ def change_owner(token: Token, new_owner):
     return True
 
 
-def cancel_change_owner(token: Token):
+def cancel_change_owner(token: Token, storage: StorageAPI):
     """
     Cancel a pending ownership transfer request
     :param token: Token The token to cancel the ownership transfer for
+    :param storage: StorageAPI A StorageAPI object for storage interaction
     :return:
         bool: Whether the operation was successful
     """
-    storage = StorageAPI()
-
     new_owner = storage.get(token.new_owner_key)
     if not new_owner:
         print("Can't cancel_change_owner unless an owner change is already pending")
@@ -208,15 +299,14 @@ def cancel_change_owner(token: Token):
     return True
 
 
-def accept_owner(token: Token):
+def accept_owner(token: Token, storage: StorageAPI):
     """
     Change the owner of this smart contract who will be able to perform protected operations
     :param token: Token The token to change the owner for
+    :param storage: StorageAPI A StorageAPI object for storage interaction
     :return:
         bool: Whether the operation was successful
     """
-    storage = StorageAPI()
-
     new_owner = storage.get(token.new_owner_key)
     if not new_owner:
         print("Must call change_owner before accept_owner")
@@ -234,41 +324,165 @@ def accept_owner(token: Token):
     return True
 
 
-def pause_sale(token: Token):
+def pause_sale(token: Token, storage: StorageAPI):
     """
     Pause the sale
     :param token: Token The token of the sale to pause
+    :param storage: StorageAPI A StorageAPI object for storage interaction
     :return:
         bool: Whether the operation was successful
     """
-    storage = StorageAPI()
-
     owner = storage.get(token.owner_key)
-    if not CheckWitness(owner):
-        print("Must be owner to pause sale")
-        return False
+    if CheckWitness(owner):
+        return do_pause_sale(token, storage)
+
+    print("Must be owner to pause sale")
+    return False
+
 
+def do_pause_sale(token: Token, storage: StorageAPI):
+    """
+    pause_sale without the owner check, for callers that have already checked the owner's witness, i.e. admin_batch
+    :param token: Token The token of the sale to pause
+    :param storage: StorageAPI A StorageAPI object for storage interaction
+    :return:
+        bool: Whether the operation was successful
+    """
     # mark the sale as paused
-    storage.put(token.sale_paused_key, True)
+    state = token.get_sale_state(storage)
+    state.paused = 1
 
-    return True
+    return token.put_sale_state(state, storage)
 
 
-def resume_sale(token: Token):
+def resume_sale(token: Token, storage: StorageAPI):
     """
     Resume the sale
     :param token: Token The token of the sale to resume
+    :param storage: StorageAPI A StorageAPI object for storage interaction
     :return:
         bool: Whether the operation was successful
     """
-    storage = StorageAPI()
+    owner = storage.get(token.owner_key)
+    if CheckWitness(owner):
+        return do_resume_sale(token, storage)
+
+    print("Must be owner to resume sale")
+    return False
+
 
+def do_resume_sale(token: Token, storage: StorageAPI):
+    """
+    resume_sale without the owner check, for callers that have already checked the owner's witness, i.e. admin_batch
+    :param token: Token The token of the sale to resume
+    :param storage: StorageAPI A StorageAPI object for storage interaction
+    :return:
+        bool: Whether the operation was successful
+    """
+    # mark the sale as active
+    state = token.get_sale_state(storage)
+    state.paused = 0
+
+    return token.put_sale_state(state, storage)
+
+
+def admin_batch(token: Token, args, storage: StorageAPI):
+    """
+    Run several owner operations in a single invocation, checking the owner's witness once for the whole batch
+    instead of once per operation. Supports pause_sale, resume_sale, start_public_sale, crowdsale_register,
+    crowdsale_deregister and the pre-sale, team, company and rewards mints, along with their _many variants.
+    Ownership changes aren't supported since they involve the new owner's witness.
+
+    :param token: Token The token of the sale
+    :param args: list A flat list of entries, each an operation name followed by the args list for that operation:
+           [operation, args, operation, args, ...]. the entries are run in order
+    :param storage: StorageAPI A StorageAPI object for storage interaction
+    :return:
+        bytearray: One byte per entry in the order given: 1 if the operation succeeded, otherwise 0. A failed entry
+        doesn't stop the rest of the batch. False if the caller isn't the owner or the entries aren't in pairs, in
+        which case nothing is run
+    """
     owner = storage.get(token.owner_key)
     if not CheckWitness(owner):
-        print("Must be owner to resume sale")
+        print("Must be owner to run admin_batch")
         return False
 
-    # mark the sale as active
-    storage.delete(token.sale_paused_key)
+    count = len(args)
+    if count == 0 or (count % 2) != 0:
+        print("admin_batch entries must be operation and args pairs")
+        return False
 
-    return True
+    sale = Crowdsale()
+
+    # bit operations aren't reliable in the compiler, so use a whole byte per entry like crowdsale_status_many
+    result = b''
+
+    i = 0
+    while i < count:
+        operation = args[i]
+        operation_args = args[i + 1]
+
+        if run_admin_operation(sale, token, operation, operation_args, storage):
+            result = concat(result, b'\x01')
+        else:
+            result = concat(result, b'\x00')
+
+        i += 2
+
+    return result
+
+
+def run_admin_operation(sale: Crowdsale, token: Token, operation, args, storage: StorageAPI):
+    """
+    Run a single admin_batch entry. The caller must already have checked the owner's witness
+    :param sale: Crowdsale The crowdsale to run the operation against
+    :param token: Token The token of the sale
+    :param operation: str The name of the operation to run
+    :param args: list The args for the operation, the same as when it's invoked on its own
+    :param storage: StorageAPI A StorageAPI object for storage interaction
+    :return:
+        The result of the operation: True or the number of addresses processed on success. False if the operation
+        isn't supported in a batch
+    """
+    # the most common entries first
+    if operation == 'crowdsale_register':
+        return sale.do_kyc_register(args, storage)
+
+    if operation == 'crowdsale_deregister':
+        return sale.do_kyc_deregister(args, storage)
+
+    if operation == 'transfer_presale_tokens':
+        return sale.do_transfer_presale_tokens(token, args, storage)
+
+    if operation == 'transfer_presale_tokens_many':
+        return sale.do_transfer_presale_tokens_many(token, args, storage)
+
+    if operation == 'transfer_team_tokens':
+        return sale.do_transfer_team_tokens(token, args, storage)
+
+    if operation == 'transfer_team_tokens_many':
+        return sale.do_transfer_team_tokens_many(token, args, storage)
+
+    if operation == 'transfer_company_tokens':
+        return sale.do_transfer_company_tokens(token, args, storage)
+
+    if operation == 'transfer_company_tokens_many':
+        return sale.do_transfer_company_tokens_many(token, args, storage)
+
+    if operation == 'mint_rewards_tokens':
+        return sale.do_mint_rewards_tokens(token, args, storage)
+
+    if operation == 'mint_rewards_tokens_many':
+        return sale.do_mint_rewards_tokens_many(token, args, storage)
+
+    if operation == 'pause_sale':
+        return do_pause_sale(token, storage)
+
+    if operation == 'resume_sale':
+        return do_resume_sale(token, storage)
+
+    if operation == 'start_public_sale':
+        return sale.do_start_public_sale(token, storage)
+
+    print("unsupported admin_batch operation")
+    return False
@@ -0,0 +1,51 @@
+from boa.code.builtins import concat, substr
+
+
+def pack_int(value, width):
+    """
+    Encodes an integer as a fixed-width field for a packed record
+
+    :param value: int A non-negative integer whose little endian encoding fits in width bytes
+    :param width: int The number of bytes in the field
+    :return:
+        bytearray: The little endian encoding of value, zero padded to width bytes, or False if the encoding is longer
+        than width. a longer field would shift every field packed after it, so the record packers check their length
+    """
+    data = concat(value, b'')
+
+    if len(data) > width:
+        print("value doesn't fit in the packed field")
+        return False
+
+    while len(data) < width:
+        data = concat(data, b'\x00')
+
+    return data
+
+
+def unpack_int(data, start, width):
+    """
+    Reads a fixed-width field from a packed record
+
+    :param data: bytearray The packed record
+    :param start: int The offset of the field
+    :param width: int The number of bytes in the field
+    :return:
+        int: The field. adding 0 has the VM convert the little endian bytes to an integer
+    """
+    return substr(data, start, width) + 0
+
+
+def unpack_field(data, start, width):
+    """
+    Reads a fixed-width field from a packed record without converting it. The VM reads the bytes as an integer when
+    they're used as one, and a field that's written back unchanged is already width bytes long, so pack_int doesn't
+    have to pad it. Use it for the fields of stored records that are unpacked and repacked, unpack_int for the rest
+
+    :param data: bytearray The packed record
+    :param start: int The offset of the field
+    :param width: int The number of bytes in the field
+    :return:
+        bytearray: The little endian field
+    """
+    return substr(data, start, width)
@@ -53,3 +53,49 @@ def get_asset_attachments() -> Attachments:
 
 
     return attachment
+
+
+def get_neo_attachments() -> Attachments:
+    """
+    Gets the NEO attached to an invocation TX with a single pass over the outputs. GAS isn't tallied and the sender
+    isn't looked up (see get_sender_addr) so that transactions without any NEO can be rejected before the references
+    are loaded.
+
+    :return:
+        Attachments: An object with the receiver address and attached neo set
+    """
+    attachment = Attachments()
+
+    tx = GetScriptContainer()  # type:Transaction
+    receiver_addr = GetExecutingScriptHash()
+    neo_asset_id = attachment.neo_asset_id
+
+    sent_amount_neo = 0
+
+    for output in tx.Outputs:
+        # change usually goes back to the sender, so compare the script hash first
+        if output.ScriptHash == receiver_addr:
+            if output.AssetId == neo_asset_id:
+                sent_amount_neo += output.Value
+
+    attachment.receiver_addr = receiver_addr
+    attachment.neo_attached = sent_amount_neo
+
+    return attachment
+
+
+def get_sender_addr():
+    """
+    Gets the address of the sender of an invocation TX
+
+    :return:
+        bytearray: The script hash of the first reference, or 0 if the TX has no references
+    """
+    tx = GetScriptContainer()  # type:Transaction
+    references = tx.References
+
+    if len(references) > 0:
+        reference = references[0]
+        return reference.ScriptHash
+
+    return 0
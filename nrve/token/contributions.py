@@ -0,0 +1,19 @@
+class Contributions():
+    """
+    Container object ( struct ) for the NEO an address has contributed in each limited phase, stored as a single
+    packed record per address so that a contribution reads and writes one key whichever phase it's in:
+
+    * presale: 8 bytes, the whole NEO transferred for the address during the pre-sale
+    * day1: 8 bytes, the NEO contributed on day 1 of the public sale, in fixed8 units
+    * day2: 8 bytes, the NEO contributed on day 2 of the public sale, in fixed8 units
+
+    An address with an all zero record (or none at all) hasn't contributed in a limited phase yet, which is how the
+    sale_stats contributor count tells new contributors apart. Open phase contributions have no limit, so they aren't
+    recorded here.
+    """
+
+    presale = 0
+
+    day1 = 0
+
+    day2 = 0
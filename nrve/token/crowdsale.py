@@ -3,15 +3,21 @@ from boa.blockchain.vm.Neo.Action import RegisterAction
 from boa.blockchain.vm.Neo.Runtime import Notify,CheckWitness
 from boa.code.builtins import concat, substr
 from nrve.token.nrvetoken import Token
+from nrve.token.salestate import SaleState
+from nrve.token.contributions import Contributions
 from nrve.common.storage import StorageAPI
-from nrve.common.txio import Attachments,get_asset_attachments
+from nrve.common.txio import Attachments,get_asset_attachments,get_neo_attachments,get_sender_addr
 from nrve.common.time import get_now
+from nrve.common.packing import pack_int, unpack_field, unpack_int
 
 OnTransfer = RegisterAction('transfer', 'from', 'to', 'amount')
 OnContribution = RegisterAction('contribution', 'from', 'neo', 'tokens')
 OnRefund = RegisterAction('refund', 'to', 'amount')
 OnPreSaleMint = RegisterAction('presale_mint', 'to', 'neo', 'tokens')
 
+# a single packed record in place of the transfer and contribution events. refer: Crowdsale.compact_contribution_event
+OnPackedContribution = RegisterAction('packed_contribution', 'record')
+
 OnKYCRegister = RegisterAction('kyc_registration','address')
 OnKYCDeregister = RegisterAction('kyc_deregistration','address')
 
@@ -20,8 +26,22 @@ class Crowdsale():
 
     kyc_key = b'kyc_ok'
 
+    # when enabled, each public sale contribution emits one packed_contribution event instead of a transfer and
+    # a contribution event, saving a Notify per contribution. the record is 37 bytes: the 20 byte sender, the 8 byte
+    # little endian NEO attached (fixed8), the 8 byte little endian tokens minted and the 1 byte phase (refer: get_phase).
+    # off by default since NEP-5 wallets and explorers won't see the minted tokens without the transfer event
+    compact_contribution_event = False
+
+    # the public sale phases returned by get_phase
+    day1_phase = 1
+    day2_phase = 2
+    open_phase = 3
+
+    # packed per-address NEO contributed in the pre-sale, day 1 and day 2. refer: Contributions
+    contributions_key = b'contrib'
+    contributions_size = 24
+
     # February 9, 2018 @ 9:00:00 pm UTC
-    presale_phase_key = b'r1'
     presale_individual_limit = 3000
     presale_tokens_per_neo = 400 * 100000000
     presale_minimum = 800
@@ -31,13 +51,10 @@ class Crowdsale():
     blocks_per_day = 3757  # 24 * 60 * 60 / 23
 
     # February 20, 2018 @ 5:00:00 pm UTC
-    pub_sale_start_block_key = b'pub_start'
-    day1_phase_key = b'r2'
     day1_individual_limit = 300 * 100000000
     day1_tokens_per_neo = 333 * 100000000
 
     # February 21, 2018 @ 5:00:00 pm UTC
-    day2_phase_key = b'r3'
     day2_individual_limit = 1000 * 100000000
     day2_tokens_per_neo = 315 * 100000000
 
@@ -61,106 +78,142 @@ class Crowdsale():
     rewards_fund_tokens_max = 97500000 * 100000000  # 97.5m tokens can be minted for the rewards fund * 10^8 (decimals)
     rewards_fund_token_distribution_key = b'rewards_fund'
 
-    def start_public_sale(self, token: Token):
-        storage = StorageAPI()
+    def start_public_sale(self, token: Token, storage: StorageAPI):
 
         owner = storage.get(token.owner_key)
-        if not CheckWitness(owner):
-            return False
+        if CheckWitness(owner):
+            return self.do_start_public_sale(token, storage)
+
+        return False
 
-        pub_sale_start_block = storage.get(self.pub_sale_start_block_key)
+    def do_start_public_sale(self, token: Token, storage: StorageAPI):
+        """
+        start_public_sale without the owner check, for callers that have already checked the owner's witness,
+        i.e. admin_batch. Takes the same arguments and returns the same result.
+        """
+        state = token.get_sale_state(storage)
 
-        if pub_sale_start_block:
+        if state.sale_end:
             print("can't start the public sale twice")
             return False
 
         height = GetHeight()
 
-        storage.put(self.pub_sale_start_block_key, height)
+        # precompute the phase boundaries so that contributions only need to compare against the current height
+        state.day1_end = height + self.blocks_per_day
+        state.day2_end = height + (2*self.blocks_per_day)
+        state.sale_end = height + self.sale_blocks
 
-        return True
+        return token.put_sale_state(state, storage)
 
-    def kyc_register(self, args, token: Token):
+    def kyc_register(self, args, token: Token, storage: StorageAPI):
         """
 
         :param args:list a list of addresses to register
         :param token: Token A token object with your ICO settings
+        :param storage: StorageAPI A StorageAPI object for storage interaction
         :return:
             int: The number of addresses registered for KYC
         """
-        ok_count = 0
-
-        storage = StorageAPI()
-
         owner = storage.get(token.owner_key)
         if CheckWitness(owner):
+            return self.do_kyc_register(args, storage)
+
+        return 0
+
+    def do_kyc_register(self, args, storage: StorageAPI):
+        """
+        kyc_register without the owner check, for callers that have already checked the owner's witness, i.e.
+        admin_batch. Takes the same arguments, apart from the token, and returns the same result.
+        """
+        ok_count = 0
 
-            for addresses in args:
+        for addresses in args:
 
-                # bl: allowing multiple addresses to be encoded into a single parameter. this works around
-                # the limitation of list arguments only supporting at most 16 elements
-                # can be passed in as follows:
-                # testinvoke {script_hash} crowdsale_register [bytearray(b'\x015\x829\x8cm6f\xb3\xac\xcc\xcas\x1dw\x06\xbc\xd2\x9co#\xba\'\x03\xc52c\xe8\xd6\xe5"\xdc2\x2039\xdc\xd8\xee\xe9')]
-                # note that neo-python doesn't like spaces in the strings, so convert any spaces to the hex equivalent: '\x20'
-                addr_length = len(addresses)
+            # bl: allowing multiple addresses to be encoded into a single parameter. this works around
+            # the limitation of list arguments only supporting at most 16 elements
+            # can be passed in as follows:
+            # testinvoke {script_hash} crowdsale_register [bytearray(b'\x015\x829\x8cm6f\xb3\xac\xcc\xcas\x1dw\x06\xbc\xd2\x9co#\xba\'\x03\xc52c\xe8\xd6\xe5"\xdc2\x2039\xdc\xd8\xee\xe9')]
+            # note that neo-python doesn't like spaces in the strings, so convert any spaces to the hex equivalent: '\x20'
+            addr_length = len(addresses)
 
-                # addresses are 20 bytes, so the length must be a multiple of 20 or else it's invalid!
-                if (addr_length % 20) != 0:
-                    continue
+            # addresses are 20 bytes, so the length must be a multiple of 20 or else it's invalid!
+            if (addr_length % 20) != 0:
+                continue
 
-                addr_count = addr_length / 20
+            addr_count = addr_length / 20
 
-                i = 0
-                while i < addr_count:
-                    start = i * 20
-                    address = substr(addresses, start, 20)
+            i = 0
+            while i < addr_count:
+                start = i * 20
+                address = substr(addresses, start, 20)
 
-                    kyc_storage_key = concat(self.kyc_key, address)
-                    storage.put(kyc_storage_key, True)
+                kyc_storage_key = concat(self.kyc_key, address)
+                storage.put(kyc_storage_key, True)
 
-                    OnKYCRegister(address)
-                    ok_count += 1
-                    i += 1
+                OnKYCRegister(address)
+                ok_count += 1
+                i += 1
 
         return ok_count
 
-    def kyc_deregister(self, args, token: Token):
+    def kyc_deregister(self, args, token: Token, storage: StorageAPI):
         """
 
-        :param args:list a list of addresses to deregister
+        :param args:list a list of packed addresses to deregister. each element may contain multiple 20 byte addresses
         :param token: Token A token object with your ICO settings
+        :param storage: StorageAPI A StorageAPI object for storage interaction
         :return:
             int: The number of addresses deregistered from KYC
         """
+        owner = storage.get(token.owner_key)
+        if CheckWitness(owner):
+            return self.do_kyc_deregister(args, storage)
+
+        return 0
+
+    def do_kyc_deregister(self, args, storage: StorageAPI):
+        """
+        kyc_deregister without the owner check, for callers that have already checked the owner's witness, i.e.
+        admin_batch. Takes the same arguments, apart from the token, and returns the same result.
+        """
         ok_count = 0
 
-        storage = StorageAPI()
+        for addresses in args:
 
-        owner = storage.get(token.owner_key)
-        if CheckWitness(owner):
+            # addresses are packed into each parameter the same way as for kyc_register, so a single
+            # transaction can deregister as many addresses as it can register
+            addr_length = len(addresses)
+
+            # addresses are 20 bytes, so the length must be a multiple of 20 or else it's invalid!
+            if (addr_length % 20) != 0:
+                continue
 
-            for address in args:
+            addr_count = addr_length / 20
 
-                if len(address) == 20:
+            i = 0
+            while i < addr_count:
+                start = i * 20
+                address = substr(addresses, start, 20)
 
-                    kyc_storage_key = concat(self.kyc_key, address)
-                    storage.delete(kyc_storage_key)
+                kyc_storage_key = concat(self.kyc_key, address)
+                storage.delete(kyc_storage_key)
 
-                    OnKYCDeregister(address)
-                    ok_count += 1
+                OnKYCDeregister(address)
+                ok_count += 1
+                i += 1
 
         return ok_count
 
-    def kyc_status(self, args):
+    def kyc_status(self, args, storage: StorageAPI):
         """
         Gets the KYC Status of an address
 
         :param args:list a list of arguments
+        :param storage: StorageAPI A StorageAPI object for storage interaction
         :return:
             bool: Returns the kyc status of an address
         """
-        storage = StorageAPI()
-
         if len(args) > 0:
             addr = args[0]
 
@@ -168,20 +221,63 @@ class Crowdsale():
 
         return False
 
-    def exchange(self, token: Token):
+    def kyc_status_many(self, args, storage: StorageAPI):
+        """
+        Gets the KYC Status of many addresses. The addresses are packed the same way as for kyc_register.
+
+        :param args:list a list of packed addresses. each element may contain multiple 20 byte addresses
+        :param storage: StorageAPI A StorageAPI object for storage interaction
+        :return:
+            bytearray: One byte per address in the order given: 1 if the address is KYC approved, otherwise 0.
+            False if any element isn't a multiple of 20 bytes, since the result would no longer line up with the addresses
+        """
+        # bit operations aren't reliable in the compiler, so use a whole byte per address instead of a bitmap
+        result = b''
+
+        for addresses in args:
+
+            addr_length = len(addresses)
+
+            # addresses are 20 bytes, so the length must be a multiple of 20 or else it's invalid!
+            if (addr_length % 20) != 0:
+                return False
+
+            addr_count = addr_length / 20
+
+            i = 0
+            while i < addr_count:
+                start = i * 20
+                address = substr(addresses, start, 20)
+
+                if self.get_kyc_status(address, storage):
+                    result = concat(result, b'\x01')
+                else:
+                    result = concat(result, b'\x00')
+
+                i += 1
+
+        return result
+
+    def exchange(self, token: Token, storage: StorageAPI):
         """
         Make a token sale contribution to exchange NEO for NRVE
         :param token: Token The token object with NEP5/sale settings
+        :param storage: StorageAPI A StorageAPI object for storage interaction
         :return:
             bool: Whether the exchange was successful
         """
 
         attachments = get_asset_attachments()  # type:  Attachments
 
-        storage = StorageAPI()
+        state = token.get_sale_state(storage)
+
+        phase = self.get_phase(state, GetHeight())
+
+        # the record is read once here, both to check the contribution against the limits and to record it below
+        contributions = self.get_limited_contributions(attachments.sender_addr, attachments.neo_attached, phase, storage)
 
         # this looks up whether the exchange can proceed
-        tokens = self.check_and_calculate_tokens(token, attachments, storage, False)
+        tokens = self.check_and_calculate_tokens(token, attachments, state, phase, contributions, storage)
 
         if tokens <= 0:
             print("Cannot exchange value")
@@ -193,21 +289,106 @@ class Crowdsale():
                 OnRefund(attachments.sender_addr, attachments.neo_attached)
             return False
 
-        self.mint_tokens(token, attachments.receiver_addr, attachments.sender_addr, tokens, storage)
+        # the sale state and the contribution record are updated and packed before anything is written, so that a
+        # field that doesn't fit its width (refer: pack_int) rejects the contribution instead of corrupting a record
+        record = b''
+
+        if phase == self.open_phase:
+            # the open phase has no individual limit, so there's no per-address record to update. the contribution
+            # is only counted in the sale state, which is written below either way
+            state.open_neo = state.open_neo + attachments.neo_attached
+            state.open_contributions = state.open_contributions + 1
+        else:
+            # record the contribution against the individual limits, in the record read above.
+            # an address without any NEO recorded is contributing for the first time
+            if contributions.presale + contributions.day1 + contributions.day2 == 0:
+                state.contributors = state.contributors + 1
+
+            if phase == self.day2_phase:
+                contributions.day2 = contributions.day2 + attachments.neo_attached
+                state.day2_neo = state.day2_neo + attachments.neo_attached
+            else:
+                contributions.day1 = contributions.day1 + attachments.neo_attached
+                state.day1_neo = state.day1_neo + attachments.neo_attached
+
+            record = self.pack_contributions(contributions)
+            if not record:
+                OnRefund(attachments.sender_addr, attachments.neo_attached)
+                return False
 
         # update the total sold during the public sale
-        public_sale_sold = storage.get(token.public_sale_sold_key)
+        state.sold = state.sold + tokens
+
+        if not token.put_sale_state(state, storage):
+            OnRefund(attachments.sender_addr, attachments.neo_attached)
+            return False
 
-        public_sale_sold += tokens
+        if phase != self.open_phase:
+            storage.put(concat(self.contributions_key, attachments.sender_addr), record)
 
-        storage.put(token.public_sale_sold_key, public_sale_sold)
+        if self.compact_contribution_event:
+            token.add_to_circulation(tokens, storage)
 
-        # track contributions as a separate event for token sale account page transaction updates
-        OnContribution(attachments.sender_addr, attachments.neo_attached, tokens)
+            self.add_to_balance(attachments.sender_addr, tokens, storage)
+
+            record = concat(attachments.sender_addr, pack_int(attachments.neo_attached, 8))
+            record = concat(record, pack_int(tokens, 8))
+            record = concat(record, pack_int(phase, 1))
+
+            OnPackedContribution(record)
+        else:
+            self.mint_tokens(token, attachments.receiver_addr, attachments.sender_addr, tokens, storage)
+
+            # track contributions as a separate event for token sale account page transaction updates
+            OnContribution(attachments.sender_addr, attachments.neo_attached, tokens)
 
         return True
 
-    def check_and_calculate_tokens(self, token: Token, attachments: Attachments, storage: StorageAPI, verify_only: bool):
+    def verify_contribution(self, token: Token, storage: StorageAPI):
+        """
+        Checks a contribution during the Verification trigger. Every NEO transfer to the contract is verified, so
+        contributions are rejected with the cheapest checks first: the sale state, then the NEO attached (a single
+        pass over the outputs), and only then the KYC and individual limit lookups.
+
+        :param token: Token A token object with your ICO settings
+        :param storage: StorageAPI A StorageAPI object for storage interaction
+        :return:
+            int: Total amount of tokens the contribution would receive, or 0 if it should be rejected
+        """
+        state = token.get_sale_state(storage)
+
+        # the rejections below don't print since every Log is another syscall on this hot path
+        if state.paused:
+            return 0
+
+        # not started yet
+        if not state.sale_end:
+            return 0
+
+        height = GetHeight()
+        if height > state.sale_end:
+            return 0
+
+        attachments = get_neo_attachments()  # type:  Attachments
+        if attachments.neo_attached == 0:
+            return 0
+
+        attachments.sender_addr = get_sender_addr()
+
+        if not self.get_kyc_status(attachments.sender_addr, storage):
+            return 0
+
+        # same neo-boa workaround as in check_and_calculate_tokens: https://github.com/CityOfZion/neo-boa/issues/29
+        j = 0
+
+        phase = self.get_phase(state, height)
+
+        contributions = self.get_limited_contributions(attachments.sender_addr, attachments.neo_attached, phase, storage)
+
+        return self.calculate_tokens(token, attachments.neo_attached, phase, contributions, state)
+
+    def check_and_calculate_tokens(self, token: Token, attachments: Attachments, state: SaleState, phase,
+                                   contributions: Contributions, storage: StorageAPI):
         """
         Determines if the contract invocation meets all requirements for the ICO exchange
         of neo into NEP5 Tokens.
@@ -218,15 +399,16 @@ class Crowdsale():
 
         :param token: Token A token object with your ICO settings
         :param attachments: Attachments An attachments object with information about attached NEO/Gas assets
+        :param state: SaleState The public sale state
+        :param phase: int The current phase of the sale. refer: get_phase
+        :param contributions: Contributions The contribution record of the sender. refer: get_limited_contributions
         :param storage: StorageAPI A StorageAPI object for storage interaction
-        :param verify_only: boolean to indicate whether we are only verifying the tx.
-               when verifying, we will skip any put side effects.
         :return:
             int: Total amount of tokens to distribute, or 0 if this isn't a valid contribution
         """
 
         # don't allow any contributions if the sale is paused
-        if storage.get(token.sale_paused_key):
+        if state.paused:
             return 0
 
         if attachments.neo_attached == 0:
@@ -245,7 +427,7 @@ class Crowdsale():
         #    print("KYC approved")
         j = 0
 
-        return self.calculate_tokens(token, attachments.neo_attached, attachments.sender_addr, verify_only)
+        return self.calculate_tokens(token, attachments.neo_attached, phase, contributions, state)
 
     def get_kyc_status(self, address, storage: StorageAPI):
         """
@@ -265,42 +447,34 @@ class Crowdsale():
 
         return False
 
-    def calculate_tokens(self, token: Token, neo_attached: int, address, verify_only: bool):
+    def calculate_tokens(self, token: Token, neo_attached: int, phase, contributions: Contributions, state: SaleState):
         """
         Perform custom token exchange calculations here.
 
         :param token: Token The token settings for the sale
         :param neo_attached: int Number of NEO to convert to tokens
-        :param address: bytearray The address to mint the tokens to
-        :param verify_only: boolean to indicate whether we are only verifying the tx.
-               when verifying, we will skip any put side effects.
+        :param phase: int The current phase of the sale. refer: get_phase
+        :param contributions: Contributions The contribution record of the address the tokens are minted to, as loaded
+               by get_limited_contributions
+        :param state: SaleState The public sale state
         :return:
             int: Total amount of tokens to distribute, or 0 if this isn't a valid contribution
         """
-        height = GetHeight()
-
-        storage = StorageAPI()
-
-        pub_sale_start_block = storage.get(self.pub_sale_start_block_key)
-
-        if not pub_sale_start_block:
+        if not state.sale_end:
             print("main sale not started")
             return 0
-        elif height > (pub_sale_start_block + self.sale_blocks):
+        elif not phase:
             print("crowdsale ended")
             return 0
-        elif height > (pub_sale_start_block + (2*self.blocks_per_day)):
+
+        individual_limit = self.get_individual_limit(phase)
+
+        if phase == self.open_phase:
             # if we are in main sale, post-day 2, then any contribution is allowed
-            phase_key_prefix = None
-            individual_limit = -1
             tokens_per_neo = self.sale_tokens_per_neo
-        elif height > (pub_sale_start_block + self.blocks_per_day):
-            phase_key_prefix = self.day2_phase_key
-            individual_limit = self.day2_individual_limit
+        elif phase == self.day2_phase:
             tokens_per_neo = self.day2_tokens_per_neo
         else:
-            phase_key_prefix = self.day1_phase_key
-            individual_limit = self.day1_individual_limit
             tokens_per_neo = self.day1_tokens_per_neo
 
         # this value will always be an int value, but is converted to float by the division. cast back to int, which should always be safe.
@@ -308,9 +482,7 @@ class Crowdsale():
         # the value still needs to be divided to get down to the whole NEO unit
         tokens = neo_attached / 100000000 * tokens_per_neo
 
-        public_sale_sold = storage.get(token.public_sale_sold_key)
-
-        new_public_sale_sold = public_sale_sold + tokens
+        new_public_sale_sold = state.sold + tokens
 
         if new_public_sale_sold > token.public_sale_token_limit:
             print("purchase would exceed token sale limit")
@@ -318,27 +490,20 @@ class Crowdsale():
 
         # in the main sale, all contributions are allowed, up to the tokens in circulation limit defined above
         if individual_limit <= 0:
-            # note that we do not need to store the contribution at this point since there is no limit
+            # note that we do not need to look up the contribution record at this point since there is no limit
             return tokens
 
         if neo_attached <= individual_limit:
 
-            # check if they have already exchanged in the limited round
-            phase_key = concat(phase_key_prefix, address)
-
-            total_amount_contributed = storage.get(phase_key)
-
-            # add on the amount of the new contribution
-            total_amount_contributed += neo_attached
+            # check if they have already exchanged in the limited round, then add on the amount of the new contribution
+            if phase == self.day2_phase:
+                total_amount_contributed = contributions.day2 + neo_attached
+            else:
+                total_amount_contributed = contributions.day1 + neo_attached
 
-            # if the total amount is less than the individual limit, they're good!
+            # if the total amount is less than the individual limit, they're good! note that this method is invoked
+            # during the read-only Verification trigger too, so the contribution is recorded by exchange instead
             if total_amount_contributed <= individual_limit:
-                # note that this method can be invoked during the Verification trigger, so we have the
-                # verify_only param to avoid the Storage.Put during the read-only Verification trigger.
-                # this works around a "method Neo.Storage.Put not found in ->" error in InteropService.py
-                # since Verification is read-only and thus uses a StateReader, not a StateMachine
-                if not verify_only:
-                    storage.put(phase_key, total_amount_contributed)
                 return tokens
 
             print("contribution limit exceeded in round")
@@ -348,41 +513,198 @@ class Crowdsale():
 
         return 0
 
+    def get_individual_limit(self, phase):
+        """
+        :param phase: int A phase of the sale. refer: get_phase
+        :return:
+            int: The NEO an address may contribute in the phase, in fixed8 units, or -1 if there is no limit
+        """
+        if phase == self.day1_phase:
+            return self.day1_individual_limit
+
+        if phase == self.day2_phase:
+            return self.day2_individual_limit
+
+        return -1
+
+    def get_limited_contributions(self, address, neo_attached, phase, storage: StorageAPI) -> Contributions:
+        """
+        Loads the contribution record of an address for checking a contribution against the individual limit of the
+        phase. The record is only read when it's needed, i.e. in a limited phase and when the contribution alone is
+        within the limit. Otherwise calculate_tokens doesn't look at it, so an empty record is returned without a
+        Storage.Get
+
+        :param address: bytearray The contributing address
+        :param neo_attached: int The NEO attached to the contribution
+        :param phase: int The current phase of the sale. refer: get_phase
+        :param storage: StorageAPI A StorageAPI object for storage interaction
+        :return:
+            Contributions: The NEO contributed in each limited phase
+        """
+        individual_limit = self.get_individual_limit(phase)
+
+        if individual_limit > 0 and neo_attached <= individual_limit:
+            return self.get_contributions(address, storage)
+
+        return Contributions()
+
+    def get_phase(self, state: SaleState, height):
+        """
+        Determines the public sale phase at a block height
+
+        :param state: SaleState The public sale state
+        :param height: int The block height
+        :return:
+            int: day1_phase, day2_phase or open_phase, or 0 if the sale hasn't started or has ended
+        """
+        if not state.sale_end:
+            return 0
+
+        if height > state.sale_end:
+            return 0
+
+        if height > state.day2_end:
+            return self.open_phase
+
+        if height > state.day1_end:
+            return self.day2_phase
+
+        return self.day1_phase
+
+    def sale_stats(self, token: Token, storage: StorageAPI):
+        """
+        Looks up the running sale aggregates, which exchange and the pre-sale transfers keep up to date, so that they
+        can be read in one invocation instead of by indexing every contribution event
+
+        :param token: Token The token settings for the sale
+        :param storage: StorageAPI A StorageAPI object for storage interaction
+        :return:
+            list: The NEO raised in the pre-sale, day 1, day 2 and open phases (in fixed8 units), the number of unique
+            pre-sale and limited phase contributors, the number of open phase contributions, then the tokens minted for
+            the public sale, the pre-sale, the team, the company and the rewards fund
+        """
+        state = token.get_sale_state(storage)
+
+        presale_minted = storage.get(token.presale_minted_key)
+        team_minted = storage.get(self.team_token_distribution_key)
+        company_minted = storage.get(self.company_token_distribution_key)
+        rewards_minted = storage.get(self.rewards_fund_token_distribution_key)
+
+        stats = [
+            state.presale_neo, state.day1_neo, state.day2_neo, state.open_neo,
+            state.contributors, state.open_contributions,
+            state.sold, presale_minted, team_minted, company_minted, rewards_minted,
+        ]
+
+        return stats
+
+    def get_contributions(self, address, storage: StorageAPI) -> Contributions:
+        """
+        Loads the contribution record of an address
+
+        :param address: bytearray The address to lookup
+        :param storage: StorageAPI A StorageAPI object for storage interaction
+        :return:
+            Contributions: The NEO contributed in each phase. all fields are zero if the address hasn't contributed
+        """
+        contributions = Contributions()
+
+        record = storage.get(concat(self.contributions_key, address))
+
+        if record:
+            contributions.presale = unpack_field(record, 0, 8)
+            contributions.day1 = unpack_field(record, 8, 8)
+            contributions.day2 = unpack_field(record, 16, 8)
+
+        return contributions
+
+    def pack_contributions(self, contributions: Contributions):
+        """
+        Packs the contribution record of an address, to be stored under concat(contributions_key, address)
+
+        :param contributions: Contributions The NEO contributed in each limited phase
+        :return:
+            bytearray: The 24 byte contribution record, or False if any field doesn't fit its width. refer: pack_int
+        """
+        record = concat(pack_int(contributions.presale, 8), pack_int(contributions.day1, 8))
+        record = concat(record, pack_int(contributions.day2, 8))
+
+        if len(record) != self.contributions_size:
+            print("contributions don't fit their record")
+            return False
+
+        return record
+
+    # boa: inline
     def mint_tokens(self, token: Token, from_address, to_address, tokens, storage: StorageAPI):
         """
         Mint tokens for an address
+
+        Invoking a method like this one that doesn't return a value breaks the execution of the calling method due to a
+        neo-boa compiler issue (https://github.com/CityOfZion/neo-boa/issues/40), so compile.py inlines every call to it.
+
         :param token: the token being minted
         :param from_address: the address from which the tokens are being minted (should always be the contract address)
         :param to_address: the address to transfer the minted tokens to
         :param tokens: the number of tokens to mint
         :param storage: StorageAPI
         """
-        # lookup the current balance of the address
-        current_balance = storage.get(to_address)
-
-        # add it to the exchanged tokens and persist in storage
-        new_total = tokens + current_balance
-        storage.put(to_address, new_total)
-
         # update the in circulation amount
         token.add_to_circulation(tokens, storage)
 
+        self.credit_tokens(from_address, to_address, tokens, storage)
+
+    # boa: inline
+    def credit_tokens(self, from_address, to_address, tokens, storage: StorageAPI):
+        """
+        Credit minted tokens to an address without updating the in circulation amount, which batch mints update once
+        for the whole batch. Inlined by compile.py like mint_tokens.
+
+        :param from_address: the address from which the tokens are being minted (should always be the contract address)
+        :param to_address: the address to transfer the minted tokens to
+        :param tokens: the number of tokens to mint
+        :param storage: StorageAPI
+        """
+        self.add_to_balance(to_address, tokens, storage)
+
         # dispatch transfer event
         OnTransfer(from_address, to_address, tokens)
 
-    def transfer_presale_tokens(self, token: Token, args):
+    # boa: inline
+    def add_to_balance(self, address, tokens, storage: StorageAPI):
+        """
+        Add tokens to the balance of an address without any event. Inlined by compile.py like mint_tokens.
+
+        :param address: the address to credit
+        :param tokens: the number of tokens to add
+        :param storage: StorageAPI
+        """
+        # lookup the current balance of the address
+        current_balance = storage.get(address)
+
+        # add it to the exchanged tokens and persist in storage
+        new_total = tokens + current_balance
+        storage.put(address, new_total)
+
+    def transfer_presale_tokens(self, token: Token, args, storage: StorageAPI):
         """
         Transfer pre-sale tokens to a wallet address according to the 800 NEO minimum and 3,000 NEO maximum individual limits
         :param token: the token being minted for the team
         :param args: the address and number of neo for the contribution
+        :param storage: StorageAPI A StorageAPI object for storage interaction
         :return: True if successful
         """
-        storage = StorageAPI()
-
         owner = storage.get(token.owner_key)
-        if not CheckWitness(owner):
-            return False
+        if CheckWitness(owner):
+            return self.do_transfer_presale_tokens(token, args, storage)
+
+        return False
 
+    def do_transfer_presale_tokens(self, token: Token, args, storage: StorageAPI):
+        """
+        transfer_presale_tokens without the owner check, for callers that have already checked the owner's
+        witness, i.e. admin_batch. Takes the same arguments and returns the same result.
+        """
         if len(args) != 2:
             return False
 
@@ -416,63 +738,207 @@ class Crowdsale():
             return False
 
         # check if they have already exchanged in the limited round
-        phase_key = concat(self.presale_phase_key, address)
-
-        total_amount_contributed = storage.get(phase_key)
+        contributions = self.get_contributions(address, storage)
 
         # add on the amount of the new contribution
-        total_amount_contributed += neo
+        total_amount_contributed = contributions.presale + neo
 
         if total_amount_contributed > self.presale_individual_limit:
             print("transfer would exceed presale individual limit")
             return False
 
-        storage.put(phase_key, total_amount_contributed)
+        state = token.get_sale_state(storage)
 
-        attachments = get_asset_attachments()  # type:  Attachments
+        # an address without any NEO recorded is contributing for the first time
+        if contributions.presale + contributions.day1 + contributions.day2 == 0:
+            state.contributors = state.contributors + 1
 
-        #self.mint_tokens(token, attachments.receiver_addr, address, tokens, storage)
-        from_address = attachments.receiver_addr
-        to_address = address
+        # the sale stats are kept in fixed8 like the public sale contributions
+        state.presale_neo = state.presale_neo + (neo * 100000000)
 
-        # bl: the following is an exact copy of the mint_tokens function (except for the OnPreSaleMint). invoking self.mint_tokens will break the
-        # execution of this method due to a neo-boa compiler issue. this results in a lot of code duplication,
-        # but it's preferable to the alternative of a broken smart contract. refer: https://github.com/CityOfZion/neo-boa/issues/40
+        # both records are packed before either is written. refer: pack_int
+        contributions.presale = total_amount_contributed
+        record = self.pack_contributions(contributions)
+        if not record:
+            return False
 
-        # lookup the current balance of the address
-        current_balance = storage.get(to_address)
+        if not token.put_sale_state(state, storage):
+            return False
 
-        # add it to the exchanged tokens and persist in storage
-        new_total = tokens + current_balance
-        storage.put(to_address, new_total)
+        storage.put(concat(self.contributions_key, address), record)
 
-        # update the in circulation amount
-        token.add_to_circulation(tokens, storage)
+        attachments = get_asset_attachments()  # type:  Attachments
+
+        self.mint_tokens(token, attachments.receiver_addr, address, tokens, storage)
 
         # update the total pre-sale tokens that have been minted
         storage.put(token.presale_minted_key, new_presale_minted)
 
         # track pre-sale mint as a separate event for easier tracking
-        OnPreSaleMint(to_address, neo, tokens)
-
-        # dispatch transfer event
-        OnTransfer(from_address, to_address, tokens)
+        OnPreSaleMint(address, neo, tokens)
 
         return True
 
-    def transfer_team_tokens(self, token: Token, args):
+    def transfer_presale_tokens_many(self, token: Token, args, storage: StorageAPI):
+        """
+        Transfer pre-sale tokens to many wallet addresses according to the 800 NEO minimum and 3,000 NEO maximum individual limits
+        :param token: the token being minted for the pre-sale
+        :param args: a single packed list of 28 byte records: a 20 byte address followed by the 8 byte little endian number of neo for the contribution.
+               the records must be sorted by address in ascending order, comparing the addresses as little endian signed integers as the VM does,
+               and an address can only appear once
+        :param storage: StorageAPI A StorageAPI object for storage interaction
+        :return:
+            int: The number of addresses minted to, or 0 if the batch was rejected, in which case nothing is minted
+        """
+        owner = storage.get(token.owner_key)
+        if CheckWitness(owner):
+            return self.do_transfer_presale_tokens_many(token, args, storage)
+
+        return 0
+
+    def do_transfer_presale_tokens_many(self, token: Token, args, storage: StorageAPI):
+        """
+        transfer_presale_tokens_many without the owner check, for callers that have already checked the owner's
+        witness, i.e. admin_batch. Takes the same arguments and returns the same result.
+        """
+        if len(args) != 1:
+            return 0
+
+        contributions = args[0]
+
+        # every record must be a valid neo amount, so the records can be validated the same way as mint records
+        total_neo = self.get_mint_records_total(contributions)
+        if total_neo <= 0:
+            return 0
+
+        presale_minted = storage.get(token.presale_minted_key)
+
+        # calculate the number of tokens based on the neo value supplied
+        tokens = total_neo * self.presale_tokens_per_neo
+
+        new_presale_minted = presale_minted + tokens
+
+        # don't allow more than the presale token limit to be distributed
+        if new_presale_minted > self.presale_token_limit:
+            print("transfer would exceed presale token limit")
+            return 0
+
+        contribution_count = len(contributions) / 28
+
+        # validate every record against the individual limits before anything is written. the records are applied
+        # in order, so the minimum check uses the remaining neo as of each record
+        minted = presale_minted
+
+        # the updated contribution record of each address, packed in batch order so that they're written below without
+        # reading them again
+        updated = b''
+        new_contributors = 0
+
+        previous_address = b''
+
+        i = 0
+        while i < contribution_count:
+            start = i * 28
+            address = substr(contributions, start, 20)
+            neo = unpack_int(contributions, start + 20, 8)
+
+            # the addresses must be in ascending order, so a repeated address, which would otherwise be checked
+            # against its individual limit without its earlier records, only has to be compared with the record before
+            if i > 0 and address <= previous_address:
+                print("presale addresses must be unique and in ascending order")
+                return 0
+
+            previous_address = address
+
+            max_neo_remaining = (self.presale_token_limit - minted) / self.presale_tokens_per_neo
+
+            # protect against scenarios where we could deadlock the contract by making
+            # a mistake in our manual distribution. allow amount smaller than 800 NEO
+            # if we're down to fewer than 800 NEO remaining to close the pre-sale
+            if neo < self.presale_minimum and self.presale_minimum < max_neo_remaining:
+                print("insufficient presale contribution")
+                return 0
+
+            contributed = self.get_contributions(address, storage)
+
+            # add on the amount of the new contribution
+            total_amount_contributed = contributed.presale + neo
+
+            if total_amount_contributed > self.presale_individual_limit:
+                print("transfer would exceed presale individual limit")
+                return 0
+
+            # an address without any NEO recorded is contributing for the first time
+            if contributed.presale + contributed.day1 + contributed.day2 == 0:
+                new_contributors += 1
+
+            contributed.presale = total_amount_contributed
+            record = self.pack_contributions(contributed)
+            if not record:
+                return 0
+
+            updated = concat(updated, record)
+
+            minted += neo * self.presale_tokens_per_neo
+            i += 1
+
+        # every contribution record was packed above, so the sale state is the only record left that could be refused
+        # and it's written before anything else. the sale stats are kept in fixed8 like the public sale contributions
+        state = token.get_sale_state(storage)
+        state.presale_neo = state.presale_neo + (total_neo * 100000000)
+        state.contributors = state.contributors + new_contributors
+
+        if not token.put_sale_state(state, storage):
+            return 0
+
+        attachments = get_asset_attachments()  # type:  Attachments
+
+        from_address = attachments.receiver_addr
+
+        i = 0
+        while i < contribution_count:
+            start = i * 28
+            to_address = substr(contributions, start, 20)
+            neo = unpack_int(contributions, start + 20, 8)
+
+            record_tokens = neo * self.presale_tokens_per_neo
+
+            # record the contribution
+            storage.put(concat(self.contributions_key, to_address), substr(updated, i * 24, 24))
+
+            self.credit_tokens(from_address, to_address, record_tokens, storage)
+
+            # track pre-sale mint as a separate event for easier tracking
+            OnPreSaleMint(to_address, neo, record_tokens)
+
+            i += 1
+
+        # update the in circulation amount and the total pre-sale tokens that have been minted once for the whole batch
+        token.add_to_circulation(tokens, storage)
+
+        storage.put(token.presale_minted_key, new_presale_minted)
+
+        return contribution_count
+
+    def transfer_team_tokens(self, token: Token, args, storage: StorageAPI):
         """
         Transfer team tokens to a wallet address according to the 3-year team token vesting schedule
         :param token: the token being minted for the team
         :param args: the address and number of tokens to mint
+        :param storage: StorageAPI A StorageAPI object for storage interaction
         :return: True if successful
         """
-        storage = StorageAPI()
-
         owner = storage.get(token.owner_key)
-        if not CheckWitness(owner):
-            return False
+        if CheckWitness(owner):
+            return self.do_transfer_team_tokens(token, args, storage)
 
+        return False
+
+    def do_transfer_team_tokens(self, token: Token, args, storage: StorageAPI):
+        """
+        transfer_team_tokens without the owner check, for callers that have already checked the owner's witness,
+        i.e. admin_batch. Takes the same arguments and returns the same result.
+        """
         if len(args) != 2:
             return False
 
@@ -486,26 +952,13 @@ class Crowdsale():
 
         now = get_now()
 
+        max_token_distribution = self.get_team_token_distribution_limit(now)
+
         # no team token distribution until initial team vest date at the earliest
-        if now < self.initial_team_vest_date:
+        if max_token_distribution == 0:
             print("can't transfer_team_tokens before vesting date")
             return False
 
-        seconds_in_year = 31536000
-
-        # in the first year, allow 30% token distribution
-        if now < (self.initial_team_vest_date + seconds_in_year):
-            max_token_distribution = self.team_tokens_max * 3 / 10
-        # in the second year, allow 60% total token distribution
-        elif now < (self.initial_team_vest_date + (2*seconds_in_year)):
-            max_token_distribution = self.team_tokens_max * 6 / 10
-        # in the third year, allow 80% total token distribution
-        elif now < (self.initial_team_vest_date + (3*seconds_in_year)):
-            max_token_distribution = self.team_tokens_max * 8 / 10
-        # beyond the third year, allow 100% total token distribution
-        else:
-            max_token_distribution = self.team_tokens_max
-
         team_tokens_distributed = storage.get(self.team_token_distribution_key)
 
         team_tokens_distributed += tokens
@@ -519,42 +972,99 @@ class Crowdsale():
 
         attachments = get_asset_attachments()  # type:  Attachments
 
-        #self.mint_tokens(token, attachments.receiver_addr, address, tokens, storage)
+        self.mint_tokens(token, attachments.receiver_addr, address, tokens, storage)
+
+        return True
+
+    def transfer_team_tokens_many(self, token: Token, args, storage: StorageAPI):
+        """
+        Transfer team tokens to many wallet addresses according to the 3-year team token vesting schedule
+        :param token: the token being minted
+        :param args: a single packed list of 28 byte mint records: a 20 byte address followed by the 8 byte little endian number of tokens to mint
+        :param storage: StorageAPI A StorageAPI object for storage interaction
+        :return:
+            int: The number of addresses minted to, or 0 if the batch was rejected, in which case nothing is minted
+        """
+        owner = storage.get(token.owner_key)
+        if CheckWitness(owner):
+            return self.do_transfer_team_tokens_many(token, args, storage)
+
+        return 0
+
+    def do_transfer_team_tokens_many(self, token: Token, args, storage: StorageAPI):
+        """
+        transfer_team_tokens_many without the owner check, for callers that have already checked the owner's
+        witness, i.e. admin_batch. Takes the same arguments and returns the same result.
+        """
+        if len(args) != 1:
+            return 0
+
+        mints = args[0]
+
+        total = self.get_mint_records_total(mints)
+        if total <= 0:
+            return 0
+
+        now = get_now()
+
+        max_token_distribution = self.get_team_token_distribution_limit(now)
+
+        # no team token distribution until initial team vest date at the earliest
+        if max_token_distribution == 0:
+            print("can't transfer_team_tokens_many before vesting date")
+            return 0
+
+        team_tokens_distributed = storage.get(self.team_token_distribution_key)
+
+        team_tokens_distributed += total
+
+        # the limit is checked against the batch total, so either every record is minted or none of them are
+        if team_tokens_distributed > max_token_distribution:
+            print("can't exceed transfer_team_tokens_many vesting limit")
+            return 0
+
+        storage.put(self.team_token_distribution_key, team_tokens_distributed)
+
+        attachments = get_asset_attachments()  # type:  Attachments
+
         from_address = attachments.receiver_addr
-        to_address = address
 
-        # bl: the following is an exact copy of the mint_tokens function. invoking self.mint_tokens will break the
-        # execution of this method due to a neo-boa compiler issue. this results in a lot of code duplication,
-        # but it's preferable to the alternative of a broken smart contract. refer: https://github.com/CityOfZion/neo-boa/issues/40
+        mint_count = len(mints) / 28
 
-        # lookup the current balance of the address
-        current_balance = storage.get(to_address)
+        i = 0
+        while i < mint_count:
+            start = i * 28
+            to_address = substr(mints, start, 20)
+            tokens = unpack_int(mints, start + 20, 8)
 
-        # add it to the exchanged tokens and persist in storage
-        new_total = tokens + current_balance
-        storage.put(to_address, new_total)
+            self.credit_tokens(from_address, to_address, tokens, storage)
 
-        # update the in circulation amount
-        token.add_to_circulation(tokens, storage)
+            i += 1
 
-        # dispatch transfer event
-        OnTransfer(from_address, to_address, tokens)
+        # update the in circulation amount once for the whole batch
+        token.add_to_circulation(total, storage)
 
-        return True
+        return mint_count
 
-    def transfer_company_tokens(self, token: Token, args):
+    def transfer_company_tokens(self, token: Token, args, storage: StorageAPI):
         """
         Transfer company tokens to a wallet address according to the 2-year company token vesting schedule
         :param token: the token being minted for the company
         :param args: the address and number of tokens to mint
+        :param storage: StorageAPI A StorageAPI object for storage interaction
         :return: True if successful
         """
-        storage = StorageAPI()
-
         owner = storage.get(token.owner_key)
-        if not CheckWitness(owner):
-            return False
+        if CheckWitness(owner):
+            return self.do_transfer_company_tokens(token, args, storage)
+
+        return False
 
+    def do_transfer_company_tokens(self, token: Token, args, storage: StorageAPI):
+        """
+        transfer_company_tokens without the owner check, for callers that have already checked the owner's
+        witness, i.e. admin_batch. Takes the same arguments and returns the same result.
+        """
         if len(args) != 2:
             return False
 
@@ -568,23 +1078,13 @@ class Crowdsale():
 
         now = get_now()
 
-        seconds_in_year = 31536000
+        max_token_distribution = self.get_company_token_distribution_limit(now)
 
         # no company token distribution until after the ICO ends
-        if now < self.sale_end:
+        if max_token_distribution == 0:
             print("can't transfer_company_tokens before sale ends")
             return False
 
-        # in the first year, allow 50% token distribution
-        if now < (self.sale_end + seconds_in_year):
-            max_token_distribution = self.company_tokens_max * 5 / 10
-        # in the second year, allow 75% total token distribution
-        elif now < (self.sale_end + (2*seconds_in_year)):
-            max_token_distribution = self.company_tokens_max * 75 / 100
-        # beyond the second year, allow 100% total token distribution
-        else:
-            max_token_distribution = self.company_tokens_max
-
         company_tokens_distributed = storage.get(self.company_token_distribution_key)
 
         company_tokens_distributed += tokens
@@ -598,42 +1098,99 @@ class Crowdsale():
 
         attachments = get_asset_attachments()  # type:  Attachments
 
-        #self.mint_tokens(token, attachments.receiver_addr, address, tokens, storage)
+        self.mint_tokens(token, attachments.receiver_addr, address, tokens, storage)
+
+        return True
+
+    def transfer_company_tokens_many(self, token: Token, args, storage: StorageAPI):
+        """
+        Transfer company tokens to many wallet addresses according to the 2-year company token vesting schedule
+        :param token: the token being minted
+        :param args: a single packed list of 28 byte mint records: a 20 byte address followed by the 8 byte little endian number of tokens to mint
+        :param storage: StorageAPI A StorageAPI object for storage interaction
+        :return:
+            int: The number of addresses minted to, or 0 if the batch was rejected, in which case nothing is minted
+        """
+        owner = storage.get(token.owner_key)
+        if CheckWitness(owner):
+            return self.do_transfer_company_tokens_many(token, args, storage)
+
+        return 0
+
+    def do_transfer_company_tokens_many(self, token: Token, args, storage: StorageAPI):
+        """
+        transfer_company_tokens_many without the owner check, for callers that have already checked the owner's
+        witness, i.e. admin_batch. Takes the same arguments and returns the same result.
+        """
+        if len(args) != 1:
+            return 0
+
+        mints = args[0]
+
+        total = self.get_mint_records_total(mints)
+        if total <= 0:
+            return 0
+
+        now = get_now()
+
+        max_token_distribution = self.get_company_token_distribution_limit(now)
+
+        # no company token distribution until after the ICO ends
+        if max_token_distribution == 0:
+            print("can't transfer_company_tokens_many before sale ends")
+            return 0
+
+        company_tokens_distributed = storage.get(self.company_token_distribution_key)
+
+        company_tokens_distributed += total
+
+        # the limit is checked against the batch total, so either every record is minted or none of them are
+        if company_tokens_distributed > max_token_distribution:
+            print("can't exceed transfer_company_tokens_many vesting limit")
+            return 0
+
+        storage.put(self.company_token_distribution_key, company_tokens_distributed)
+
+        attachments = get_asset_attachments()  # type:  Attachments
+
         from_address = attachments.receiver_addr
-        to_address = address
 
-        # bl: the following is an exact copy of the mint_tokens function. invoking self.mint_tokens will break the
-        # execution of this method due to a neo-boa compiler issue. this results in a lot of code duplication,
-        # but it's preferable to the alternative of a broken smart contract. refer: https://github.com/CityOfZion/neo-boa/issues/40
+        mint_count = len(mints) / 28
 
-        # lookup the current balance of the address
-        current_balance = storage.get(to_address)
+        i = 0
+        while i < mint_count:
+            start = i * 28
+            to_address = substr(mints, start, 20)
+            tokens = unpack_int(mints, start + 20, 8)
 
-        # add it to the exchanged tokens and persist in storage
-        new_total = tokens + current_balance
-        storage.put(to_address, new_total)
+            self.credit_tokens(from_address, to_address, tokens, storage)
 
-        # update the in circulation amount
-        token.add_to_circulation(tokens, storage)
+            i += 1
 
-        # dispatch transfer event
-        OnTransfer(from_address, to_address, tokens)
+        # update the in circulation amount once for the whole batch
+        token.add_to_circulation(total, storage)
 
-        return True
+        return mint_count
 
-    def mint_rewards_tokens(self, token: Token, args):
+    def mint_rewards_tokens(self, token: Token, args, storage: StorageAPI):
         """
         Mint tokens for the rewards pool
         :param token: the token being minted for the rewards pool
         :param args: the address and number of tokens to mint
+        :param storage: StorageAPI A StorageAPI object for storage interaction
         :return: True if successful
         """
-        storage = StorageAPI()
-
         owner = storage.get(token.owner_key)
-        if not CheckWitness(owner):
-            return False
+        if CheckWitness(owner):
+            return self.do_mint_rewards_tokens(token, args, storage)
+
+        return False
 
+    def do_mint_rewards_tokens(self, token: Token, args, storage: StorageAPI):
+        """
+        mint_rewards_tokens without the owner check, for callers that have already checked the owner's witness,
+        i.e. admin_batch. Takes the same arguments and returns the same result.
+        """
         if len(args) != 2:
             return False
 
@@ -665,25 +1222,162 @@ class Crowdsale():
 
         attachments = get_asset_attachments()  # type:  Attachments
 
-        #self.mint_tokens(token, attachments.receiver_addr, address, tokens, storage)
+        self.mint_tokens(token, attachments.receiver_addr, address, tokens, storage)
+
+        return True
+
+    def mint_rewards_tokens_many(self, token: Token, args, storage: StorageAPI):
+        """
+        Mint tokens for the rewards pool to many wallet addresses
+        :param token: the token being minted
+        :param args: a single packed list of 28 byte mint records: a 20 byte address followed by the 8 byte little endian number of tokens to mint
+        :param storage: StorageAPI A StorageAPI object for storage interaction
+        :return:
+            int: The number of addresses minted to, or 0 if the batch was rejected, in which case nothing is minted
+        """
+        owner = storage.get(token.owner_key)
+        if CheckWitness(owner):
+            return self.do_mint_rewards_tokens_many(token, args, storage)
+
+        return 0
+
+    def do_mint_rewards_tokens_many(self, token: Token, args, storage: StorageAPI):
+        """
+        mint_rewards_tokens_many without the owner check, for callers that have already checked the owner's
+        witness, i.e. admin_batch. Takes the same arguments and returns the same result.
+        """
+        if len(args) != 1:
+            return 0
+
+        mints = args[0]
+
+        total = self.get_mint_records_total(mints)
+        if total <= 0:
+            return 0
+
+        now = get_now()
+
+        # no minting rewards tokens until after the token sale ends
+        if now < self.sale_end:
+            print("can't mint_rewards_tokens_many before sale ends")
+            return 0
+
+        rewards_fund_tokens_distributed = storage.get(self.rewards_fund_token_distribution_key)
+
+        rewards_fund_tokens_distributed += total
+
+        # the limit is checked against the batch total, so either every record is minted or none of them are
+        if rewards_fund_tokens_distributed > self.rewards_fund_tokens_max:
+            print("can't exceed mint_rewards_tokens_many limit")
+            return 0
+
+        storage.put(self.rewards_fund_token_distribution_key, rewards_fund_tokens_distributed)
+
+        attachments = get_asset_attachments()  # type:  Attachments
+
         from_address = attachments.receiver_addr
-        to_address = address
 
-        # bl: the following is an exact copy of the mint_tokens function. invoking self.mint_tokens will break the
-        # execution of this method due to a neo-boa compiler issue. this results in a lot of code duplication,
-        # but it's preferable to the alternative of a broken smart contract. refer: https://github.com/CityOfZion/neo-boa/issues/40
+        mint_count = len(mints) / 28
 
-        # lookup the current balance of the address
-        current_balance = storage.get(to_address)
+        i = 0
+        while i < mint_count:
+            start = i * 28
+            to_address = substr(mints, start, 20)
+            tokens = unpack_int(mints, start + 20, 8)
 
-        # add it to the exchanged tokens and persist in storage
-        new_total = tokens + current_balance
-        storage.put(to_address, new_total)
+            self.credit_tokens(from_address, to_address, tokens, storage)
 
-        # update the in circulation amount
-        token.add_to_circulation(tokens, storage)
+            i += 1
 
-        # dispatch transfer event
-        OnTransfer(from_address, to_address, tokens)
+        # update the in circulation amount once for the whole batch
+        token.add_to_circulation(total, storage)
 
-        return True
+        return mint_count
+
+    def get_team_token_distribution_limit(self, now):
+        """
+        Looks up the total number of team tokens that may have been distributed according to the 3-year team token vesting schedule
+        :param now: int The current timestamp
+        :return:
+            int: The maximum total team token distribution, or 0 before initial_team_vest_date
+        """
+        # (unlock timestamp, cumulative cap) pairs precomputed from initial_team_vest_date, 365 day years and
+        # team_tokens_max. tests/test_vesting.py recomputes them from those constants.
+        tranches = [
+            1546300800, 600000000000000,  # January 1, 2019 00:00 UTC: 30%
+            1577836800, 1200000000000000,  # January 1, 2020 00:00 UTC: 60%
+            1609372800, 1600000000000000,  # December 31, 2020 00:00 UTC: 80%
+            1640908800, 2000000000000000,  # December 31, 2021 00:00 UTC: 100%
+        ]
+
+        return self.get_tranche_cap(tranches, now)
+
+    def get_company_token_distribution_limit(self, now):
+        """
+        Looks up the total number of company tokens that may have been distributed according to the 2-year company token vesting schedule
+        :param now: int The current timestamp
+        :return:
+            int: The maximum total company token distribution, or 0 before sale_end
+        """
+        # (unlock timestamp, cumulative cap) pairs precomputed from sale_end, 365 day years and
+        # company_tokens_max. tests/test_vesting.py recomputes them from those constants.
+        tranches = [
+            1522357200, 1500000000000000,  # March 29, 2018 @ 9:00:00 pm UTC: 50%
+            1553893200, 2250000000000000,  # March 29, 2019 @ 9:00:00 pm UTC: 75%
+            1585429200, 3000000000000000,  # March 28, 2020 @ 9:00:00 pm UTC: 100%
+        ]
+
+        return self.get_tranche_cap(tranches, now)
+
+    def get_tranche_cap(self, tranches, now):
+        """
+        Walks a vesting schedule to find the cumulative cap in effect
+        :param tranches: list The schedule as a flat list of (unlock timestamp, cumulative cap) pairs in ascending
+               timestamp order. it's flattened since lists can't be nested in the compiler
+        :param now: int The current timestamp
+        :return:
+            int: The cap of the latest tranche unlocked as of now, or 0 if no tranche is unlocked yet
+        """
+        cap = 0
+
+        count = len(tranches)
+
+        i = 0
+        while i < count:
+            if now < tranches[i]:
+                return cap
+
+            cap = tranches[i + 1]
+            i += 2
+
+        return cap
+
+    def get_mint_records_total(self, mints):
+        """
+        Validates a packed list of mint records and totals up the tokens to mint
+        :param mints: bytearray Packed 28 byte records of a 20 byte address to mint to followed by
+               the 8 byte little endian number of tokens to mint
+        :return:
+            int: The total number of tokens to mint, or 0 if any of the records are invalid
+        """
+        mints_length = len(mints)
+
+        if mints_length == 0 or (mints_length % 28) != 0:
+            print("invalid mint records")
+            return 0
+
+        mint_count = mints_length / 28
+
+        total = 0
+        i = 0
+        while i < mint_count:
+            tokens = unpack_int(mints, (i * 28) + 20, 8)
+
+            if tokens <= 0:
+                print("invalid mint amount")
+                return 0
+
+            total += tokens
+            i += 1
+
+        return total
@@ -1,9 +1,9 @@
 from boa.blockchain.vm.Neo.Runtime import CheckWitness, Notify
 from boa.blockchain.vm.Neo.Action import RegisterAction
-from boa.code.builtins import concat
+from boa.code.builtins import concat, substr
 
-from nrve.token.nrvetoken import Token
 from nrve.common.storage import StorageAPI
+from nrve.common.packing import pack_int, unpack_int
 
 
 OnTransfer = RegisterAction('transfer', 'addr_from', 'addr_to', 'amount')
@@ -12,72 +12,100 @@ OnApprove = RegisterAction('approve', 'addr_from', 'addr_to', 'amount')
 
 class NEP5Handler():
 
-    def get_methods(self):
+    # the name, symbol, decimals and totalSupply operations are answered directly by Main from the Token.
+    # each of the remaining operations has its own entry point so that Main can dispatch straight to it
 
-        m = ['name', 'symbol', 'decimals', 'totalSupply', 'balanceOf','transfer', 'transferFrom', 'approve', 'allowance']
-        return m
+    def balance_of(self, args, storage: StorageAPI):
 
-    def handle_nep51(self, operation, args, token: Token):
+        if len(args) == 1:
+            account = args[0]
+            if len(account) != 20:
+                return 0
+            return storage.get(account)
 
-        # these first 3 don't require get ctx
+        return 'Incorrect Arg Length'
 
-        if operation == 'name':
-            return token.name
+    def balances_of(self, args, storage: StorageAPI):
+        """
+        Look up the balances of many addresses at once
 
-        elif operation == 'decimals':
-            return token.decimals
+        :param args: list A list of packed addresses. each element may contain multiple 20 byte addresses
+        :param storage: StorageAPI A StorageAPI object for storage interaction
+        :return:
+            bytearray: The balance of each address in the order given, packed as 8 byte little endian integers.
+            False if any element isn't a multiple of 20 bytes
+        """
+        result = b''
 
-        elif operation == 'symbol':
-            return token.symbol
+        for addresses in args:
 
-        storage = StorageAPI()
+            addr_length = len(addresses)
 
-        arg_error = 'Incorrect Arg Length'
+            if (addr_length % 20) != 0:
+                return False
 
-        if operation == 'totalSupply':
-            return token.get_circulation(storage)
+            addr_count = addr_length / 20
 
-        elif operation == 'balanceOf':
-            if len(args) == 1:
-                account = args[0]
-                if len(account) != 20:
-                    return 0
-                return storage.get(account)
-            return arg_error
+            i = 0
+            while i < addr_count:
+                start = i * 20
+                account = substr(addresses, start, 20)
 
-        elif operation == 'transfer':
-            if len(args) == 3:
-                t_from = args[0]
-                t_to = args[1]
-                t_amount = args[2]
-                return self.do_transfer(storage, t_from, t_to, t_amount)
-            return arg_error
+                balance = storage.get(account)
 
-        elif operation == 'transferFrom':
-            if len(args) == 3:
-                t_from = args[0]
-                t_to = args[1]
-                t_amount = args[2]
-                return self.do_transfer_from(storage, t_from, t_to, t_amount)
-            return arg_error
+                result = concat(result, pack_int(balance, 8))
 
-        elif operation == 'approve':
-            if len(args) == 3:
-                t_owner = args[0]
-                t_spender = args[1]
-                t_amount = args[2]
-                return self.do_approve(storage, t_owner, t_spender, t_amount)
-            return arg_error
+                i += 1
 
-        elif operation == 'allowance':
-            if len(args) == 2:
-                t_owner = args[0]
-                t_spender = args[1]
-                return self.do_allowance(storage, t_owner, t_spender)
+        return result
 
-            return arg_error
+    def transfer(self, args, storage: StorageAPI):
 
-        return False
+        if len(args) == 3:
+            t_from = args[0]
+            t_to = args[1]
+            t_amount = args[2]
+            return self.do_transfer(storage, t_from, t_to, t_amount)
+
+        return 'Incorrect Arg Length'
+
+    def transfer_from(self, args, storage: StorageAPI):
+
+        if len(args) == 3:
+            t_from = args[0]
+            t_to = args[1]
+            t_amount = args[2]
+            return self.do_transfer_from(storage, t_from, t_to, t_amount)
+
+        return 'Incorrect Arg Length'
+
+    def transfer_many(self, args, storage: StorageAPI):
+
+        if len(args) == 2:
+            t_from = args[0]
+            transfers = args[1]
+            return self.do_transfer_many(storage, t_from, transfers)
+
+        return 'Incorrect Arg Length'
+
+    def approve(self, args, storage: StorageAPI):
+
+        if len(args) == 3:
+            t_owner = args[0]
+            t_spender = args[1]
+            t_amount = args[2]
+            return self.do_approve(storage, t_owner, t_spender, t_amount)
+
+        return 'Incorrect Arg Length'
+
+    def allowance(self, args, storage: StorageAPI):
+
+        if len(args) == 2:
+            t_owner = args[0]
+            t_spender = args[1]
+            return self.do_allowance(storage, t_owner, t_spender)
+
+        return 'Incorrect Arg Length'
 
     def do_transfer(self, storage: StorageAPI, t_from, t_to, amount):
 
@@ -120,6 +148,90 @@ class NEP5Handler():
 
         return False
 
+    def do_transfer_many(self, storage: StorageAPI, t_from, transfers):
+        """
+        Transfer tokens from one address to many. The batch is all or nothing: if any record is invalid
+        or the sender can't cover the total, nothing is transferred.
+
+        :param storage: StorageAPI A StorageAPI object for storage interaction
+        :param t_from: bytearray The address to transfer the tokens from
+        :param transfers: bytearray Packed 28 byte records of a 20 byte address to transfer to followed by
+               the 8 byte little endian amount to transfer
+        :return:
+            int: The number of transfers made
+        """
+        record_length = 28
+
+        transfers_length = len(transfers)
+
+        if transfers_length == 0:
+            return 0
+
+        if (transfers_length % record_length) != 0:
+            print("invalid transfer records")
+            return 0
+
+        if not CheckWitness(t_from):
+            print("from address is not the tx sender")
+            return 0
+
+        record_count = transfers_length / record_length
+
+        # validate every record and total up the amount before touching any balances
+        total = 0
+        i = 0
+        while i < record_count:
+            start = i * record_length
+            amount = unpack_int(transfers, start + 20, 8)
+
+            if amount <= 0:
+                print("invalid transfer amount")
+                return 0
+
+            t_to = substr(transfers, start, 20)
+
+            # transfers to self don't move any tokens, same as do_transfer
+            if t_to != t_from:
+                total += amount
+
+            i += 1
+
+        from_val = storage.get(t_from)
+
+        if from_val < total:
+            print("insufficient funds")
+            return 0
+
+        # debit the sender once for the whole batch
+        if from_val == total:
+            storage.delete(t_from)
+        else:
+            difference = from_val - total
+            storage.put(t_from, difference)
+
+        transfer_count = 0
+        i = 0
+        while i < record_count:
+            start = i * record_length
+            t_to = substr(transfers, start, 20)
+
+            if t_to != t_from:
+                amount = unpack_int(transfers, start + 20, 8)
+
+                to_value = storage.get(t_to)
+
+                to_total = to_value + amount
+
+                storage.put(t_to, to_total)
+
+                OnTransfer(t_from, t_to, amount)
+
+                transfer_count += 1
+
+            i += 1
+
+        return transfer_count
+
     def do_transfer_from(self, storage: StorageAPI, t_from, t_to, amount):
 
         if amount <= 0:
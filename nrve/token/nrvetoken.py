@@ -1,4 +1,7 @@
+from boa.code.builtins import concat
 from nrve.common.storage import StorageAPI
+from nrve.common.packing import pack_int, unpack_field
+from nrve.token.salestate import SaleState
 
 
 class Token:
@@ -14,32 +17,34 @@ class Token:
 
     # This is the script hash of the address for the owner of the token
     # This can be found in ``neo-python`` with the wallet open, use ``wallet`` command
+    # build_networks.py replaces it with the original_owner of each network in networks.json
     original_owner = b'\xf0\x8a\xb3z\xa8\x88\xa4J\x8a\xba\xb5\x1b\xb2\x92r{\t;\xb1\xdf'
 
     owner_key = b'owner'
     new_owner_key = b'new_owner'
-    sale_paused_key = b'sale_paused'
 
     in_circulation_key = b'in_circulation'
 
     presale_minted_key = b'pre_sale_mint'
-    public_sale_sold_key = b'pub_sale_sold'
+
+    # packed public sale phases, tokens sold and paused flag. refer: SaleState
+    sale_state_key = b'sale_state'
+    sale_state_size = 61
 
     # supply_limit = 197500000 * 100000000  # 197.5m total supply * 10^8 (decimals)
     # bl: we sold 20,220,000 tokens in the pre-sale. thus, the public sale token limit is now 29,780,000
     public_sale_token_limit = 29780000 * 100000000  # (50m tokens for sale - 20.22m sold in pre-sale) = 29.78m * 10^8 (decimals)
 
-    def crowdsale_available_amount(self):
+    def crowdsale_available_amount(self, storage: StorageAPI):
         """
 
+        :param storage: StorageAPI A StorageAPI object for storage interaction
         :return: int The amount of tokens left for sale in the crowdsale
         """
-        storage = StorageAPI()
-
-        public_sale_sold = storage.get(self.public_sale_sold_key)
+        state = self.get_sale_state(storage)
 
         # bl: the total amount of tokens available is now based off of how many tokens have been sold during the public sale
-        available = self.public_sale_token_limit - public_sale_sold
+        available = self.public_sale_token_limit - state.sold
 
         if available < 0:
             return 0
@@ -68,3 +73,58 @@ class Token:
             int: Total amount in circulation
         """
         return storage.get(self.in_circulation_key)
+
+    def get_sale_state(self, storage: StorageAPI) -> SaleState:
+        """
+        Loads the public sale state record
+
+        :param storage: StorageAPI A StorageAPI object for storage interaction
+        :return:
+            SaleState: The public sale state. all fields are zero if the record hasn't been written yet
+        """
+        state = SaleState()
+
+        record = storage.get(self.sale_state_key)
+
+        if record:
+            state.day1_end = unpack_field(record, 0, 4)
+            state.day2_end = unpack_field(record, 4, 4)
+            state.sale_end = unpack_field(record, 8, 4)
+            state.sold = unpack_field(record, 12, 8)
+            state.paused = unpack_field(record, 20, 1)
+            state.presale_neo = unpack_field(record, 21, 8)
+            state.day1_neo = unpack_field(record, 29, 8)
+            state.day2_neo = unpack_field(record, 37, 8)
+            state.open_neo = unpack_field(record, 45, 8)
+            state.contributors = unpack_field(record, 53, 4)
+            state.open_contributions = unpack_field(record, 57, 4)
+
+        return state
+
+    def put_sale_state(self, state: SaleState, storage: StorageAPI):
+        """
+        Persists the public sale state record
+
+        :param state: SaleState The public sale state
+        :param storage: StorageAPI A StorageAPI object for storage interaction
+        :return:
+            bool: Whether the record was written. it isn't if any field doesn't fit its width, refer: pack_int
+        """
+        record = concat(pack_int(state.day1_end, 4), pack_int(state.day2_end, 4))
+        record = concat(record, pack_int(state.sale_end, 4))
+        record = concat(record, pack_int(state.sold, 8))
+        record = concat(record, pack_int(state.paused, 1))
+        record = concat(record, pack_int(state.presale_neo, 8))
+        record = concat(record, pack_int(state.day1_neo, 8))
+        record = concat(record, pack_int(state.day2_neo, 8))
+        record = concat(record, pack_int(state.open_neo, 8))
+        record = concat(record, pack_int(state.contributors, 4))
+        record = concat(record, pack_int(state.open_contributions, 4))
+
+        if len(record) != self.sale_state_size:
+            print("sale state doesn't fit its record")
+            return False
+
+        storage.put(self.sale_state_key, record)
+
+        return True
@@ -0,0 +1,44 @@
+class SaleState():
+    """
+    Container object ( struct ) for the public sale state, stored as a single packed record so that
+    one Storage.Get answers the phase and limit checks for a contribution:
+
+    * day1_end: 4 bytes, the last block height of the day 1 phase
+    * day2_end: 4 bytes, the last block height of the day 2 phase
+    * sale_end: 4 bytes, the last block height of the sale. zero until the public sale is started
+    * sold: 8 bytes, the number of tokens sold during the public sale
+    * paused: 1 byte, 1 when the sale is paused
+
+    followed by the running aggregates returned by the sale_stats operation:
+
+    * presale_neo: 8 bytes, the NEO of the pre-sale token transfers, in fixed8 units like the public sale phases
+    * day1_neo: 8 bytes, the NEO contributed on day 1 of the public sale, in fixed8 units
+    * day2_neo: 8 bytes, the NEO contributed on day 2 of the public sale, in fixed8 units
+    * open_neo: 8 bytes, the NEO contributed after day 2 of the public sale, in fixed8 units
+    * contributors: 4 bytes, the number of unique addresses that have contributed in the pre-sale or a limited phase
+      (day 1 or 2). these are told apart by the per-address Contributions record those phases already read and write
+    * open_contributions: 4 bytes, the number of contributions after day 2. the open phase has no per-address record,
+      and keeping one just to tell repeat contributors apart would cost every open phase purchase a Get and a Put
+    """
+
+    day1_end = 0
+
+    day2_end = 0
+
+    sale_end = 0
+
+    sold = 0
+
+    paused = 0
+
+    presale_neo = 0
+
+    day1_neo = 0
+
+    day2_neo = 0
+
+    open_neo = 0
+
+    contributors = 0
+
+    open_contributions = 0
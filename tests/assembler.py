@@ -0,0 +1,86 @@
+"""
+Assembles test scripts the way neo-boa 0.2.1 lays out compiled code
+"""
+from buildtools.avm import Instruction, OPCODE_VALUES, assemble, push_instruction
+
+
+class Assembler():
+    """
+    Builds a script from opcode names, with jumps to labels
+    """
+
+    def __init__(self):
+        self.items = []
+
+    def op(self, name, operand=b''):
+        size = 1 + len(operand)
+        if name == 'SYSCALL':
+            size += 1
+        self.items.append(Instruction(None, OPCODE_VALUES[name], operand, size))
+
+    def push(self, value):
+        if value == 0:
+            self.op('PUSH0')
+        elif isinstance(value, bytes):
+            self.items.append(Instruction(None, len(value), value, 1 + len(value)))
+        else:
+            self.items.append(push_instruction(value))
+
+    def jump(self, name, label):
+        self.items.append((OPCODE_VALUES[name], label))
+
+    def label(self, label):
+        self.items.append(label)
+
+    def syscall(self, name):
+        self.op('SYSCALL', name.encode('ascii'))
+
+    def load(self, index):
+        self.op('FROMALTSTACK')
+        self.op('DUP')
+        self.op('TOALTSTACK')
+        self.push(index)
+        self.op('PICKITEM')
+
+    def store(self, index):
+        self.op('FROMALTSTACK')
+        self.op('DUP')
+        self.op('TOALTSTACK')
+        self.push(index)
+        self.push(2)
+        self.op('ROLL')
+        self.op('SETITEM')
+
+    def if_equal(self, local, value, else_label):
+        self.load(local)
+        self.push(value)
+        self.op('NUMEQUAL')
+        self.jump('JMPIFNOT', else_label)
+
+    def script(self):
+        """
+        :return: tuple The script and the offset of each label
+        """
+        labels = {}
+        offset = 0
+        for item in self.items:
+            if isinstance(item, str):
+                labels[item] = offset
+            elif isinstance(item, tuple):
+                offset += 3
+            else:
+                offset += item.size
+
+        instructions = []
+        offset = 0
+        for item in self.items:
+            if isinstance(item, str):
+                continue
+            if isinstance(item, tuple):
+                opcode, label = item
+                relative = (labels[label] - offset).to_bytes(2, 'little', signed=True)
+                item = Instruction(offset, opcode, relative, 3)
+            instructions.append(item)
+            offset += item.size
+
+        return assemble(instructions), labels
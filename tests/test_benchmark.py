@@ -0,0 +1,96 @@
+"""
+Tests for the benchmark suite: the baseline checks, the batch scaling check and the dispatch benchmark
+"""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from collections import OrderedDict
+
+from emulator.benchmark import COMPARISON_INSTRUCTIONS, INSTRUCTIONS, SCALING, compare_scaling, main, \
+    measure_dispatch, python_version, run_benchmarks
+from emulator.script import Machine
+from test_report import tiered_main
+
+
+class BaselineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'baseline.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def record(self, python):
+        self.assertEqual(main(['name', '--repeat', '1', '--baseline', self.path, '--update']), 0)
+        with open(self.path) as f:
+            baseline = json.load(f, object_pairs_hook=OrderedDict)
+        baseline['python'] = python
+        with open(self.path, 'w') as f:
+            json.dump(baseline, f)
+
+    def test_same_python_passes(self):
+        self.record(python_version())
+
+        self.assertEqual(main(['name', '--repeat', '1', '--baseline', self.path]), 0)
+
+    def test_another_python_fails_until_updated(self):
+        self.record('3.0')
+
+        self.assertEqual(main(['name', '--repeat', '1', '--baseline', self.path]), 1)
+        self.assertEqual(main(['name', '--repeat', '1', '--baseline', self.path, '--update']), 0)
+        self.assertEqual(main(['name', '--repeat', '1', '--baseline', self.path]), 0)
+
+
+class ScalingTest(unittest.TestCase):
+
+    def test_batches_scale_linearly(self):
+        names = [name for pair in SCALING for name in pair]
+        results = run_benchmarks(names, 1)
+
+        self.assertEqual(compare_scaling(results, 5), [])
+
+    def test_faster_growth_is_reported(self):
+        small, large = SCALING[0]
+        results = OrderedDict([
+            (small, {INSTRUCTIONS: 1000, 'storage_ops': 100}),
+            (large, {INSTRUCTIONS: 16000, 'storage_ops': 400}),
+        ])
+
+        self.assertEqual(compare_scaling(results, 5), [(large, INSTRUCTIONS, 1000, 16000)])
+
+
+class DispatchTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.results = measure_dispatch()
+
+    def test_hot_operations_are_in_the_first_tiers(self):
+        for tier, operation in enumerate(['transfer', 'balanceOf', 'mintTokens'], 1):
+            self.assertEqual(self.results[operation]['length_tests'], tier, operation)
+            self.assertEqual(self.results[operation]['name_comparisons'], 1, operation)
+
+    def test_every_operation_is_measured(self):
+        self.assertIn('crowdsale_register', self.results)
+        self.assertIn('transfer_presale_tokens_many', self.results)
+        self.assertTrue(all(result['length_tests'] > 0 for result in self.results.values()))
+
+    def test_comparisons_cost_the_instructions_of_the_compiled_script(self):
+        # run the length tiered Main the cost report is tested on up to the start of each branch
+        script, labels = tiered_main()
+
+        def executed(operation):
+            machine = Machine(script)
+            machine.run([[], operation.encode('ascii')], until=labels[operation])
+            return machine.executed
+
+        # transfer is reached after its length test and its name. the others take one or two more comparisons
+        for operation, comparisons in [('decimals', 1), ('balanceOf', 1), ('crowdsale_register', 2)]:
+            self.assertEqual(executed(operation) - executed('transfer'), comparisons * COMPARISON_INSTRUCTIONS, operation)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,234 @@
+"""
+Tests for the source-level inliner, including a run of every benchmark against an inlined copy of the contract
+"""
+import os
+import shutil
+import tempfile
+import textwrap
+import unittest
+
+from buildtools.inliner import InlineError, inline_source, inline_tree
+from emulator.benchmark import BENCHMARKS
+from emulator.engine import ROOT
+
+
+def inline(source):
+    return inline_source(textwrap.dedent(source))
+
+
+def run(source, function, *args):
+    namespace = {}
+    exec(source, namespace)
+    return namespace[function](*args)
+
+
+class InlineSourceTest(unittest.TestCase):
+
+    def assert_same_results(self, source, function, cases):
+        source = textwrap.dedent(source)
+        inlined, count = inline_source(source)
+
+        self.assertGreater(count, 0)
+        self.assertNotIn('# boa: inline\n', inlined)
+        for args in cases:
+            self.assertEqual(run(inlined, function, *args), run(source, function, *args), 'for %r' % (args,))
+
+        return inlined
+
+    def test_plain_name_arguments_are_substituted(self):
+        inlined, count = inline("""
+            # boa: inline
+            def add(values, value):
+                values.append(value)
+
+            def caller(item):
+                items = []
+                add(items, item)
+                return items
+            """)
+
+        self.assertEqual(count, 1)
+        self.assertIn('items.append(item)', inlined)
+        self.assertEqual(run(inlined, 'caller', 3), [3])
+
+    def test_expression_arguments_are_assigned_once(self):
+        inlined = self.assert_same_results("""
+            # boa: inline
+            def twice(values, value):
+                values.append(value)
+                values.append(value)
+
+            def caller(items, start):
+                twice(items, start + len(items))
+                return items
+            """, 'caller', [([], 1), ([5], 2)])
+
+        self.assertIn('value = start + len(items)', inlined)
+
+    def test_parameters_clashing_with_caller_names_are_renamed(self):
+        inlined = self.assert_same_results("""
+            # boa: inline
+            def scale(values, factor):
+                factor = factor * 2
+                values.append(factor)
+
+            def caller(items, factor):
+                scale(items, factor + 1)
+                items.append(factor)
+                return items
+            """, 'caller', [([], 1), ([0], 4)])
+
+        self.assertIn('scale_factor = factor + 1', inlined)
+
+    def test_locals_clashing_with_caller_names_are_renamed(self):
+        inlined = self.assert_same_results("""
+            # boa: inline
+            def total(values, out):
+                i = 0
+                sum = 0
+                while i < len(values):
+                    sum += values[i]
+                    i += 1
+                out.append(sum)
+
+            def caller(values):
+                out = []
+                i = 10
+                total(values, out)
+                out.append(i)
+                return out
+            """, 'caller', [([],), ([1, 2, 3],)])
+
+        self.assertIn('total_i = 0', inlined)
+        # sum isn't used by the caller, so it keeps its name
+        self.assertIn('    sum = 0', inlined)
+
+    def test_methods_are_inlined(self):
+        self.assert_same_results("""
+            class Counter():
+
+                # boa: inline
+                def bump(self, values, amount):
+                    values.append(amount + self.offset)
+
+                def caller(self, values):
+                    self.bump(values, 1)
+                    self.bump(values, 2)
+                    return values
+
+            def caller(values):
+                counter = Counter()
+                counter.offset = 10
+                return counter.caller(values)
+            """, 'caller', [([],)])
+
+    def test_nested_helpers_are_expanded(self):
+        inlined = self.assert_same_results("""
+            # boa: inline
+            def inner(values, value):
+                i = value * 2
+                values.append(i)
+
+            # boa: inline
+            def outer(values, value):
+                i = value + 1
+                inner(values, i)
+                inner(values, value)
+
+            def caller(value):
+                values = []
+                i = 100
+                outer(values, value)
+                values.append(i)
+                return values
+            """, 'caller', [(1,), (7,)])
+
+        code = [line for line in inlined.split('\n') if not line.strip().startswith('#')]
+        self.assertFalse([line for line in code if 'inner(' in line or 'outer(' in line])
+        # the inner helper's local is renamed away from the outer helper's, which was renamed away from the caller's
+        self.assertIn('    inner_i = outer_i * 2', code)
+
+    def test_recursive_helpers_are_refused(self):
+        with self.assertRaisesRegex(InlineError, 'nested more than'):
+            inline("""
+                # boa: inline
+                def forever(values):
+                    forever(values)
+
+                def caller(values):
+                    forever(values)
+                """)
+
+    def test_early_return_is_refused(self):
+        # pasted into the caller, the return would skip the rest of the caller instead of the rest of the helper
+        with self.assertRaisesRegex(InlineError, "can't return early"):
+            inline("""
+                # boa: inline
+                def add_positive(values, value):
+                    if value <= 0:
+                        return
+                    values.append(value)
+
+                def caller(values):
+                    add_positive(values, -1)
+                    values.append(0)
+                    return values
+                """)
+
+    def test_returning_a_value_is_refused(self):
+        with self.assertRaisesRegex(InlineError, "can't return a value"):
+            inline("""
+                # boa: inline
+                def add(values, value):
+                    values.append(value)
+                    return True
+
+                def caller(values):
+                    add(values, 1)
+                """)
+
+    def test_helpers_used_as_values_are_refused(self):
+        with self.assertRaisesRegex(InlineError, 'can only be called as a statement'):
+            inline("""
+                # boa: inline
+                def add(values, value):
+                    values.append(value)
+
+                def caller(values):
+                    add(values, 1)
+                    return add
+                """)
+
+
+class InlinedContractTest(unittest.TestCase):
+    """
+    Runs every benchmark against the contract sources and an inlined copy of them and compares the outcome
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.root = tempfile.mkdtemp()
+        shutil.copy(os.path.join(ROOT, 'ico_template.py'), cls.root)
+        shutil.copytree(os.path.join(ROOT, 'nrve'), os.path.join(cls.root, 'nrve'),
+                        ignore=shutil.ignore_patterns('__pycache__'))
+        cls.expanded = inline_tree(cls.root)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.root)
+
+    def outcome(self, benchmark, root):
+        emu, invoke = benchmark.prepare(root)
+        invocation = invoke()
+        return invocation.fault, invocation.result, invocation.events, invocation.logs, emu.storage
+
+    def test_helpers_were_inlined(self):
+        self.assertGreater(self.expanded, 0)
+
+    def test_benchmarks_match(self):
+        for name, benchmark in BENCHMARKS.items():
+            self.assertEqual(self.outcome(benchmark, self.root), self.outcome(benchmark, None), name)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+"""
+Tests for loading the contract sources with the VM's semantics
+"""
+import os
+import shutil
+import tempfile
+import textwrap
+import unittest
+
+from emulator import Emulator
+
+CONTRACT = """
+class Counter():
+    value = 0
+
+    def bump(self):
+        \"\"\"
+        Changes a copy of the caller's counter, as the compiled method would
+        \"\"\"
+        self.value = self.value + 1
+        return self.value
+
+
+def bump(counter: Counter):
+    counter.value = counter.value + 1
+    return counter.value
+
+
+def Main(operation, args):
+    counter = Counter()
+
+    if operation == 'method':
+        bumped = counter.bump()
+        return [bumped, counter.value]
+
+    if operation == 'function':
+        bumped = bump(counter)
+        return [bumped, counter.value]
+
+    if operation == 'append':
+        counters = []
+        counters.append(counter)
+        counter.value = 5
+        return [counters[0].value, counter.value]
+
+    if operation == 'assign':
+        other = counter
+        other.value = 5
+        return [other.value, counter.value]
+
+    if operation == 'array':
+        # arrays aren't copied, so changes to one made by the callee are seen by the caller
+        values = [0]
+        append_value(values)
+        return values
+
+    return False
+
+
+def append_value(values):
+    values.append(1)
+"""
+
+
+class StructCopyTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.root = tempfile.mkdtemp()
+        with open(os.path.join(cls.root, 'ico_template.py'), 'w') as f:
+            f.write(textwrap.dedent(CONTRACT))
+        cls.emu = Emulator(root=cls.root)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.root)
+
+    def result(self, operation):
+        invocation = self.emu.invoke(operation)
+        self.assertIsNone(invocation.fault)
+        return invocation.result
+
+    def test_method_changes_to_self_are_not_seen_by_the_caller(self):
+        self.assertEqual(self.result('method'), [1, 0])
+
+    def test_changes_to_arguments_are_not_seen_by_the_caller(self):
+        self.assertEqual(self.result('function'), [1, 0])
+
+    def test_appended_instances_are_copies(self):
+        self.assertEqual(self.result('append'), [0, 5])
+
+    def test_assigned_instances_are_copies(self):
+        self.assertEqual(self.result('assign'), [5, 0])
+
+    def test_arrays_are_shared(self):
+        self.assertEqual(self.result('array'), [0, 1])
+
+    def test_docstrings_are_kept(self):
+        self.assertIn("caller's counter", self.emu.contract.Counter.bump.__doc__)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,486 @@
+"""
+Tests for the peephole optimizer
+
+Each pass is run on its own over a script assembled the way neo-boa 0.2.1 lays out functions, and the script is run
+before and after in the emulator's script runner (see emulator/script.py) to check that it still computes the same
+thing. The whole optimizer is checked the same way on a program with loops, calls, dead stores and dead code, and on
+random straight-line arithmetic. When neo-boa is available the compiled contract is optimized and checked on every
+benchmark as well.
+"""
+import random
+import shutil
+import tempfile
+import unittest
+
+from assembler import Assembler
+from buildtools.avm import disassemble
+from buildtools.optimizer import Optimizer, optimize
+from emulator.benchmark import BENCHMARKS
+from emulator.equivalence import differences
+from emulator.script import Machine, ScriptFault, canonical
+
+try:
+    import compile as contract_build
+except ImportError:
+    # neo-boa isn't installed
+    contract_build = None
+
+
+def execute(script, arguments=()):
+    """
+    :return: tuple The stack (as canonical bytes) and the logged values when the script returns, or the fault
+    """
+    logs = []
+    machine = Machine(script, {'Neo.Runtime.Log': (logs.append, 1)})
+    try:
+        stack = machine.run(list(arguments))
+    except ScriptFault:
+        return 'FAULT', canonical(logs)
+    return canonical(stack), canonical(logs)
+
+
+def names(script):
+    return [i.name for i in disassemble(script)]
+
+
+def function(a, slots, label=None):
+    """
+    Start a function the way neo-boa does: a NOP, then the array of locals on the alt stack
+    """
+    if label is not None:
+        a.label(label)
+    a.op('NOP')
+    a.push(slots)
+    a.op('NEWARRAY')
+    a.op('TOALTSTACK')
+
+
+def epilogue(a, label=None):
+    if label is not None:
+        a.label(label)
+    a.op('NOP')
+    a.op('FROMALTSTACK')
+    a.op('DROP')
+    a.op('RET')
+
+
+class PassTest(unittest.TestCase):
+
+    def apply(self, a, name, cases=((),)):
+        """
+        Run a single pass over an assembled script and check that the script still runs the same
+
+        :return: tuple The optimized script and the number of changes the pass made
+        """
+        script, _ = a.script()
+        optimizer = Optimizer(script)
+        changes = getattr(optimizer, name)()
+        optimized = optimizer.relocate()
+
+        for arguments in cases:
+            self.assertEqual(execute(optimized, arguments), execute(script, arguments), 'for %r' % (arguments,))
+
+        return optimized, changes
+
+    def test_constants_are_folded(self):
+        a = Assembler()
+        a.push(29780000)
+        a.push(100000000)
+        a.op('MUL')
+        a.push(-7)
+        a.push(2)
+        a.op('DIV')
+        a.op('RET')
+
+        optimized, changes = self.apply(a, 'fold_constants')
+
+        self.assertEqual(changes, 2)
+        self.assertEqual(names(optimized), ['PUSHBYTES7', 'PUSHBYTES1', 'RET'])
+
+    def test_zero_results_and_division_by_zero_are_not_folded(self):
+        a = Assembler()
+        a.push(3)
+        a.push(3)
+        a.op('SUB')
+        a.push(4)
+        a.push(0)
+        a.op('MOD')
+        a.op('RET')
+
+        optimized, changes = self.apply(a, 'fold_constants')
+
+        self.assertEqual(changes, 0)
+        self.assertEqual(execute(optimized), ('FAULT', []))
+
+    def test_operands_that_are_jumped_to_are_not_folded(self):
+        a = Assembler()
+        a.push(2)
+        a.jump('JMPIF', 'add')
+        a.push(1)
+        a.label('add')
+        a.push(3)
+        a.op('ADD')
+        a.op('RET')
+
+        _, changes = self.apply(a, 'fold_constants', [(1,), (0,)])
+
+        self.assertEqual(changes, 0)
+
+    def test_redundant_pairs_are_removed(self):
+        a = Assembler()
+        a.op('NOP')
+        a.push(5)
+        a.op('DUP')
+        a.op('DROP')
+        a.op('TOALTSTACK')
+        a.op('FROMALTSTACK')
+        a.push(9)
+        a.op('DROP')
+        a.op('RET')
+
+        optimized, changes = self.apply(a, 'remove_redundant')
+
+        self.assertEqual(changes, 4)
+        self.assertEqual(names(optimized), ['PUSH5', 'RET'])
+
+    def test_pairs_split_by_a_jump_destination_are_kept(self):
+        a = Assembler()
+        a.jump('JMPIF', 'drop')
+        a.op('DUP')
+        a.label('drop')
+        a.op('DROP')
+        a.op('RET')
+
+        optimized, changes = self.apply(a, 'remove_redundant', [(4, 1), (4, 0)])
+
+        self.assertEqual(changes, 0)
+
+    def test_dead_stores_are_dropped(self):
+        a = Assembler()
+        function(a, 2)
+        a.store(0)
+        a.push(7)
+        a.store(1)
+        a.load(0)
+        epilogue(a)
+
+        optimized, changes = self.apply(a, 'remove_dead_stores', [(3,)])
+
+        self.assertEqual(changes, 1)
+        self.assertEqual(names(optimized).count('SETITEM'), 1)
+
+    def test_stores_are_kept_when_the_alt_stack_is_used_otherwise(self):
+        a = Assembler()
+        function(a, 2)
+        a.push(7)
+        a.store(1)
+        # reads slot 1 without the load pattern
+        a.op('DUPFROMALTSTACK')
+        a.push(1)
+        a.op('PICKITEM')
+        epilogue(a)
+
+        _, changes = self.apply(a, 'remove_dead_stores')
+
+        self.assertEqual(changes, 0)
+
+    def test_stores_are_dead_per_function(self):
+        # slot 0 is loaded by the helper, not by Main, so Main's store is dead
+        a = Assembler()
+        function(a, 1)
+        a.store(0)
+        a.push(2)
+        a.jump('CALL', 'helper')
+        epilogue(a)
+
+        function(a, 1, 'helper')
+        a.store(0)
+        a.load(0)
+        a.load(0)
+        a.op('MUL')
+        epilogue(a)
+
+        optimized, changes = self.apply(a, 'remove_dead_stores', [(5,)])
+
+        self.assertEqual(changes, 1)
+        self.assertEqual(names(optimized).count('SETITEM'), 1)
+
+    def test_jump_chains_are_threaded(self):
+        a = Assembler()
+        a.jump('JMPIF', 'first')
+        a.push(1)
+        a.op('RET')
+        a.label('first')
+        a.jump('JMP', 'second')
+        a.label('second')
+        a.jump('JMP', 'end')
+        a.label('end')
+        a.push(2)
+        a.op('RET')
+
+        optimized, changes = self.apply(a, 'thread_jumps', [(0,), (1,)])
+
+        self.assertEqual(changes, 2)
+        jumps = [i for i in disassemble(optimized) if i.target is not None]
+        self.assertEqual(len(set(i.target for i in jumps)), 1)
+
+    def test_jump_loops_are_not_threaded_forever(self):
+        a = Assembler()
+        a.label('first')
+        a.jump('JMP', 'second')
+        a.label('second')
+        a.jump('JMP', 'first')
+
+        script, _ = a.script()
+        Optimizer(script).thread_jumps()
+
+    def test_jumps_to_the_next_instruction_are_removed(self):
+        a = Assembler()
+        a.jump('JMPIFNOT', 'next')
+        a.label('next')
+        a.jump('JMP', 'last')
+        a.label('last')
+        a.push(3)
+        a.op('RET')
+
+        optimized, changes = self.apply(a, 'simplify_jumps', [(7, 0), (7, 1)])
+
+        self.assertEqual(changes, 2)
+        # the conditional jump's condition is still popped
+        self.assertEqual(names(optimized), ['DROP', 'PUSH3', 'RET'])
+
+    def test_short_tails_are_copied(self):
+        a = Assembler()
+        function(a, 1)
+        a.jump('JMPIF', 'other')
+        a.push(1)
+        a.jump('JMP', 'return')
+        a.label('other')
+        a.push(2)
+        a.label('return')
+        a.op('FROMALTSTACK')
+        a.op('DROP')
+        a.op('RET')
+
+        optimized, changes = self.apply(a, 'simplify_jumps', [(0,), (1,)])
+
+        self.assertEqual(changes, 1)
+        self.assertEqual(names(optimized).count('JMP'), 0)
+        self.assertEqual(names(optimized).count('RET'), 2)
+
+    def test_unreachable_code_is_removed(self):
+        a = Assembler()
+        a.jump('CALL', 'helper')
+        a.jump('JMP', 'end')
+        a.push(b'unreachable')
+        a.syscall('Neo.Runtime.Log')
+        a.label('end')
+        a.op('RET')
+        a.label('helper')
+        a.push(4)
+        a.op('RET')
+        a.push(5)
+
+        optimized, changes = self.apply(a, 'remove_unreachable')
+
+        self.assertEqual(changes, 3)
+        self.assertNotIn('SYSCALL', names(optimized))
+        self.assertEqual(execute(optimized), ([b'\x04'], []))
+
+
+def loop_program():
+    """
+    Main(n) summing helper(i) for i in range(n), the way neo-boa compiles it, with the redundancies neo-boa leaves:
+
+    def Main(n):
+        limit = 29780000 * 100000000
+        unused = 5
+        total = 0
+        i = 0
+        while i < n:
+            total = total + helper(i)
+            i += 1
+        print(total + limit)
+        return total + limit
+
+    def helper(value):
+        result = value * 2 + 2 * 3757 + 10 / 3
+        return result
+    """
+    a = Assembler()
+    function(a, 5)
+    a.store(0)
+    a.push(29780000)
+    a.push(100000000)
+    a.op('MUL')
+    a.store(1)
+    a.push(5)
+    a.store(2)
+    a.push(0)
+    a.store(3)
+    a.push(0)
+    a.store(4)
+    a.jump('JMP', 'condition')
+
+    a.label('body')
+    a.load(3)
+    a.load(4)
+    a.jump('CALL', 'helper')
+    a.op('ADD')
+    a.store(3)
+    a.load(4)
+    a.op('DUP')
+    a.op('DROP')
+    a.op('INC')
+    a.op('TOALTSTACK')
+    a.op('FROMALTSTACK')
+    a.store(4)
+
+    a.label('condition')
+    a.op('NOP')
+    a.load(4)
+    a.load(0)
+    a.op('LT')
+    a.jump('JMPIF', 'trampoline')
+    a.jump('JMP', 'done')
+    a.label('trampoline')
+    a.jump('JMP', 'trampoline 2')
+    a.label('trampoline 2')
+    a.jump('JMP', 'body')
+
+    a.label('done')
+    a.load(3)
+    a.load(1)
+    a.op('ADD')
+    a.op('DUP')
+    a.syscall('Neo.Runtime.Log')
+    a.push(7)
+    a.op('DROP')
+    a.jump('JMP', 'return')
+    a.label('dead')
+    a.push(1)
+    a.syscall('Neo.Runtime.Log')
+    a.jump('JMP', 'dead')
+    epilogue(a, 'return')
+
+    function(a, 2, 'helper')
+    a.store(0)
+    a.load(0)
+    a.push(2)
+    a.op('MUL')
+    a.push(2)
+    a.push(3757)
+    a.op('MUL')
+    a.op('ADD')
+    a.push(10)
+    a.push(3)
+    a.op('DIV')
+    a.op('ADD')
+    a.op('DUP')
+    a.store(1)
+    a.jump('JMP', 'helper return')
+    epilogue(a, 'helper return')
+
+    return a.script()[0]
+
+
+def straight_line_program(rnd):
+    """
+    Random constant arithmetic with redundant pairs mixed in
+    """
+    a = Assembler()
+    depth = 0
+    for _ in range(rnd.randint(1, 25)):
+        choice = rnd.random()
+        if choice < 0.35 or depth < 2:
+            a.push(rnd.choice([0, -1, 1, 2, 7, 16, 17, 127, 128, 255, -128, -129, 10 ** 12, -10 ** 9, 2 ** 255 - 1]))
+            depth += 1
+        elif choice < 0.7:
+            a.op(rnd.choice(['ADD', 'SUB', 'MUL', 'DIV', 'MOD']))
+            depth -= 1
+        elif choice < 0.8:
+            a.op('DUP')
+            a.op('DROP')
+        elif choice < 0.85:
+            a.op('NOP')
+        elif choice < 0.9:
+            a.op('TOALTSTACK')
+            a.op('FROMALTSTACK')
+        else:
+            a.op('DUP')
+            depth += 1
+    a.op('RET')
+    return a.script()[0]
+
+
+class OptimizeTest(unittest.TestCase):
+
+    def test_loop_program(self):
+        script = loop_program()
+        optimized, counts = optimize(script)
+
+        for n in range(12):
+            self.assertEqual(execute(optimized, [n]), execute(script, [n]), 'for n=%d' % n)
+
+        self.assertLess(len(optimized), len(script))
+        for name in ('constants_folded', 'pairs_removed', 'nops_removed', 'dead_stores_removed', 'jumps_threaded',
+                     'tails_copied', 'unreachable_removed'):
+            self.assertGreater(counts[name], 0, name)
+
+        # running the optimizer again finds nothing left to do
+        self.assertEqual(optimize(optimized)[0], optimized)
+
+    def test_optimized_loops_execute_fewer_instructions(self):
+        script = loop_program()
+        optimized, _ = optimize(script)
+
+        before = Machine(script, {'Neo.Runtime.Log': (lambda value: None, 1)})
+        after = Machine(optimized, {'Neo.Runtime.Log': (lambda value: None, 1)})
+        before.run([10])
+        after.run([10])
+
+        self.assertLess(after.executed, before.executed)
+
+    def test_straight_line_programs(self):
+        rnd = random.Random(3)
+        for case in range(1000):
+            script = straight_line_program(rnd)
+            self.assertEqual(execute(optimize(script)[0]), execute(script), 'case %d' % case)
+
+
+@unittest.skipIf(contract_build is None, 'neo-boa is not installed')
+class CompiledContractTest(unittest.TestCase):
+    """
+    Optimizes the compiled contract and runs every benchmark against the optimized and the unoptimized script
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.build_dir = tempfile.mkdtemp()
+        contract_build.prepare_sources(cls.build_dir, contract_build.PROD)
+        with open(contract_build.compile_contract(cls.build_dir), 'rb') as f:
+            cls.script = f.read()
+        cls.optimized, cls.counts = optimize(cls.script)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.build_dir)
+
+    def test_optimizer_changed_the_script(self):
+        self.assertLess(len(self.optimized), len(self.script))
+
+    def test_compiled_script_matches_the_sources(self):
+        self.assertEqual(differences(self.script, None, self.build_dir), [])
+
+    def test_optimized_script_matches_the_compiled_script(self):
+        self.assertEqual(differences(self.optimized, self.script, self.build_dir), [])
+
+    def test_optimized_script_executes_fewer_instructions(self):
+        for name in BENCHMARKS:
+            before = BENCHMARKS[name].prepare(self.build_dir, self.script)[1]()
+            after = BENCHMARKS[name].prepare(self.build_dir, self.optimized)[1]()
+            self.assertLessEqual(after.instructions, before.instructions, name)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+"""
+Tests for the fixed-width record packing, run against the contract sources in the emulator
+"""
+import struct
+import unittest
+
+from emulator import Emulator
+
+RECIPIENT = b'\x02' * 20
+
+
+class PackingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.emu = Emulator(height=100)
+        self.owner = self.emu.contract.Token.original_owner
+
+        # the contract modules are loaded by the emulator, so import them afterwards
+        from nrve.common import packing
+        self.packing = packing
+
+    def test_pack_int_pads_to_width(self):
+        self.assertEqual(self.packing.pack_int(0, 4), b'\x00' * 4)
+        self.assertEqual(self.packing.pack_int(258, 4), b'\x02\x01\x00\x00')
+        self.assertEqual(self.packing.pack_int(2 ** 31 - 1, 4), b'\xff\xff\xff\x7f')
+
+    def test_unpack_int_converts(self):
+        value = self.packing.unpack_int(b'\xaa\x02\x01\x00\x00', 1, 4)
+
+        self.assertEqual(type(value), int)
+        self.assertEqual(value, 258)
+
+    def test_unpack_field_round_trips(self):
+        field = self.packing.unpack_field(b'\xaa\x02\x01\x00\x00', 1, 4)
+
+        self.assertEqual(field, 258)
+        self.assertEqual(self.packing.pack_int(field, 4), b'\x02\x01\x00\x00')
+
+    def test_overflowing_sale_state_field_is_refused(self):
+        self.emu.invoke('deploy', [], witnesses=[self.owner])
+        self.emu.invoke('crowdsale_register', [RECIPIENT], witnesses=[self.owner])
+
+        # a contributor count of 2^31 - 1 needs a fifth byte once it's incremented
+        record = b'\x00' * 53 + struct.pack('<i', 2 ** 31 - 1) + b'\x00' * 4
+        self.emu.storage[b'sale_state'] = record
+        storage = dict(self.emu.storage)
+
+        invocation = self.emu.invoke('transfer_presale_tokens', [RECIPIENT, 800], witnesses=[self.owner])
+
+        self.assertFalse(invocation.result)
+        self.assertIn("sale state doesn't fit its record", invocation.logs)
+        self.assertEqual(self.emu.storage, storage)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+"""
+Tests for the event handlers' database connection pool, with a fake connect in place of a MySQL server
+"""
+import unittest
+
+try:
+    from pymysql import MySQLError
+    from pymysql.constants import SERVER_STATUS
+    from pymysql.err import InterfaceError, OperationalError
+    from util.database.pool import ConnectionPool, PoolExhaustedError
+except ImportError:
+    ConnectionPool = None
+
+DB_CONFIG = {'host': 'localhost', 'user': 'nrve', 'password': '', 'db': 'nrve', 'pool_size': 2}
+
+
+class FakeConnection:
+
+    def __init__(self):
+        self.open = True
+        self.server_status = 0
+        self.rolled_back = False
+
+    def rollback(self):
+        self.rolled_back = True
+        self.server_status = 0
+
+    def close(self):
+        self.open = False
+
+    def ping(self, reconnect=False):
+        pass
+
+
+@unittest.skipIf(ConnectionPool is None, 'pymysql is not installed')
+class ConnectionPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = ConnectionPool(DB_CONFIG)
+        self.connected = []
+        self.pool.connect = self.connect
+
+    def connect(self):
+        connection = FakeConnection()
+        self.connected.append(connection)
+        return connection
+
+    def test_connections_are_reused(self):
+        connection = self.pool.acquire()
+        self.pool.release(connection)
+
+        self.assertIs(self.pool.acquire(), connection)
+        self.assertEqual(len(self.connected), 1)
+
+    def test_exhausted_pool_times_out(self):
+        self.pool.acquire()
+        self.pool.acquire()
+
+        with self.assertRaises(PoolExhaustedError) as raised:
+            self.pool.acquire(timeout=0.01)
+
+        # the handlers only catch MySQLError
+        self.assertIsInstance(raised.exception, MySQLError)
+        self.assertEqual(len(self.connected), 2)
+
+    def test_release_rolls_back_an_open_transaction(self):
+        connection = self.pool.acquire()
+        connection.server_status = SERVER_STATUS.SERVER_STATUS_IN_TRANS
+
+        self.pool.release(connection)
+
+        self.assertTrue(connection.rolled_back)
+        self.assertTrue(connection.open)
+        self.assertIs(self.pool.acquire(), connection)
+
+    def test_release_without_a_transaction_doesnt_roll_back(self):
+        connection = self.pool.acquire()
+
+        self.pool.release(connection)
+
+        self.assertFalse(connection.rolled_back)
+
+    def test_lost_connections_are_dropped_on_release(self):
+        connection = self.pool.acquire()
+        connection.open = False
+
+        self.pool.release(connection)
+
+        self.assertIsNot(self.pool.acquire(), connection)
+        self.assertEqual(self.pool.size, 1)
+
+    def test_discard_frees_the_slot(self):
+        first = self.pool.acquire()
+        self.pool.acquire()
+
+        self.pool.discard(first)
+
+        self.assertFalse(first.open)
+        self.assertIs(self.pool.acquire(timeout=0.01), self.connected[2])
+        self.assertEqual(self.pool.size, 2)
+
+    def test_failed_connect_frees_the_slot(self):
+        def refuse():
+            raise OperationalError(2003, "can't connect")
+        self.pool.connect = refuse
+
+        with self.assertRaises(OperationalError):
+            self.pool.acquire()
+
+        self.assertEqual(self.pool.size, 0)
+
+    def test_close(self):
+        idle = self.pool.acquire()
+        checked_out = self.pool.acquire()
+        self.pool.release(idle)
+
+        self.pool.close()
+
+        self.assertFalse(idle.open)
+        self.assertTrue(checked_out.open)
+        with self.assertRaises(InterfaceError):
+            self.pool.acquire()
+
+        # connections checked out when the pool closed are closed when they're returned
+        self.pool.release(checked_out)
+        self.assertFalse(checked_out.open)
+        self.assertEqual(self.pool.size, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+"""
+Tests for the batched pre-sale disbursement, run against the contract sources in the emulator
+"""
+import struct
+import unittest
+
+from emulator import Emulator
+from emulator.benchmark import records
+
+
+def record(address, neo):
+    return address + struct.pack('<Q', neo)
+
+
+class PresaleManyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.emu = Emulator(height=100)
+        self.owner = self.emu.contract.Token.original_owner
+        self.emu.invoke('deploy', [], witnesses=[self.owner])
+
+    def transfer_many(self, batch):
+        return self.emu.invoke('transfer_presale_tokens_many', [batch], witnesses=[self.owner])
+
+    def test_sorted_batch_is_minted(self):
+        invocation = self.transfer_many(records(3, 800))
+
+        self.assertEqual(invocation.result, 3)
+        balance = self.emu.storage[b'\x10\x00\x00\x00' * 5]
+        self.assertEqual(int.from_bytes(balance, 'little'), 800 * 400 * 100000000)
+
+    def test_repeated_address_is_rejected(self):
+        address = b'\x10\x00\x00\x00' * 5
+        storage = dict(self.emu.storage)
+
+        # together the two records stay within the 3,000 NEO individual limit
+        invocation = self.transfer_many(record(address, 800) + record(address, 800))
+
+        self.assertEqual(invocation.result, 0)
+        self.assertIn("presale addresses must be unique and in ascending order", invocation.logs)
+        self.assertEqual(self.emu.storage, storage)
+
+    def test_unsorted_batch_is_rejected(self):
+        batch = records(1, 800, first=17) + records(1, 800, first=16)
+        storage = dict(self.emu.storage)
+
+        invocation = self.transfer_many(batch)
+
+        self.assertEqual(invocation.result, 0)
+        self.assertEqual(self.emu.storage, storage)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,187 @@
+"""
+Tests for the prod build profile's print stripping
+"""
+import os
+import shutil
+import tempfile
+import textwrap
+import unittest
+
+from buildtools.profiles import DEV, PROD, ProfileError, apply_profile, strip_prints
+from emulator.benchmark import BENCHMARKS
+from emulator.engine import ROOT
+
+
+def strip(source):
+    return strip_prints(textwrap.dedent(source))
+
+
+class StripPrintsTest(unittest.TestCase):
+
+    def test_prints_are_removed(self):
+        stripped, count = strip("""
+            def check(value):
+                print("checking")
+                if value > 10:
+                    print("too big")
+                    return False
+                return True
+            """)
+
+        self.assertEqual(count, 2)
+        self.assertNotIn('print', stripped)
+        self.assertIn('    if value > 10:\n        return False\n', stripped)
+
+    def test_only_statement_in_a_block_leaves_pass(self):
+        stripped, count = strip("""
+            def check(value):
+                if value > 10:
+                    print("too big")
+                else:
+                    print("fine")
+                    print("really")
+                return value
+            """)
+
+        self.assertEqual(count, 3)
+        self.assertEqual(stripped, textwrap.dedent("""
+            def check(value):
+                if value > 10:
+                    pass
+                else:
+                    pass
+                return value
+            """))
+
+    def test_only_statement_in_a_function_leaves_pass(self):
+        stripped, count = strip("""
+            class Logger():
+
+                def log(self):
+                    print("logged")
+
+                def other(self):
+                    \"\"\"
+                    docstring
+                    \"\"\"
+                    print("other")
+            """)
+
+        self.assertEqual(count, 2)
+        namespace = {}
+        exec(stripped, namespace)
+        self.assertIsNone(namespace['Logger']().log())
+        self.assertIn('    def log(self):\n        pass\n', stripped)
+        # the docstring keeps the other body from being empty, so it doesn't need a pass
+        self.assertTrue(stripped.endswith('        docstring\n        """\n'))
+
+    def test_multiline_prints_are_removed(self):
+        stripped, count = strip("""
+            def check(value):
+                print("value is %s, which is more than %s"
+                      % (value, 10))
+                return value
+            """)
+
+        self.assertEqual(count, 1)
+        self.assertEqual(stripped, '\ndef check(value):\n    return value\n')
+
+    def test_formatted_names_are_allowed(self):
+        _, count = strip("""
+            def check(self, value):
+                print("value is %s of %s" % (value, self.limit))
+            """)
+
+        self.assertEqual(count, 1)
+
+    def test_side_effecting_arguments_are_refused(self):
+        for statement in ('print(storage.get(key))', 'print("balance: %s" % self.get_balance(address))',
+                          'print(concat("owner: ", Get(ctx, key)))'):
+            with self.assertRaisesRegex(ProfileError, "line 3: print's arguments call a function"):
+                strip("""
+                    def check(self, storage, key, address, ctx):
+                        %s
+                        return True
+                    """ % statement)
+
+    def test_prints_sharing_a_line_are_refused(self):
+        with self.assertRaisesRegex(ProfileError, "isn't the only statement on its line"):
+            strip("""
+                def check(value):
+                    if value > 10: print("too big")
+                """)
+
+    def test_other_calls_are_kept(self):
+        source = textwrap.dedent("""
+            def check(value):
+                log("not a print")
+                self.print("a method")
+            """)
+
+        self.assertEqual(strip_prints(source), (source, 0))
+
+
+class ApplyProfileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.path = os.path.join(self.root, 'contract.py')
+        with open(self.path, 'w') as f:
+            f.write('def check(value):\n    print("checking")\n    return value\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def read(self):
+        with open(self.path) as f:
+            return f.read()
+
+    def test_prod_strips_in_place(self):
+        self.assertEqual(apply_profile(self.root, PROD), 1)
+        self.assertEqual(self.read(), 'def check(value):\n    return value\n')
+
+    def test_dev_leaves_the_source(self):
+        self.assertEqual(apply_profile(self.root, DEV), 0)
+        self.assertIn('print("checking")', self.read())
+
+    def test_unknown_profile(self):
+        with self.assertRaisesRegex(ProfileError, "unknown build profile 'test'"):
+            apply_profile(self.root, 'test')
+
+
+class ProdContractTest(unittest.TestCase):
+    """
+    Runs every benchmark against the contract sources and a prod copy of them. Only the logs may differ
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.root = tempfile.mkdtemp()
+        shutil.copy(os.path.join(ROOT, 'ico_template.py'), cls.root)
+        shutil.copytree(os.path.join(ROOT, 'nrve'), os.path.join(cls.root, 'nrve'),
+                        ignore=shutil.ignore_patterns('__pycache__'))
+        cls.removed = apply_profile(cls.root, PROD)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.root)
+
+    def run_benchmark(self, benchmark, root):
+        emu, invoke = benchmark.prepare(root)
+        invocation = invoke()
+        return (invocation.fault, invocation.result, invocation.events, emu.storage), invocation.logs
+
+    def test_prints_were_removed(self):
+        self.assertGreater(self.removed, 0)
+
+    def test_benchmarks_match(self):
+        for name, benchmark in BENCHMARKS.items():
+            prod, prod_logs = self.run_benchmark(benchmark, self.root)
+            dev, _ = self.run_benchmark(benchmark, None)
+
+            self.assertEqual(prod, dev, name)
+            self.assertEqual(prod_logs, [], name)
+
+
+if __name__ == '__main__':
+    unittest.main()
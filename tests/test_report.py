@@ -0,0 +1,188 @@
+"""
+Tests for the static cost report's operation locator
+
+neo-boa can't be installed everywhere the tests run, so the locator is tested on a script assembled the way neo-boa
+0.2.1 compiles Main: locals live in an array on the alt stack, ``==`` is a NUMEQUAL, an ``if`` is a JMPIFNOT past its
+body and ``len()`` is an ARRAYSIZE. The compiled contract is checked as well when neo-boa is available.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from assembler import Assembler
+from buildtools.avm import disassemble, integer_bytes
+from buildtools.report import cost_report, main_operations, operation_entries, unlocated_operations
+from emulator.engine import ROOT
+
+try:
+    import compile as contract_build
+except ImportError:
+    # neo-boa isn't installed
+    contract_build = None
+
+OPERATION = 0
+LENGTH = 2
+
+
+def tiered_main():
+    """
+    Main(operation, args) dispatching on the length of the operation first, like ico_template.Main:
+
+    length = len(operation)
+    if length == 8:
+        if operation == 'transfer': ...
+        if operation == 'decimals': ...
+    elif length == 9:
+        if operation == 'balanceOf': ...
+    elif length == 18:
+        if operation == 'crowdsale_register': ...
+    return False
+
+    :return: tuple The script and the offset of each label. each operation's branch is labelled with its name
+    """
+    a = Assembler()
+    a.push(3)
+    a.op('NEWARRAY')
+    a.op('TOALTSTACK')
+    a.store(OPERATION)
+    a.store(1)
+
+    a.load(OPERATION)
+    a.op('ARRAYSIZE')
+    a.store(LENGTH)
+
+    a.if_equal(LENGTH, 8, 'tier 9')
+    a.if_equal(OPERATION, b'transfer', 'decimals?')
+    a.label('transfer')
+    a.syscall('Neo.Storage.GetContext')
+    a.syscall('Neo.Storage.Get')
+    a.jump('JMP', 'return')
+    a.label('decimals?')
+    a.if_equal(OPERATION, b'decimals', 'tiers end')
+    a.label('decimals')
+    a.push(8)
+    a.jump('JMP', 'return')
+
+    a.label('tier 9')
+    a.if_equal(LENGTH, 9, 'tier 18')
+    a.if_equal(OPERATION, b'balanceOf', 'tiers end')
+    a.label('balanceOf')
+    a.syscall('Neo.Storage.GetContext')
+    a.syscall('Neo.Storage.Get')
+    a.jump('JMP', 'return')
+
+    a.label('tier 18')
+    # 18 is past PUSH16, so it's pushed as a single byte
+    a.if_equal(LENGTH, 18, 'tiers end')
+    a.if_equal(OPERATION, b'crowdsale_register', 'tiers end')
+    a.label('crowdsale_register')
+    a.syscall('Neo.Runtime.CheckWitness')
+    a.syscall('Neo.Storage.GetContext')
+    a.syscall('Neo.Storage.Put')
+    a.jump('JMP', 'return')
+
+    a.label('tiers end')
+    a.push(b'')
+    a.label('return')
+    a.op('FROMALTSTACK')
+    a.op('DROP')
+    a.op('RET')
+
+    return a.script()
+
+
+class OperationEntriesTest(unittest.TestCase):
+
+    operations = ['transfer', 'decimals', 'balanceOf', 'crowdsale_register']
+
+    def setUp(self):
+        self.script, self.labels = tiered_main()
+
+    def test_fixture_pushes_tier_lengths_like_the_compiler(self):
+        pushes = [i for i in disassemble(self.script) if i.name == 'PUSHBYTES1']
+        self.assertEqual([p.operand for p in pushes], [integer_bytes(18)])
+
+    def test_branches_are_located_within_their_tiers(self):
+        entries = operation_entries(disassemble(self.script), self.operations)
+
+        self.assertEqual(entries, dict((name, self.labels[name]) for name in self.operations))
+
+    def test_branch_costs(self):
+        report = cost_report(self.script, self.operations)
+        operations = report['operations']
+
+        self.assertEqual(unlocated_operations(report), [])
+        self.assertEqual(dict(operations['transfer']['syscalls']), {'Neo.Storage.GetContext': 1, 'Neo.Storage.Get': 1})
+        self.assertEqual(dict(operations['decimals']['syscalls']), {})
+        self.assertEqual(dict(operations['crowdsale_register']['syscalls']),
+                         {'Neo.Runtime.CheckWitness': 1, 'Neo.Storage.GetContext': 1, 'Neo.Storage.Put': 1})
+
+        # the branch and the shared epilogue: PUSH8, JMP, FROMALTSTACK, DROP, RET
+        self.assertEqual(operations['decimals']['instructions'], 5)
+
+    def test_unlocated_operations_are_reported(self):
+        report = cost_report(self.script, self.operations + ['approve'])
+
+        self.assertIsNone(report['operations']['approve'])
+        self.assertEqual(unlocated_operations(report), ['approve'])
+
+    def test_names_must_be_compared(self):
+        # a name pushed for anything but a comparison followed by a JMPIFNOT isn't a branch
+        a = Assembler()
+        a.push(b'transfer')
+        a.syscall('Neo.Runtime.Log')
+        a.op('RET')
+        script, _ = a.script()
+
+        self.assertEqual(operation_entries(disassemble(script), ['transfer']), {})
+
+
+class MainOperationsTest(unittest.TestCase):
+
+    def test_contract_operations(self):
+        with open(os.path.join(ROOT, 'ico_template.py')) as f:
+            source = f.read()
+
+        operations = main_operations(source)
+
+        # every operation name Main compares against, once, and none of the length tiers
+        main = source[source.index('\ndef Main('):]
+        main = main[:main.index('\ndef ', 1)]
+        self.assertEqual(len(operations), main.count("if operation == '"))
+        self.assertEqual(len(set(operations)), len(operations))
+        self.assertEqual(operations[:3], ['transfer', 'decimals', 'balanceOf'])
+        self.assertIn('crowdsale_register', operations)
+
+    def test_only_main_is_read(self):
+        operations = main_operations("def helper(operation):\n"
+                                     "    return operation == 'helper'\n"
+                                     "def Main(operation, args):\n"
+                                     "    length = len(operation)\n"
+                                     "    if length == 4:\n"
+                                     "        if operation == 'name':\n"
+                                     "            return 1\n")
+
+        self.assertEqual(operations, ['name'])
+
+
+@unittest.skipIf(contract_build is None, 'neo-boa is not installed')
+class CompiledContractTest(unittest.TestCase):
+
+    def setUp(self):
+        self.build_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.build_dir)
+
+    def test_every_operation_is_located(self):
+        avm_path = os.path.join(self.build_dir, 'ico_template.avm')
+        contract_build.build(contract_build.DEV, avm_path, False)
+
+        report = contract_build.contract_report(avm_path, os.path.join(ROOT, 'ico_template.py'))
+
+        self.assertEqual(unlocated_operations(report), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,167 @@
+"""
+Tests for running compiled scripts in the emulator
+"""
+import unittest
+
+from assembler import Assembler
+import emulator.script
+from emulator import Emulator
+from emulator.script import Machine, ScriptFault, Struct, canonical
+
+
+def execute(assembler, arguments=()):
+    script, _ = assembler.script()
+    return Machine(script).run(list(arguments))
+
+
+def main_script():
+    """
+    Main(operation, args) storing args[0] under the operation name and returning the old value
+    """
+    a = Assembler()
+    a.push(3)
+    a.op('NEWARRAY')
+    a.op('TOALTSTACK')
+    a.store(0)
+    a.store(1)
+
+    # the arguments of Get(ctx, key) are pushed last to first, so the context ends up on top
+    a.load(0)
+    a.syscall('Neo.Storage.GetContext')
+    a.syscall('Neo.Storage.Get')
+    a.store(2)
+
+    a.load(1)
+    a.push(0)
+    a.op('PICKITEM')
+    a.load(0)
+    a.syscall('Neo.Storage.GetContext')
+    a.syscall('Neo.Storage.Put')
+
+    a.load(0)
+    a.syscall('Neo.Runtime.Log')
+    a.load(2)
+    a.op('FROMALTSTACK')
+    a.op('DROP')
+    a.op('RET')
+    return a.script()[0]
+
+
+class MachineTest(unittest.TestCase):
+
+    def test_arithmetic_follows_the_vm(self):
+        a = Assembler()
+        a.push(-7)
+        a.push(2)
+        a.op('DIV')
+        a.push(-7)
+        a.push(2)
+        a.op('MOD')
+        a.op('RET')
+
+        self.assertEqual(execute(a), [-3, -1])
+
+    def test_push0_is_an_empty_byte_array(self):
+        a = Assembler()
+        a.push(0)
+        a.push(0)
+        a.op('NUMEQUAL')
+        a.push(0)
+        a.push(b'\x00')
+        a.op('EQUAL')
+        a.op('RET')
+
+        # numerically equal, but not the same bytes
+        self.assertEqual(execute(a), [True, False])
+
+    def test_calls_return_to_the_caller(self):
+        a = Assembler()
+        a.push(5)
+        a.jump('CALL', 'double')
+        a.push(1)
+        a.op('ADD')
+        a.op('RET')
+        a.label('double')
+        a.push(2)
+        a.op('MUL')
+        a.op('RET')
+
+        self.assertEqual(execute(a), [11])
+
+    def test_structs_are_copied_when_stored(self):
+        a = Assembler()
+        a.push(1)
+        a.op('NEWARRAY')
+        a.op('DUP')
+        a.push(0)
+        a.push(1)
+        a.op('NEWSTRUCT')
+        a.op('DUP')
+        a.op('TOALTSTACK')
+        # array[0] = struct, then struct[0] = 7
+        a.op('SETITEM')
+        a.op('FROMALTSTACK')
+        a.push(0)
+        a.push(7)
+        a.op('SETITEM')
+        a.op('RET')
+
+        array, = execute(a)
+        self.assertEqual(array, [Struct([False])])
+
+    def test_faults(self):
+        for name, build in [('division by zero', lambda a: (a.push(1), a.push(0), a.op('DIV'))),
+                            ('PICKITEM index', lambda a: (a.push(1), a.op('NEWARRAY'), a.push(1), a.op('PICKITEM'))),
+                            ('empty stack', lambda a: a.op('DROP')),
+                            ('THROW', lambda a: a.op('THROW'))]:
+            a = Assembler()
+            build(a)
+            a.op('RET')
+            with self.assertRaisesRegex(ScriptFault, name):
+                execute(a)
+
+    def test_runaway_loops_fault(self):
+        a = Assembler()
+        a.label('loop')
+        a.jump('JMP', 'loop')
+
+        limit, emulator.script.MAX_STEPS = emulator.script.MAX_STEPS, 1000
+        try:
+            with self.assertRaisesRegex(ScriptFault, 'ran for more than 1000'):
+                execute(a)
+        finally:
+            emulator.script.MAX_STEPS = limit
+
+    def test_canonical(self):
+        self.assertEqual(canonical([True, 1, 'a', b'a', 0, False, None]), [b'\x01', b'\x01', b'a', b'a', b'', b'', b''])
+
+
+class ScriptEmulatorTest(unittest.TestCase):
+
+    def test_invoke_runs_the_script(self):
+        emu = Emulator(script=main_script())
+
+        first = emu.invoke('key', [b'one'])
+        second = emu.invoke('key', [b'two'])
+
+        self.assertIsNone(first.fault)
+        self.assertEqual(first.result, b'')
+        self.assertEqual(second.result, b'one')
+        self.assertEqual(emu.storage, {b'key': b'two'})
+        self.assertEqual(second.logs, ['key'])
+        self.assertEqual(second.syscalls['Neo.Storage.Put'], 1)
+        self.assertGreater(second.instructions, 0)
+
+    def test_faults_are_reported(self):
+        emu = Emulator(script=main_script())
+        emu.invoke('key', [b'one'])
+
+        # no args[0]
+        invocation = emu.invoke('key', [])
+
+        self.assertIsInstance(invocation.fault, ScriptFault)
+        self.assertEqual(emu.storage, {b'key': b'one'})
+
+
+if __name__ == '__main__':
+    unittest.main()
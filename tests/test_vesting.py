@@ -0,0 +1,61 @@
+"""
+Checks the precomputed vesting tranche tables against the constants they're derived from
+"""
+import unittest
+
+from emulator import Emulator
+
+SECONDS_IN_YEAR = 365 * 24 * 60 * 60
+
+# the cumulative percentage of the allocation unlocked at the start of each vesting year
+TEAM_SCHEDULE = [30, 60, 80, 100]
+COMPANY_SCHEDULE = [50, 75, 100]
+
+
+def tranches(start, tokens_max, schedule):
+    """
+    :return: list The (unlock timestamp, cumulative cap) pair of each tranche
+    """
+    return [(start + year * SECONDS_IN_YEAR, tokens_max * percentage // 100)
+            for year, percentage in enumerate(schedule)]
+
+
+class VestingTest(unittest.TestCase):
+
+    def setUp(self):
+        contract = Emulator().contract
+        self.crowdsale = contract.Crowdsale()
+
+    def assert_schedule(self, limit, expected):
+        first_unlock = expected[0][0]
+        self.assertEqual(limit(0), 0)
+        self.assertEqual(limit(first_unlock - 1), 0)
+
+        previous_cap = 0
+        for unlock, cap in expected:
+            self.assertEqual(limit(unlock - 1), previous_cap, 'one second before %s' % unlock)
+            self.assertEqual(limit(unlock), cap, 'at %s' % unlock)
+            previous_cap = cap
+
+        self.assertEqual(limit(expected[-1][0] + 10 * SECONDS_IN_YEAR), previous_cap)
+
+    def test_team_tranches(self):
+        crowdsale = self.crowdsale
+        expected = tranches(crowdsale.initial_team_vest_date, crowdsale.team_tokens_max, TEAM_SCHEDULE)
+
+        self.assert_schedule(crowdsale.get_team_token_distribution_limit, expected)
+
+    def test_company_tranches(self):
+        crowdsale = self.crowdsale
+        expected = tranches(crowdsale.sale_end, crowdsale.company_tokens_max, COMPANY_SCHEDULE)
+
+        self.assert_schedule(crowdsale.get_company_token_distribution_limit, expected)
+
+    def test_full_allocation_unlocks(self):
+        self.assertEqual(self.crowdsale.get_team_token_distribution_limit(2 ** 32), self.crowdsale.team_tokens_max)
+        self.assertEqual(self.crowdsale.get_company_token_distribution_limit(2 ** 32),
+                         self.crowdsale.company_tokens_max)
+
+
+if __name__ == '__main__':
+    unittest.main()
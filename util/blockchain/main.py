@@ -6,7 +6,7 @@ from enum import Enum
 from shutil import copyfile
 from signal import SIGINT, SIGHUP, SIGTERM
 
-from base58 import b58encode_check
+from base58 import b58decode_check, b58encode_check
 from logzero import setup_logger
 
 import neo.Storage.Implementation.DBFactory as DBFactory
@@ -74,6 +74,11 @@ class BlockchainMain:
         raw_address = b'\x17' + raw_address
         return b58encode_check(raw_address).decode('utf-8')
 
+    @staticmethod
+    def get_script_hash(address):
+        # the inverse of get_address: strip the AddressVersion byte back off to get the raw 20 byte script hash
+        return b58decode_check(address)[1:]
+
     def setup_wallet(self, wallet_path):
         if not os.path.exists(wallet_path):
             raise ValueError("Wallet file not found")
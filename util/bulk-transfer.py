@@ -11,9 +11,12 @@ class BulkTransfer(BulkProcess):
 
     completed_jobs_path = None
     completed_jobs = None
-    job_key = None
+    job_keys = None
 
-    def __init__(self, from_address, wallet_file, wallet_start_block):
+    # the number of transfers to send in each transfer_many invocation. 1 uses a plain transfer per recipient
+    batch_size = 1
+
+    def __init__(self, from_address, wallet_file, wallet_start_block, batch_size=1):
         with open(os.path.join(os.path.abspath(os.path.dirname(__file__)), 'config', 'bulk-transfer-config.json'), 'r') as f:
             config = json.load(f)
 
@@ -42,12 +45,23 @@ class BulkTransfer(BulkProcess):
         # it shouldn't be necessary anyway since there should only be a single address in the wallets being used.
         self.from_address = from_address
 
-        job_config = {
-            "operation": "transfer",
-            "operation_args_array_length": 3,
-            "expected_result_count": 1,
-            "jobs": transfers
-        }
+        self.batch_size = batch_size
+
+        if self.batch_size > 1:
+            # transfer_many takes the from address and a single packed blob of all of the transfers in the batch
+            job_config = {
+                "operation": "transfer_many",
+                "operation_args_array_length": 2,
+                "expected_result_count": 1,
+                "jobs": transfers
+            }
+        else:
+            job_config = {
+                "operation": "transfer",
+                "operation_args_array_length": 3,
+                "expected_result_count": 1,
+                "jobs": transfers
+            }
 
         network_wallets_config = {
             config["network"]: {
@@ -63,21 +77,40 @@ class BulkTransfer(BulkProcess):
 
         self.logger.debug("%s jobs processed. %s jobs remaining.", self.jobs_processed, jobs_remaining)
 
-        # write this job to the completed jobs file with the transaction hash
-        if self.job_key is not None and not self.test_only:
-            self.completed_jobs[self.job_key] = self.tx_processing.ToString()
+        # write the jobs in this batch to the completed jobs file with the transaction hash
+        if self.job_keys is not None and not self.test_only:
+            for job_key in self.job_keys:
+                self.completed_jobs[job_key] = self.tx_processing.ToString()
             self.serialize_completed_jobs_file()
 
-        self.job_key = None
+        self.job_keys = None
         self.tx_processing = None
 
         if jobs_remaining > 0:
-            # just pop a job out of the dict to process next
-            self.job_key = list(self.jobs.keys())[0]
-            job = self.jobs.pop(self.job_key)
-
-            # construct the args for the transfer job testinvoke
-            self.job = "['" + self.from_address + "','" + job['to_address'] + "'," + str(job['amount']) + "]"
+            if self.batch_size > 1:
+                # pop up to a batch worth of jobs out of the dict to process next
+                self.job_keys = list(self.jobs.keys())[0:self.batch_size]
+                jobs = [self.jobs.pop(job_key) for job_key in self.job_keys]
+
+                # construct the args for the transfer_many job testinvoke. each transfer is packed as the 20 byte
+                # script hash of the to address followed by the 8 byte little endian amount
+                transfers = b''
+                for job in jobs:
+                    transfers += self.get_script_hash(job['to_address']) + job['amount'].to_bytes(8, 'little')
+
+                # escape every byte so that there are no spaces or quotes for neo-python to trip over
+                transfers = ''.join('\\x{:02x}'.format(b) for b in transfers)
+                self.job = "['" + self.from_address + "',bytearray(b'" + transfers + "')]"
+
+                # transfer_many returns the number of transfers made
+                self.expected_result_count = len(jobs)
+            else:
+                # just pop a job out of the dict to process next
+                self.job_keys = [list(self.jobs.keys())[0]]
+                job = self.jobs.pop(self.job_keys[0])
+
+                # construct the args for the transfer job testinvoke
+                self.job = "['" + self.from_address + "','" + job['to_address'] + "'," + str(job['amount']) + "]"
         else:
             # change the jobs array to None (from an empty array) to indicate we are done and can shut down
             self.jobs = None
@@ -91,11 +124,12 @@ def main(argv):
     from_address = None
     wallet_file = None
     wallet_start_block = None
+    batch_size = 1
     try:
-        opts, args = getopt.getopt(argv, "ha:w:b:", ["from_address=", "wallet_file=", "wallet_start_block="])
+        opts, args = getopt.getopt(argv, "ha:w:b:n:", ["from_address=", "wallet_file=", "wallet_start_block=", "batch_size="])
         for opt, arg in opts:
             if opt == '-h':
-                print('bulk-transfer.py -a <from_address> -w <wallet_file> -b <wallet_start_block>')
+                print('bulk-transfer.py -a <from_address> -w <wallet_file> -b <wallet_start_block> [-n <batch_size>]')
                 sys.exit()
             elif opt in ("-a", "--from_address"):
                 from_address = arg
@@ -103,14 +137,16 @@ def main(argv):
                 wallet_file = arg
             elif opt in ("-b", "--wallet_start_block"):
                 wallet_start_block = int(arg)
+            elif opt in ("-n", "--batch_size"):
+                batch_size = int(arg)
     except getopt.GetoptError:
         pass
 
     if from_address is None or wallet_file is None or wallet_start_block is None:
-        print('bulk-transfer.py -a <from_address> -w <wallet_file> -b <wallet_start_block>')
+        print('bulk-transfer.py -a <from_address> -w <wallet_file> -b <wallet_start_block> [-n <batch_size>]')
         sys.exit(2)
 
-    bulk_transfer = BulkTransfer(from_address, wallet_file, wallet_start_block)
+    bulk_transfer = BulkTransfer(from_address, wallet_file, wallet_start_block, batch_size)
     bulk_transfer.run()
 
 
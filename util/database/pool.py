@@ -0,0 +1,202 @@
+"""
+A bounded pool of MySQL connections for the event handlers
+
+Opening a connection costs a TCP handshake and an authentication round trip, which used to be paid for every smart
+contract event. The pool keeps up to ``pool_size`` connections open and hands them out again:
+
+.. code-block:: python
+
+    pool = ConnectionPool(db_config)
+    connection = None
+    try:
+        connection = pool.acquire()
+        with connection.cursor() as cursor:
+            cursor.execute(sql, args)
+        connection.commit()
+    except MySQLError as e:
+        # PoolExhaustedError and errors connecting are raised by acquire()
+        logger.error(e)
+    finally:
+        if connection is not None:
+            pool.release(connection)
+
+* An idle connection that hasn't been used for ``health_check_interval`` seconds is pinged before it's handed out,
+  reconnecting it if the server dropped it in the meantime (e.g. after MySQL's ``wait_timeout``).
+* A connection that was lost while it was checked out (PyMySQL closes its socket on a network error) is dropped when
+  it's released, so the next checkout opens a fresh one.
+* A transaction left open when a connection is returned is rolled back, so row locks (e.g. ``select ... for update``)
+  are released just like they were when every event closed its own connection.
+
+``pool_size`` and ``health_check_interval`` are optional settings in db-config.json.
+"""
+import threading
+import time
+
+import pymysql.cursors
+from pymysql import MySQLError
+from pymysql.constants import SERVER_STATUS
+from pymysql.err import InterfaceError, OperationalError
+
+DEFAULT_POOL_SIZE = 4
+DEFAULT_HEALTH_CHECK_INTERVAL = 30
+
+# how long a checkout waits for a connection to be returned when the pool is exhausted
+DEFAULT_CHECKOUT_TIMEOUT = 30
+
+
+class PoolExhaustedError(OperationalError):
+    """
+    Raised when no connection was returned to an exhausted pool in time. It's an OperationalError, so the handlers'
+    existing ``except MySQLError`` blocks report it like any other database error.
+    """
+    pass
+
+
+class ConnectionPool:
+
+    def __init__(self, db_config, logger=None):
+        """
+        :param db_config: dict The host, user, password and db, plus the optional pool_size and health_check_interval
+        :param logger: Logger The logger to report reconnects to
+        """
+        self.db_config = db_config
+        self.logger = logger
+
+        self.pool_size = db_config.get('pool_size', DEFAULT_POOL_SIZE)
+        self.health_check_interval = db_config.get('health_check_interval', DEFAULT_HEALTH_CHECK_INTERVAL)
+
+        # (connection, time it was returned) pairs, the most recently used last
+        self.idle = []
+        # the number of connections that are open, idle or checked out
+        self.size = 0
+        self.closed = False
+
+        self.condition = threading.Condition()
+
+    def connect(self):
+        return pymysql.connect(host=self.db_config['host'],
+                               user=self.db_config['user'],
+                               password=self.db_config['password'],
+                               db=self.db_config['db'],
+                               charset='utf8mb4',
+                               cursorclass=pymysql.cursors.DictCursor)
+
+    def acquire(self, timeout=DEFAULT_CHECKOUT_TIMEOUT):
+        """
+        Check out a connection, opening one if none are idle and the pool isn't full
+
+        :param timeout: float Seconds to wait for a connection to be returned to a full pool
+        :return:
+            pymysql.connections.Connection: The connection. Give it back with release()
+        """
+        deadline = time.time() + timeout
+
+        with self.condition:
+            while True:
+                if self.closed:
+                    raise InterfaceError('the connection pool is closed')
+
+                if self.idle:
+                    # the most recently used connection is the least likely to have timed out
+                    connection, returned = self.idle.pop()
+                    break
+
+                if self.size < self.pool_size:
+                    # reserve the slot now and connect outside of the lock
+                    self.size += 1
+                    connection = None
+                    break
+
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise PoolExhaustedError('no database connection was available within %s seconds. pool_size is %s'
+                                             % (timeout, self.pool_size))
+                self.condition.wait(remaining)
+
+        try:
+            if connection is None:
+                return self.connect()
+
+            if time.time() - returned >= self.health_check_interval:
+                self.check(connection)
+            return connection
+        except Exception:
+            self.discard(connection)
+            raise
+
+    def check(self, connection):
+        """
+        Ping an idle connection, reconnecting it if the server closed it
+
+        :param connection: pymysql.connections.Connection The connection
+        """
+        if connection.open:
+            try:
+                connection.ping(reconnect=False)
+                return
+            except MySQLError:
+                pass
+
+        if self.logger:
+            self.logger.warn('database connection to %s was closed. reconnecting', self.db_config['host'])
+        connection.ping(reconnect=True)
+
+    def release(self, connection):
+        """
+        Return a checked out connection to the pool, rolling back any transaction that was left open. A connection
+        that was lost is closed instead
+
+        :param connection: pymysql.connections.Connection The connection
+        """
+        if not connection.open:
+            self.discard(connection)
+            return
+
+        try:
+            if connection.server_status & SERVER_STATUS.SERVER_STATUS_IN_TRANS:
+                connection.rollback()
+        except MySQLError:
+            self.discard(connection)
+            return
+
+        with self.condition:
+            if self.closed:
+                self.size -= 1
+                close_quietly(connection)
+            else:
+                self.idle.append((connection, time.time()))
+            self.condition.notify()
+
+    def discard(self, connection):
+        """
+        Close a checked out connection instead of returning it, freeing its slot in the pool
+
+        :param connection: pymysql.connections.Connection The connection, or None if it was never opened
+        """
+        if connection is not None:
+            close_quietly(connection)
+
+        with self.condition:
+            self.size -= 1
+            self.condition.notify()
+
+    def close(self):
+        """
+        Close the idle connections. Connections that are checked out are closed when they're returned
+        """
+        with self.condition:
+            self.closed = True
+            idle, self.idle = self.idle, []
+            self.size -= len(idle)
+            self.condition.notify_all()
+
+        for connection, returned in idle:
+            close_quietly(connection)
+
+
+def close_quietly(connection):
+    try:
+        connection.close()
+    except MySQLError:
+        # closing sends a quit packet, which fails if the server already dropped the connection
+        pass
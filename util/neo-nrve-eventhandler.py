@@ -13,7 +13,7 @@ Usage:
 
 * Update config/neo-nrve-config.json params
 * Update config/network-wallets.json wallet path for the selected network
-* Update config/db-config.json database details
+* Update config/db-config.json database details (and optionally the connection pool_size)
 * Update config/smtp-config.json SMTP details (host, port, TLS, etc.)
 * Place this file in neo-python/neo/contrib and execute the following from neo-python dir:
 
@@ -36,13 +36,30 @@ from neo.contrib.smartcontract import SmartContract
 from neo.SmartContract.ContractParameter import ContractParameter, ContractParameterType
 
 from neo.contrib.narrative.blockchain.main import BlockchainMain, NetworkType
+from neo.contrib.narrative.database.pool import ConnectionPool
 
-import pymysql.cursors
 from pymysql import MySQLError
 
 import smtplib
 from email.mime.text import MIMEText
 
+# the statements are the same for every event, so they're built once here rather than per event
+UPDATE_WHITELISTED_SQL = "update `NarrativeUserNeoAddress` set whitelisted = %s where neoAddress = %s"
+
+INSERT_CONTRIBUTION_SQL = ("insert into `NarrativeContribution` (transactionId, neo, nrveTokens, transactionDate, neoAddress_oid)\n"
+                           "select %s, %s, %s, from_unixtime(%s), na.oid\n"
+                           "from NarrativeUserNeoAddress na\n"
+                           "where na.neoAddress = %s")
+
+INSERT_REFUND_SQL = ("insert into `NarrativeRefund` (transactionId, contractHash, neo, transactionDate, neoAddress)\n"
+                     "values (%s, %s, %s, from_unixtime(%s), %s)")
+
+SELECT_ADDRESSES_TO_WHITELIST_SQL = ("select na.neoAddress from `NarrativeUser` u\n"
+                                     "inner join `NarrativeUserNeoAddress` na on na.oid = u.primaryNeoAddress_oid\n"
+                                     "where na.whitelisted = 0\n"
+                                     "and u.hasVerifiedEmailAddress = 1\n"
+                                     "and u.kycStatus = 3;")
+
 
 class TokenSaleEventHandler(BlockchainMain):
 
@@ -53,6 +70,7 @@ class TokenSaleEventHandler(BlockchainMain):
     old_smart_contract = None
 
     db_config = None
+    db_pool = None
     smtp_config = None
 
     ignore_blocks_older_than = None
@@ -77,6 +95,9 @@ class TokenSaleEventHandler(BlockchainMain):
 
         super().__init__(NetworkType[config['network']], 'neo-nrve-eventhandler')
 
+        # events and the whitelist polling share a pool of connections instead of connecting for each one
+        self.db_pool = ConnectionPool(self.db_config, self.logger)
+
         self.smart_contract_hash = config['smart_contract']
         self.smart_contract = SmartContract(self.smart_contract_hash)
         self.old_smart_contract = SmartContract(config['old_smart_contract'])
@@ -136,26 +157,39 @@ class TokenSaleEventHandler(BlockchainMain):
         if contract_hash == self.old_smart_contract.contract_hash and event_type != 'refund':
             return
 
-        connection = self.get_connection()
-
+        # acquiring is inside the try, so an exhausted pool or a failed connect is reported like any other error
+        connection = None
         try:
+            connection = self.db_pool.acquire()
+
             with connection.cursor() as cursor:
                 if event_type == 'kyc_registration' or event_type == 'kyc_deregistration':
                     address = self.get_address(payload[1].Value)
                     self.logger.info("- %s: %s", event_type, address)
-                    sql = "update `NarrativeUserNeoAddress` set whitelisted = %s where neoAddress = %s"
+                    sql = UPDATE_WHITELISTED_SQL
                     args = (1 if event_type == 'kyc_registration' else 0, address)
-                elif event_type == 'contribution':
-                    # from, neo, tokens
-                    address = self.get_address(payload[1].Value)
+                elif event_type == 'contribution' or event_type == 'packed_contribution':
+                    if event_type == 'contribution':
+                        # from, neo, tokens
+                        address = self.get_address(payload[1].Value)
+                        neo_attached = payload[2].Value
+                        tokens_minted = payload[3].Value
+                        phase = None
+                    else:
+                        # a single 37 byte record: from (20), neo (8), tokens (8), phase (1). integers are little endian
+                        record = payload[1].Value
+                        if len(record) != 37:
+                            self.logger.error('ERROR: invalid packed_contribution record: %s', event)
+                            return
+                        address = self.get_address(record[0:20])
+                        neo_attached = int.from_bytes(record[20:28], 'little')
+                        tokens_minted = int.from_bytes(record[28:36], 'little')
+                        phase = record[36]
                     # based on the smart contract, we know these should always be whole numbers
-                    neo = (int)(payload[2].Value / 100000000)
-                    tokens = (int)(payload[3].Value / 100000000)
-                    self.logger.info("- %s: %s: %s NEO (%s NRVE) (tx: %s)", event_type, address, neo, tokens, tx_hash)
-                    sql = ("insert into `NarrativeContribution` (transactionId, neo, nrveTokens, transactionDate, neoAddress_oid)\n"
-                           "select %s, %s, %s, from_unixtime(%s), na.oid\n"
-                           "from NarrativeUserNeoAddress na\n"
-                           "where na.neoAddress = %s")
+                    neo = (int)(neo_attached / 100000000)
+                    tokens = (int)(tokens_minted / 100000000)
+                    self.logger.info("- %s: %s: %s NEO (%s NRVE) phase %s (tx: %s)", event_type, address, neo, tokens, phase, tx_hash)
+                    sql = INSERT_CONTRIBUTION_SQL
                     args = (tx_hash, neo, tokens, timestamp, address)
                 elif event_type == 'refund':
                     # to, amount
@@ -164,8 +198,7 @@ class TokenSaleEventHandler(BlockchainMain):
                     amount = (int)(payload[2].Value / 100000000)
                     log = "%s: %s: %s NEO [%s] (tx: %s)" % (event_type, address, amount, contract_hash, tx_hash)
                     self.logger.info('- ' + log)
-                    sql = ("insert into `NarrativeRefund` (transactionId, contractHash, neo, transactionDate, neoAddress)\n"
-                           "values (%s, %s, %s, from_unixtime(%s), %s)")
+                    sql = INSERT_REFUND_SQL
                     args = (tx_hash, contract_hash, amount, timestamp, address)
                     self.send_email("Narrative Refund Required", log)
                 elif event_type == 'transfer' or event_type == 'approve':
@@ -187,21 +220,13 @@ class TokenSaleEventHandler(BlockchainMain):
         except MySQLError as e:
             self.logger.error('ERROR: event %s: {!r}, errno is {}'.format(event, e, e.args[0]))
         finally:
-            connection.close()
+            if connection is not None:
+                self.db_pool.release(connection)
 
         # if this is the whitelist tx we are waiting for, then clear it out so the next can be processed!
         if not self.disable_auto_whitelist and self.whitelist_tx_processing and tx_hash == self.whitelist_tx_processing.ToString():
             self.whitelist_tx_processing = None
 
-    def get_connection(self):
-        # Connect to the database
-        return pymysql.connect(host=self.db_config['host'],
-                               user=self.db_config['user'],
-                               password=self.db_config['password'],
-                               db=self.db_config['db'],
-                               charset='utf8mb4',
-                               cursorclass=pymysql.cursors.DictCursor)
-
     def send_email(self, subject, body):
         msg = MIMEText(body)
         msg['Subject'] = subject
@@ -267,15 +292,12 @@ class TokenSaleEventHandler(BlockchainMain):
                 self.whitelist_tx_processing = result.Hash
 
     def load_addresses_to_whitelist(self):
-        connection = self.get_connection()
+        connection = None
         try:
+            connection = self.db_pool.acquire()
+
             with connection.cursor() as cursor:
-                sql = ("select na.neoAddress from `NarrativeUser` u\n"
-                       "inner join `NarrativeUserNeoAddress` na on na.oid = u.primaryNeoAddress_oid\n"
-                       "where na.whitelisted = 0\n"
-                       "and u.hasVerifiedEmailAddress = 1\n"
-                       "and u.kycStatus = 3;")
-                cursor.execute(sql)
+                cursor.execute(SELECT_ADDRESSES_TO_WHITELIST_SQL)
 
                 rows = cursor.fetchall()
 
@@ -284,7 +306,8 @@ class TokenSaleEventHandler(BlockchainMain):
         except MySQLError as e:
             self.logger.error('ERROR: selecting whitelist addresses: {!r}, errno is {}'.format(e, e.args[0]))
         finally:
-            connection.close()
+            if connection is not None:
+                self.db_pool.release(connection)
 
 def main():
     parser = argparse.ArgumentParser()
@@ -294,7 +317,10 @@ def main():
     args = parser.parse_args()
 
     event_handler = TokenSaleEventHandler(args.disable_auto_whitelist)
-    event_handler.run()
+    try:
+        event_handler.run()
+    finally:
+        event_handler.db_pool.close()
 
 
 if __name__ == "__main__":
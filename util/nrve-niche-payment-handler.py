@@ -12,7 +12,7 @@ Usage:
 
 * Update config/nrve-niche-config.json params
 * Update config/network-wallets.json wallet path for the selected network
-* Update config/db-config.json database details
+* Update config/db-config.json database details (and optionally the connection pool_size)
 * Place this file in neo-python/neo/contrib and execute the following from neo-python dir:
 
 python3.5 -m venv venv
@@ -26,16 +26,35 @@ python neo/contrib/neo-niche-payment-handler.py
 import os
 import json
 import traceback
-import pymysql.cursors
 from pymysql import MySQLError
 
 import smtplib
 from email.mime.text import MIMEText
 
 from neo.contrib.narrative.blockchain.main import BlockchainMain, NetworkType
+from neo.contrib.narrative.database.pool import ConnectionPool
 from neo.contrib.smartcontract import SmartContract
 from neo.SmartContract.ContractParameter import ContractParameter, ContractParameterType
 
+# the statements are the same for every payment, so they're built once here rather than per event
+SELECT_PENDING_PAYMENT_SQL = ("select oid from `NrvePayment`\n"
+                              "where fromNeoAddress = %s\n"
+                              "and nrveAmount = %s\n"
+                              "and paymentStatus = 0\n"
+                              "and transactionId is null\n"
+                              "for update;")
+
+UPDATE_PAYMENT_TRANSACTION_SQL = ("update `NrvePayment`\n"
+                                  "set transactionId = %s\n"
+                                  ", transactionDate = from_unixtime(%s)\n"
+                                  ", foundByExternalApi = 0\n"
+                                  "where fromNeoAddress = %s\n"
+                                  "and nrveAmount = %s\n"
+                                  "and paymentStatus = 0\n"
+                                  "and transactionId is null;")
+
+SELECT_PAYMENT_BY_TRANSACTION_SQL = "select oid from `NrvePayment` where transactionId = %s;"
+
 
 class NichePaymentHandler(BlockchainMain):
 
@@ -46,6 +65,7 @@ class NichePaymentHandler(BlockchainMain):
     niche_payment_address = None
 
     db_config = None
+    db_pool = None
     smtp_config = None
 
     wallet_needs_recovery = False
@@ -63,6 +83,8 @@ class NichePaymentHandler(BlockchainMain):
 
         super().__init__(NetworkType[config['network']], 'nrve-niche-payment-handler')
 
+        self.db_pool = ConnectionPool(self.db_config, self.logger)
+
         self.smart_contract = SmartContract(config['smart_contract'])
         self.niche_payment_address = config['niche_payment_address']
 
@@ -138,27 +160,17 @@ class NichePaymentHandler(BlockchainMain):
 
     def process_nrve_transaction(self, event, event_type, from_address, nrve_amount, tx_hash):
 
-        # Connect to the database
-        connection = pymysql.connect(host=self.db_config['host'],
-                                     user=self.db_config['user'],
-                                     password=self.db_config['password'],
-                                     db=self.db_config['db'],
-                                     charset='utf8mb4',
-                                     cursorclass=pymysql.cursors.DictCursor)
-
+        # Check out a pooled database connection. it's inside the try, so an exhausted pool or a failed connect is
+        # reported like any other database error
+        connection = None
         try:
+            connection = self.db_pool.acquire()
+
             with connection.cursor() as cursor:
                 log = "- payment %s: from %s: %s NRVE (tx: %s)" % (event_type, from_address, nrve_amount, tx_hash)
                 self.logger.info(log)
-                sql = ("select oid from `NrvePayment`\n"
-                       "where fromNeoAddress = %s\n"
-                       "and nrveAmount = %s\n"
-                       "and paymentStatus = 0\n"
-                       "and transactionId is null\n"
-                       "for update;")
-
                 args = (from_address, nrve_amount)
-                cursor.execute(sql, args)
+                cursor.execute(SELECT_PENDING_PAYMENT_SQL, args)
 
                 if cursor.rowcount == 0:
                     # This could be one of two scenarios:
@@ -180,18 +192,10 @@ class NichePaymentHandler(BlockchainMain):
 
                 # when a payment is outstanding, it will be recorded with the expected "from address", the proper
                 # nrveAmount (in "neurons") and a paymentStatus of 0 which indicates it's pending payment
-                sql = ("update `NrvePayment`\n"
-                       "set transactionId = %s\n"
-                       ", transactionDate = from_unixtime(%s)\n"
-                       ", foundByExternalApi = 0\n"
-                       "where fromNeoAddress = %s\n"
-                       "and nrveAmount = %s\n"
-                       "and paymentStatus = 0\n"
-                       "and transactionId is null;")
                 args = (tx_hash, block.Timestamp, from_address, nrve_amount)
 
                 # Create a new record
-                cursor.execute(sql, args)
+                cursor.execute(UPDATE_PAYMENT_TRANSACTION_SQL, args)
 
                 if cursor.rowcount != 1:
                     subject = 'Failed updating payment. Should not be possible since it was already locked for update'
@@ -213,17 +217,16 @@ class NichePaymentHandler(BlockchainMain):
             self.send_email('Niche Payment Error', error_message)
 
         finally:
-            connection.close()
+            # an early return above leaves the select ... for update transaction open. the pool rolls it back
+            if connection is not None:
+                self.db_pool.release(connection)
 
     def handle_unknown_transaction(self, connection, event, from_address, nrve_amount, tx_hash):
 
         try:
             with connection.cursor() as cursor:
-                sql = (
-                    "select oid from `NrvePayment` where transactionId = %s;"
-                )
                 params = tx_hash
-                cursor.execute(sql, params)
+                cursor.execute(SELECT_PAYMENT_BY_TRANSACTION_SQL, params)
 
                 if cursor.rowcount == 0:
                     # Send refund email
@@ -278,7 +281,10 @@ class NichePaymentHandler(BlockchainMain):
 
 def main():
     event_handler = NichePaymentHandler()
-    event_handler.run()
+    try:
+        event_handler.run()
+    finally:
+        event_handler.db_pool.close()
 
 
 if __name__ == "__main__":